@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Appointment
+from django.utils import timezone
+from .models import Appointment, AgentAvailability, AgentBlackout, AppointmentReminder
 
 
 @admin.register(Appointment)
@@ -36,18 +37,48 @@ class AppointmentAdmin(admin.ModelAdmin):
     
     def mark_as_confirmed(self, request, queryset):
         """Mark selected appointments as confirmed"""
-        updated = queryset.update(status='confirmed')
+        updated = queryset.update(status='confirmed', updated_at=timezone.now())
         self.message_user(request, f'{updated} appointment(s) marked as confirmed.')
     mark_as_confirmed.short_description = 'Mark selected as confirmed'
     
     def mark_as_completed(self, request, queryset):
         """Mark selected appointments as completed"""
-        updated = queryset.update(status='completed')
+        updated = queryset.update(status='completed', updated_at=timezone.now())
         self.message_user(request, f'{updated} appointment(s) marked as completed.')
     mark_as_completed.short_description = 'Mark selected as completed'
     
     def mark_as_cancelled(self, request, queryset):
         """Mark selected appointments as cancelled"""
-        updated = queryset.update(status='cancelled')
+        updated = queryset.update(status='cancelled', updated_at=timezone.now())
         self.message_user(request, f'{updated} appointment(s) marked as cancelled.')
     mark_as_cancelled.short_description = 'Mark selected as cancelled'
+
+
+@admin.register(AgentAvailability)
+class AgentAvailabilityAdmin(admin.ModelAdmin):
+    """Admin interface for agent availability windows"""
+
+    list_display = ['agent', 'weekday', 'start_time', 'end_time']
+    list_filter = ['weekday']
+    search_fields = ['agent__username', 'agent__email']
+    raw_id_fields = ['agent']
+
+
+@admin.register(AgentBlackout)
+class AgentBlackoutAdmin(admin.ModelAdmin):
+    """Admin interface for agent blackout dates"""
+
+    list_display = ['agent', 'date', 'reason']
+    list_filter = ['date']
+    search_fields = ['agent__username', 'agent__email', 'reason']
+    raw_id_fields = ['agent']
+
+
+@admin.register(AppointmentReminder)
+class AppointmentReminderAdmin(admin.ModelAdmin):
+    """Admin interface for sent appointment reminders"""
+
+    list_display = ['appointment', 'recipient', 'kind', 'sent_at']
+    list_filter = ['kind', 'recipient', 'sent_at']
+    raw_id_fields = ['appointment']
+    readonly_fields = ['sent_at']
@@ -0,0 +1,139 @@
+"""
+iCalendar (RFC 5545) feed of an agent's appointments.
+
+Calendar apps cannot send Authorization headers, so the feed URL carries a
+signed token identifying the agent. The token also carries the agent's
+token_version and calendar_feed_version and expires after
+CALENDAR_TOKEN_MAX_AGE_DAYS: rotating the feed URL, deactivating the agent or
+changing their role revokes every earlier URL. The feed is streamed row by row
+and ETag'd on the latest `updated_at` so polling clients mostly get 304s.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Appointment
+
+TOKEN_SALT = 'appointments.calendar'
+
+ICS_STATUS = {
+    'pending': 'TENTATIVE',
+    'confirmed': 'CONFIRMED',
+    'cancelled': 'CANCELLED',
+    'completed': 'CONFIRMED',
+}
+
+
+def make_calendar_token(agent):
+    """Signed, URL-safe token granting read access to `agent`'s feed until it is revoked."""
+    return signing.dumps(
+        {'agent': agent.pk, 'ver': agent.token_version, 'feed': agent.calendar_feed_version},
+        salt=TOKEN_SALT,
+        compress=True,
+    )
+
+
+def read_calendar_token(token):
+    """Return the agent id for a valid token issued to a still-active agent, or None."""
+    max_age = timedelta(days=getattr(settings, 'CALENDAR_TOKEN_MAX_AGE_DAYS', 365))
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=max_age)
+        agent_id, version, feed_version = payload['agent'], payload['ver'], payload['feed']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+    return get_user_model().objects.filter(
+        pk=agent_id, is_active=True, role='agent', token_version=version, calendar_feed_version=feed_version,
+    ).values_list('pk', flat=True).first()
+
+
+def feed_queryset(agent_id):
+    return Appointment.objects.filter(agent_id=agent_id)
+
+
+def feed_etag(agent_id):
+    """ETag from the latest change and row count, computed in a single aggregate query."""
+    state = feed_queryset(agent_id).order_by().aggregate(last=Max('updated_at'), total=Count('id'))
+    raw = f"{agent_id}:{state['last'].isoformat() if state['last'] else ''}:{state['total']}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """Fold content lines longer than 75 octets as required by RFC 5545."""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        chunk = data[:limit]
+        # Never split a multi-byte character
+        while chunk and (data[len(chunk):len(chunk) + 1] or b'\x00')[0] & 0xC0 == 0x80:
+            chunk = chunk[:-1]
+        parts.append(chunk.decode('utf-8'))
+        data = data[len(chunk):]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _format_local(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def _person_name(user):
+    if user.first_name and user.last_name:
+        return f"{user.first_name} {user.last_name}"
+    return user.username
+
+
+def render_event(appointment, stamp):
+    start = datetime.combine(appointment.scheduled_date, appointment.scheduled_time)
+    end = start + timedelta(minutes=getattr(settings, 'APPOINTMENT_SLOT_MINUTES', 60))
+    listing = appointment.listing
+    description = f"Viewing with {_person_name(appointment.client)}"
+    if appointment.notes:
+        description += f"\n\n{appointment.notes}"
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:appointment-{appointment.pk}@keja',
+        f'DTSTAMP:{stamp}',
+        f'LAST-MODIFIED:{appointment.updated_at.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")}',
+        f'DTSTART:{_format_local(start)}',
+        f'DTEND:{_format_local(end)}',
+        f'SUMMARY:{_escape("Viewing: " + listing.title)}',
+        f'LOCATION:{_escape(listing.address + ", " + listing.city)}',
+        f'DESCRIPTION:{_escape(description)}',
+        f'STATUS:{ICS_STATUS.get(appointment.status, "TENTATIVE")}',
+        'END:VEVENT',
+    ]
+    return ''.join(_fold(line) for line in lines)
+
+
+def iter_calendar(agent_id, chunk_size=500):
+    """Yield the calendar as text chunks without loading all appointments at once."""
+    stamp = timezone.now().astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    yield (
+        'BEGIN:VCALENDAR\r\n'
+        'VERSION:2.0\r\n'
+        'PRODID:-//Keja//Appointments//EN\r\n'
+        'CALSCALE:GREGORIAN\r\n'
+        'X-WR-CALNAME:Keja viewings\r\n'
+    )
+    queryset = feed_queryset(agent_id).select_related('listing', 'client').order_by('scheduled_date', 'scheduled_time')
+    for appointment in queryset.iterator(chunk_size=chunk_size):
+        yield render_event(appointment, stamp)
+    yield 'END:VCALENDAR\r\n'
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')], help_text='Day of the week')),
+                ('start_time', models.TimeField(help_text='Window start time')),
+                ('end_time', models.TimeField(help_text='Window end time')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('agent', models.ForeignKey(help_text='Agent this window belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='availability_windows', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Agent Availability',
+                'verbose_name_plural': 'Agent Availability',
+                'ordering': ['weekday', 'start_time'],
+                'indexes': [models.Index(fields=['agent', 'weekday'], name='appointment_agent_i_a33d22_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AgentBlackout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Unavailable date')),
+                ('reason', models.CharField(blank=True, help_text='Optional reason', max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('agent', models.ForeignKey(help_text='Agent this blackout belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='blackout_dates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Agent Blackout',
+                'verbose_name_plural': 'Agent Blackouts',
+                'ordering': ['date'],
+                'unique_together': {('agent', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_agentavailability_agentblackout'),
+        ('listings', '0003_remove_savedlisting_listings_savedlisting_unique_user_listing_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='appointment',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'confirmed'])), fields=('listing', 'scheduled_date', 'scheduled_time'), name='unique_active_appointment_slot'),
+        ),
+    ]
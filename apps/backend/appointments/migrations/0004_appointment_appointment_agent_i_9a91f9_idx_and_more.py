@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_alter_appointment_unique_together_and_more'),
+        ('listings', '0003_remove_savedlisting_listings_savedlisting_unique_user_listing_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['agent', 'scheduled_date'], name='appointment_agent_i_9a91f9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['client', 'scheduled_date'], name='appointment_client__f8f052_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_appointment_appointment_agent_i_9a91f9_idx_and_more'),
+        ('listings', '0003_remove_savedlisting_listings_savedlisting_unique_user_listing_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.CharField(choices=[('client', 'Client'), ('agent', 'Agent')], max_length=10)),
+                ('kind', models.CharField(choices=[('upcoming', 'Upcoming viewing')], default='upcoming', max_length=20)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Appointment Reminder',
+                'verbose_name_plural': 'Appointment Reminders',
+                'ordering': ['-sent_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'scheduled_date', 'scheduled_time'], name='appointment_status_70d801_idx'),
+        ),
+        migrations.AddField(
+            model_name='appointmentreminder',
+            name='appointment',
+            field=models.ForeignKey(help_text='Appointment the reminder was sent for', on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='appointments.appointment'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentreminder',
+            constraint=models.UniqueConstraint(fields=('appointment', 'recipient', 'kind'), name='unique_appointment_reminder'),
+        ),
+    ]
@@ -1,8 +1,45 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from listings.models import Listing
 
 
+class AppointmentQuerySet(models.QuerySet):
+    """Date/time filters evaluated in SQL on (scheduled_date, scheduled_time)"""
+
+    def _upcoming_q(self, now=None):
+        now = timezone.localtime(now)
+        return models.Q(status__in=self.model.ACTIVE_STATUSES) & (
+            models.Q(scheduled_date__gt=now.date()) |
+            models.Q(scheduled_date=now.date(), scheduled_time__gt=now.time())
+        )
+
+    def upcoming(self, now=None):
+        """Pending/confirmed appointments scheduled after now"""
+        return self.filter(self._upcoming_q(now))
+
+    def not_upcoming(self, now=None):
+        """Past, cancelled or completed appointments"""
+        return self.exclude(self._upcoming_q(now))
+
+    def between(self, date_from=None, date_to=None):
+        """Appointments whose scheduled_date falls within the inclusive range"""
+        queryset = self
+        if date_from:
+            queryset = queryset.filter(scheduled_date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(scheduled_date__lte=date_to)
+        return queryset
+
+    def with_upcoming(self, now=None):
+        """Annotate `upcoming_flag` so serializers don't compute it per row"""
+        return self.annotate(upcoming_flag=models.Case(
+            models.When(self._upcoming_q(now), then=models.Value(True)),
+            default=models.Value(False),
+            output_field=models.BooleanField(),
+        ))
+
+
 class Appointment(models.Model):
     """Property viewing appointments"""
     
@@ -13,6 +50,9 @@ class Appointment(models.Model):
         ('completed', 'Completed'),
     ]
     
+    # Statuses that hold a time slot; cancelled/completed appointments free it
+    ACTIVE_STATUSES = ['pending', 'confirmed']
+    
     listing = models.ForeignKey(
         Listing,
         on_delete=models.CASCADE,
@@ -48,14 +88,25 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = AppointmentQuerySet.as_manager()
+    
     class Meta:
         ordering = ['scheduled_date', 'scheduled_time']
         verbose_name = 'Appointment'
         verbose_name_plural = 'Appointments'
-        unique_together = ['listing', 'scheduled_date', 'scheduled_time']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['listing', 'scheduled_date', 'scheduled_time'],
+                condition=models.Q(status__in=['pending', 'confirmed']),
+                name='unique_active_appointment_slot',
+            ),
+        ]
         indexes = [
             models.Index(fields=['scheduled_date', 'scheduled_time']),
             models.Index(fields=['status']),
+            models.Index(fields=['agent', 'scheduled_date']),
+            models.Index(fields=['client', 'scheduled_date']),
+            models.Index(fields=['status', 'scheduled_date', 'scheduled_time']),
         ]
     
     def __str__(self):
@@ -63,8 +114,111 @@ class Appointment(models.Model):
     
     @property
     def is_upcoming(self):
-        """Check if appointment is in the future"""
-        from datetime import datetime, date, time
-        now = datetime.now()
+        """Check if appointment is in the future (uses the queryset annotation when present)"""
+        if hasattr(self, 'upcoming_flag'):
+            return self.upcoming_flag
+        from datetime import datetime
+        now = timezone.localtime().replace(tzinfo=None)
         appointment_datetime = datetime.combine(self.scheduled_date, self.scheduled_time)
-        return appointment_datetime > now and self.status in ['pending', 'confirmed']
+        return appointment_datetime > now and self.status in self.ACTIVE_STATUSES
+
+
+class AgentAvailability(models.Model):
+    """Recurring weekly window during which an agent takes viewings"""
+
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    agent = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='availability_windows',
+        help_text='Agent this window belongs to'
+    )
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, help_text='Day of the week')
+    start_time = models.TimeField(help_text='Window start time')
+    end_time = models.TimeField(help_text='Window end time')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['weekday', 'start_time']
+        verbose_name = 'Agent Availability'
+        verbose_name_plural = 'Agent Availability'
+        indexes = [
+            models.Index(fields=['agent', 'weekday']),
+        ]
+
+    def __str__(self):
+        return f"{self.agent.username} - {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+
+
+class AgentBlackout(models.Model):
+    """Date on which an agent takes no viewings"""
+
+    agent = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='blackout_dates',
+        help_text='Agent this blackout belongs to'
+    )
+    date = models.DateField(help_text='Unavailable date')
+    reason = models.CharField(max_length=200, blank=True, help_text='Optional reason')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['date']
+        verbose_name = 'Agent Blackout'
+        verbose_name_plural = 'Agent Blackouts'
+        unique_together = ['agent', 'date']
+
+    def __str__(self):
+        return f"{self.agent.username} unavailable on {self.date}"
+
+
+class AppointmentReminder(models.Model):
+    """Record of a reminder email sent for an appointment (makes reminder sweeps idempotent)"""
+
+    KIND_UPCOMING = 'upcoming'
+
+    KIND_CHOICES = [
+        (KIND_UPCOMING, 'Upcoming viewing'),
+    ]
+
+    RECIPIENT_CHOICES = [
+        ('client', 'Client'),
+        ('agent', 'Agent'),
+    ]
+
+    appointment = models.ForeignKey(
+        Appointment,
+        on_delete=models.CASCADE,
+        related_name='reminders',
+        help_text='Appointment the reminder was sent for'
+    )
+    recipient = models.CharField(max_length=10, choices=RECIPIENT_CHOICES)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_UPCOMING)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-sent_at']
+        verbose_name = 'Appointment Reminder'
+        verbose_name_plural = 'Appointment Reminders'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['appointment', 'recipient', 'kind'],
+                name='unique_appointment_reminder',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} reminder to {self.recipient} for appointment {self.appointment_id}"
@@ -0,0 +1,48 @@
+"""
+Client notifications for appointment changes made by agents.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+
+from core.mail import enqueue_messages
+
+from .models import Appointment
+
+
+def build_status_update(client, appointments, new_status):
+    """One EmailMessage telling `client` about every appointment moved to `new_status`."""
+    name = client.get_full_name() or client.username
+    label = dict(Appointment.STATUS_CHOICES).get(new_status, new_status)
+    lines = [
+        f'- {appointment.listing.title} on {appointment.scheduled_date:%a %d %b %Y} at {appointment.scheduled_time:%H:%M}'
+        for appointment in appointments
+    ]
+    body = (
+        f'Hi {name},\n\n'
+        f'The following viewing{"s have" if len(lines) > 1 else " has"} been marked as {label.lower()}:\n\n'
+        + '\n'.join(lines) +
+        '\n\nYou can see the details under Appointments in Keja.\n\n'
+        'Best regards,\nThe Keja Team'
+    )
+    return EmailMessage(
+        subject=f'Your viewing{"s" if len(lines) > 1 else ""}: {label}',
+        body=body,
+        from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@keja.com'),
+        to=[client.email],
+    )
+
+
+def notify_status_change(appointments, new_status):
+    """Queue one email per affected client."""
+    by_client = defaultdict(list)
+    for appointment in appointments:
+        by_client[appointment.client].append(appointment)
+    messages = [
+        build_status_update(client, items, new_status)
+        for client, items in by_client.items()
+        if client.email
+    ]
+    if messages:
+        enqueue_messages(messages)
@@ -0,0 +1,132 @@
+"""
+Viewing reminders for clients and agents.
+
+`send_due_reminders` walks pending/confirmed appointments in the reminder
+window using keyset pagination on (scheduled_date, scheduled_time, id). Each
+batch's reminders are queued in the core.mail outbox in the same transaction
+that records them in AppointmentReminder, so a rerun never emails twice and a
+mail server failure is retried by `deliver_outbox` instead of the sweep.
+Overlapping sweeps (the scheduler and a `--once` run) skip appointments the
+other has locked, and a batch whose reminders the other recorded first is
+rolled back rather than queued again.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.mail import enqueue_messages
+
+from .models import Appointment, AppointmentReminder
+
+
+def _display_name(user):
+    return user.get_full_name() or user.username
+
+
+def build_reminder(appointment, recipient):
+    """EmailMessage reminding `recipient` ('client' or 'agent') of `appointment`."""
+    user = appointment.client if recipient == 'client' else appointment.agent
+    other = appointment.agent if recipient == 'client' else appointment.client
+    listing = appointment.listing
+    when = f"{appointment.scheduled_date:%A %d %B %Y} at {appointment.scheduled_time:%H:%M}"
+    body = (
+        f'Hi {_display_name(user)},\n\n'
+        f'This is a reminder of your viewing of "{listing.title}" on {when}.\n\n'
+        f'Address: {listing.address}, {listing.city}\n'
+        f'{"Agent" if recipient == "client" else "Client"}: {_display_name(other)}\n\n'
+        'If you can no longer make it, please cancel the appointment in Keja.\n\n'
+        'Best regards,\nThe Keja Team'
+    )
+    return EmailMessage(
+        subject=f'Reminder: viewing on {appointment.scheduled_date:%d %b} at {appointment.scheduled_time:%H:%M}',
+        body=body,
+        from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@keja.com'),
+        to=[user.email],
+    )
+
+
+def iter_due_batches(now, lead, batch_size):
+    """
+    Yield lists of active appointments scheduled in (now, now + lead], batch by batch,
+    using a keyset cursor so each batch is one indexed range query.
+    """
+    now = timezone.localtime(now).replace(tzinfo=None)
+    window_end = now + lead
+    base = Appointment.objects.filter(
+        status__in=Appointment.ACTIVE_STATUSES,
+        scheduled_date__gte=now.date(),
+        scheduled_date__lte=window_end.date(),
+    ).select_related('listing', 'client', 'agent').order_by('scheduled_date', 'scheduled_time', 'id')
+
+    cursor = None
+    while True:
+        queryset = base
+        if cursor:
+            last_date, last_time, last_id = cursor
+            queryset = queryset.filter(
+                Q(scheduled_date__gt=last_date) |
+                Q(scheduled_date=last_date, scheduled_time__gt=last_time) |
+                Q(scheduled_date=last_date, scheduled_time=last_time, id__gt=last_id)
+            )
+        batch = list(queryset[:batch_size])
+        if not batch:
+            return
+        last = batch[-1]
+        cursor = (last.scheduled_date, last.scheduled_time, last.id)
+        yield [
+            appointment for appointment in batch
+            if now < datetime.combine(appointment.scheduled_date, appointment.scheduled_time) <= window_end
+        ]
+
+
+def send_due_reminders(now=None, lead_hours=None, batch_size=500, kind=AppointmentReminder.KIND_UPCOMING):
+    """Queue reminders not yet sent for appointments in the window. Returns the number queued."""
+    now = now or timezone.now()
+    lead = timedelta(hours=lead_hours or getattr(settings, 'APPOINTMENT_REMINDER_LEAD_HOURS', 24))
+    queued_total = 0
+    for batch in iter_due_batches(now, lead, batch_size):
+        if not batch:
+            continue
+        try:
+            queued_total += _queue_batch(batch, kind)
+        except IntegrityError:
+            # An overlapping sweep recorded some of these first; whatever it
+            # did not cover is picked up by the next run
+            continue
+    return queued_total
+
+
+def _queue_batch(batch, kind):
+    """Record and queue one batch's unsent reminders in one transaction. Returns the number queued."""
+    appointments = {appointment.id: appointment for appointment in batch}
+    with transaction.atomic():
+        # Rows another sweep is working on are left to it
+        locked = set(
+            Appointment.objects.select_for_update(skip_locked=True)
+            .filter(id__in=appointments).values_list('id', flat=True)
+        )
+        already_sent = set(
+            AppointmentReminder.objects.filter(appointment_id__in=locked, kind=kind)
+            .values_list('appointment_id', 'recipient')
+        )
+        messages, records = [], []
+        for appointment_id in sorted(locked):
+            appointment = appointments[appointment_id]
+            for recipient in ('client', 'agent'):
+                if (appointment_id, recipient) in already_sent:
+                    continue
+                message = build_reminder(appointment, recipient)
+                if not message.to[0]:
+                    continue
+                messages.append(message)
+                records.append(AppointmentReminder(appointment=appointment, recipient=recipient, kind=kind))
+        if messages:
+            # No ignore_conflicts: a reminder already recorded elsewhere rolls
+            # back this batch's emails instead of queueing them twice
+            AppointmentReminder.objects.bulk_create(records)
+            enqueue_messages(messages)
+    return len(messages)
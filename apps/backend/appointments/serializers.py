@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Appointment
+from .models import Appointment, AgentAvailability, AgentBlackout
 from listings.models import Listing
 
 
@@ -63,7 +63,7 @@ class AppointmentSerializer(serializers.ModelSerializer):
                     listing=listing,
                     scheduled_date=scheduled_date,
                     scheduled_time=scheduled_time,
-                    status__in=['pending', 'confirmed']
+                    status__in=Appointment.ACTIVE_STATUSES
                 )
                 
                 # Exclude current instance when updating
@@ -100,17 +100,51 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
                 "scheduled_date": "Cannot schedule appointments in the past."
             })
         
-        # Check for conflicts
-        conflict = Appointment.objects.filter(
-            listing=attrs['listing'],
-            scheduled_date=attrs['scheduled_date'],
-            scheduled_time=attrs['scheduled_time'],
-            status__in=['pending', 'confirmed']
-        )
-        
-        if conflict.exists():
+        # Slot conflicts are enforced by the unique_active_appointment_slot
+        # constraint at insert time (see AppointmentViewSet.perform_create)
+        return attrs
+
+
+class AgentAvailabilitySerializer(serializers.ModelSerializer):
+    """Serializer for an agent's weekly availability windows"""
+
+    class Meta:
+        model = AgentAvailability
+        fields = ['id', 'weekday', 'start_time', 'end_time', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def validate(self, attrs):
+        """Window must end after it starts"""
+        start_time = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        if start_time and end_time and end_time <= start_time:
             raise serializers.ValidationError({
-                "scheduled_time": "This time slot is already booked for this listing."
+                "end_time": "End time must be after start time."
             })
-        
         return attrs
+
+
+class AgentBlackoutSerializer(serializers.ModelSerializer):
+    """Serializer for an agent's blackout dates"""
+
+    class Meta:
+        model = AgentBlackout
+        fields = ['id', 'date', 'reason', 'created_at']
+        read_only_fields = ['id', 'created_at']
+
+
+class FreeSlotSerializer(serializers.Serializer):
+    """A bookable slot returned by the slots endpoint"""
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+
+class AppointmentBulkStatusSerializer(serializers.Serializer):
+    """Payload for moving many appointments to one status"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=200,
+    )
+    status = serializers.ChoiceField(choices=Appointment.STATUS_CHOICES)
@@ -0,0 +1,90 @@
+"""
+Free-slot computation for agent viewings.
+
+Slots are derived from an agent's weekly AgentAvailability windows minus
+AgentBlackout dates and the intervals already taken by pending/confirmed
+appointments. Everything is loaded with one query per table for the whole
+range and the rest is interval arithmetic in minutes since midnight.
+"""
+from collections import defaultdict
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Appointment, AgentAvailability, AgentBlackout
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _as_time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+def subtract_intervals(window, busy):
+    """Return the parts of `window` (start, end) not covered by the sorted `busy` intervals."""
+    start, end = window
+    free = []
+    for busy_start, busy_end in busy:
+        if busy_end <= start or busy_start >= end:
+            continue
+        if busy_start > start:
+            free.append((start, busy_start))
+        start = max(start, busy_end)
+        if start >= end:
+            break
+    if start < end:
+        free.append((start, end))
+    return free
+
+
+def compute_free_slots(agent, date_from, date_to, slot_minutes=None, now=None):
+    """
+    Return free slots for `agent` between `date_from` and `date_to` (inclusive)
+    as a list of {'date', 'start_time', 'end_time'} dicts in chronological order.
+    """
+    slot_minutes = slot_minutes or getattr(settings, 'APPOINTMENT_SLOT_MINUTES', 60)
+    now = timezone.localtime(now or timezone.now())
+
+    windows = defaultdict(list)
+    for window in AgentAvailability.objects.filter(agent=agent).only('weekday', 'start_time', 'end_time'):
+        windows[window.weekday].append((_minutes(window.start_time), _minutes(window.end_time)))
+    if not windows:
+        return []
+
+    blackouts = set(
+        AgentBlackout.objects.filter(
+            agent=agent, date__range=(date_from, date_to)
+        ).order_by().values_list('date', flat=True)
+    )
+
+    busy = defaultdict(list)
+    for booked_date, booked_time in Appointment.objects.filter(
+        agent=agent,
+        status__in=Appointment.ACTIVE_STATUSES,
+        scheduled_date__range=(date_from, date_to),
+    ).order_by().values_list('scheduled_date', 'scheduled_time'):
+        start = _minutes(booked_time)
+        busy[booked_date].append((start, start + slot_minutes))
+
+    slots = []
+    day = date_from
+    while day <= date_to:
+        if day not in blackouts and day >= now.date():
+            taken = sorted(busy.get(day, []))
+            earliest = _minutes(now) + 1 if day == now.date() else 0
+            for window in sorted(windows.get(day.weekday(), [])):
+                for free_start, free_end in subtract_intervals(window, taken):
+                    start = free_start
+                    while start + slot_minutes <= free_end:
+                        if start >= earliest:
+                            slots.append({
+                                'date': day,
+                                'start_time': _as_time(start),
+                                'end_time': _as_time(start + slot_minutes),
+                            })
+                        start += slot_minutes
+        day += timedelta(days=1)
+    return slots
@@ -1,3 +1,406 @@
-from django.test import TestCase
+import threading
+import time as time_module
+from datetime import date, datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail, signing
+from django.db import IntegrityError, OperationalError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.mail import deliver_outbox
+from core.models import OutboundEmail
+from listings.models import Listing
+from users.models import User
+from .calendar import TOKEN_SALT
+from .models import AgentAvailability, AgentBlackout, Appointment, AppointmentReminder
+from .reminders import send_due_reminders
+from .slots import compute_free_slots, subtract_intervals
+
+
+def make_listing(agent):
+    return Listing.objects.create(
+        title='Garden flat', description='Two bedroom flat', property_type='apartment',
+        address='1 Ngong Rd', city='Nairobi', state='Nairobi', zip_code='00100',
+        price=50000, bedrooms=2, bathrooms=1, square_feet=900, agent=agent,
+    )
+
+
+class AppointmentBookingTests(TestCase):
+    def setUp(self):
+        self.agent = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.client_user = User.objects.create_user('client', 'client@example.com', 'pw')
+        self.listing = make_listing(self.agent)
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+        self.payload = {
+            'listing': self.listing.id,
+            'scheduled_date': (date.today() + timedelta(days=2)).isoformat(),
+            'scheduled_time': '10:00',
+        }
+
+    def test_taken_slot_returns_409(self):
+        self.assertEqual(self.api.post('/api/appointments/', self.payload).status_code, 201)
+        response = self.api.post('/api/appointments/', self.payload)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['error']['code'], 'Conflict')
+
+    def test_cancelled_slot_can_be_rebooked(self):
+        self.assertEqual(self.api.post('/api/appointments/', self.payload).status_code, 201)
+        Appointment.objects.update(status='cancelled')
+        self.assertEqual(self.api.post('/api/appointments/', self.payload).status_code, 201)
+
+
+
+
+class BulkStatusTests(TestCase):
+    url = '/api/appointments/bulk_status/'
+
+    def setUp(self):
+        self.agent = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        other_agent = User.objects.create_user('agent2', 'agent2@example.com', 'pw', role='agent')
+        self.clients = [User.objects.create_user(f'client{i}', f'client{i}@example.com', 'pw') for i in range(2)]
+        self.listing = make_listing(self.agent)
+        day = date.today() + timedelta(days=2)
+        self.first, self.second, self.done = [
+            Appointment.objects.create(
+                listing=self.listing, client=client, agent=self.agent,
+                scheduled_date=day, scheduled_time=time(hour, 0), status=status,
+            )
+            for client, hour, status in (
+                (self.clients[0], 9, 'pending'), (self.clients[0], 10, 'pending'), (self.clients[1], 11, 'confirmed'),
+            )
+        ]
+        self.foreign = Appointment.objects.create(
+            listing=make_listing(other_agent), client=self.clients[1], agent=other_agent,
+            scheduled_date=day, scheduled_time=time(9, 0),
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.agent)
+
+    def test_updates_owned_appointments_and_reports_each_id(self):
+        ids = [self.first.id, self.second.id, self.done.id, self.foreign.id, 999999, self.first.id]
+        response = self.api.post(self.url, {'ids': ids, 'status': 'confirmed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['results'], [
+            {'id': self.first.id, 'result': 'updated'},
+            {'id': self.second.id, 'result': 'updated'},
+            {'id': self.done.id, 'result': 'unchanged'},
+            {'id': self.foreign.id, 'result': 'not_found'},
+            {'id': 999999, 'result': 'not_found'},
+        ])
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.status, 'pending')
+        self.assertEqual(
+            set(Appointment.objects.filter(agent=self.agent).values_list('status', flat=True)), {'confirmed'}
+        )
+
+        # One email per affected client, listing every changed viewing
+        emails = list(OutboundEmail.objects.all())
+        self.assertEqual([email.to for email in emails], [['client0@example.com']])
+        self.assertEqual(emails[0].body.count('Garden flat'), 2)
+
+    def test_double_booking_returns_409_and_changes_nothing(self):
+        Appointment.objects.filter(pk=self.first.pk).update(status='cancelled')
+        Appointment.objects.create(
+            listing=self.listing, client=self.clients[1], agent=self.agent,
+            scheduled_date=self.first.scheduled_date, scheduled_time=self.first.scheduled_time,
+        )
+        response = self.api.post(self.url, {'ids': [self.first.id, self.second.id], 'status': 'pending'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Appointment.objects.get(pk=self.first.pk).status, 'cancelled')
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_failed_enqueue_rolls_back_the_status_change(self):
+        with mock.patch('appointments.notifications.enqueue_messages', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                self.api.post(self.url, {'ids': [self.first.id], 'status': 'confirmed'}, format='json')
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.status, 'pending')
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_clients_cannot_bulk_update(self):
+        api = APIClient()
+        api.force_authenticate(self.clients[0])
+        response = api.post(self.url, {'ids': [self.first.id], 'status': 'cancelled'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+class AppointmentListTests(TestCase):
+    url = '/api/appointments/'
+
+    def setUp(self):
+        self.agent = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.client_user = User.objects.create_user('client', 'client@example.com', 'pw')
+        listing = make_listing(self.agent)
+        today = date.today()
+        self.past, self.soon, self.later, self.cancelled = [
+            Appointment.objects.create(
+                listing=listing, client=self.client_user, agent=self.agent,
+                scheduled_date=today + timedelta(days=days), scheduled_time=time(10, 0), status=status,
+            )
+            for days, status in ((-3, 'completed'), (2, 'pending'), (10, 'confirmed'), (4, 'cancelled'))
+        ]
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_user)
+
+    def ids(self, **params):
+        response = self.api.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(appointment['id'] for appointment in response.data['results'])
+
+    def test_filters_by_upcoming_dates_and_status(self):
+        self.assertEqual(self.ids(upcoming='true'), [self.soon.id, self.later.id])
+        self.assertEqual(self.ids(upcoming='false'), [self.past.id, self.cancelled.id])
+        start = date.today() + timedelta(days=1)
+        self.assertEqual(self.ids(**{'from': start.isoformat()}), [self.soon.id, self.later.id, self.cancelled.id])
+        self.assertEqual(
+            self.ids(**{'from': start.isoformat(), 'to': (start + timedelta(days=5)).isoformat()}),
+            [self.soon.id, self.cancelled.id],
+        )
+        self.assertEqual(self.ids(status='pending,completed'), [self.past.id, self.soon.id])
+        listed = self.api.get(self.url, {'status': 'confirmed'}).data['results']
+        self.assertTrue(listed[0]['is_upcoming'])
+
+    def test_invalid_dates_return_400(self):
+        for params in ({'from': '2026-02-30'}, {'to': 'soon'}):
+            self.assertEqual(self.api.get(self.url, params).status_code, 400)
+
+    def test_update_response_reflects_the_write(self):
+        self.api.force_authenticate(self.agent)
+        response = self.api.patch(f'{self.url}{self.soon.id}/', {'status': 'cancelled'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'cancelled')
+        self.assertFalse(response.data['is_upcoming'])
+
+
+class CalendarFeedTests(TestCase):
+    feed_url = '/api/appointments/calendar.ics'
+
+    def setUp(self):
+        self.agent = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        client_user = User.objects.create_user('client', 'client@example.com', 'pw', first_name='Ann', last_name='Wanjiru')
+        self.appointment = Appointment.objects.create(
+            listing=make_listing(self.agent), client=client_user, agent=self.agent,
+            scheduled_date=date.today() + timedelta(days=2), scheduled_time=time(10, 0), notes='Bring ID',
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.agent)
+
+    def token(self, method='get'):
+        return getattr(self.api, method)('/api/appointments/calendar_token/').data['token']
+
+    def test_feed_is_served_with_etag_and_revalidates(self):
+        token = self.token()
+        response = self.client.get(self.feed_url, {'token': token})
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn(f'UID:appointment-{self.appointment.pk}@keja', body)
+        self.assertIn('Viewing with Ann Wanjiru', body)
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.feed_url, {'token': token}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.appointment.status = 'confirmed'
+        self.appointment.save()
+        self.assertEqual(self.client.get(self.feed_url, {'token': token}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_tampered_and_forged_tokens_are_rejected(self):
+        token = self.token()
+        self.assertEqual(self.client.get(self.feed_url, {'token': token[:-2] + 'xx'}).status_code, 403)
+        forged = signing.dumps({'agent': self.agent.pk}, salt=TOKEN_SALT, compress=True)
+        self.assertEqual(self.client.get(self.feed_url, {'token': forged}).status_code, 403)
+        self.assertEqual(self.client.get(self.feed_url).status_code, 403)
+
+    def test_rotation_deactivation_and_role_change_revoke_tokens(self):
+        old = self.token()
+        new = self.token('post')
+        self.assertEqual(self.client.get(self.feed_url, {'token': old}).status_code, 403)
+        self.assertEqual(self.client.get(self.feed_url, {'token': new}).status_code, 200)
+
+        with self.settings(CALENDAR_TOKEN_MAX_AGE_DAYS=0):
+            self.assertEqual(self.client.get(self.feed_url, {'token': new}).status_code, 403)
+
+        self.agent.role = 'client'
+        self.agent.save()
+        self.assertEqual(self.client.get(self.feed_url, {'token': new}).status_code, 403)
+        self.agent.role = 'agent'
+        self.agent.save()
+        current = self.token()
+        self.agent.is_active = False
+        self.agent.save()
+        self.assertEqual(self.client.get(self.feed_url, {'token': current}).status_code, 403)
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Many clients racing for the same slot must produce exactly one booking."""
+
+    workers = 8
+
+    def test_no_double_booking(self):
+        agent = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        listing = make_listing(agent)
+        clients = [
+            User.objects.create_user(f'client{i}', f'client{i}@example.com', 'pw')
+            for i in range(self.workers)
+        ]
+        payload = {
+            'listing': listing.id,
+            'scheduled_date': (date.today() + timedelta(days=2)).isoformat(),
+            'scheduled_time': time(11, 0).isoformat(),
+        }
+        barrier = threading.Barrier(self.workers)
+        results = {}
+
+        def book(user):
+            api = APIClient()
+            api.force_authenticate(user)
+            barrier.wait()
+            try:
+                # SQLite's shared in-memory test database reports writer contention
+                # as "table is locked" instead of blocking, and a failed attempt may
+                # still have stored the booking; retry like a client would, then
+                # check whether the 409 is for the client's own booking.
+                for attempt in range(50):
+                    try:
+                        status_code = api.post('/api/appointments/', payload).status_code
+                    except OperationalError:
+                        time_module.sleep(0.01)
+                        continue
+                    if status_code == 409 and attempt and Appointment.objects.filter(
+                        client=user, status__in=Appointment.ACTIVE_STATUSES
+                    ).exists():
+                        status_code = 201
+                    results[user.pk] = status_code
+                    return
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(user,)) for user in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        statuses = sorted(results.values())
+        self.assertEqual(statuses, [201] + [409] * (self.workers - 1))
+        booked = Appointment.objects.filter(
+            agent=agent, scheduled_date=payload['scheduled_date'], scheduled_time=payload['scheduled_time'],
+            status__in=Appointment.ACTIVE_STATUSES,
+        )
+        self.assertEqual(booked.count(), 1)
+        winner = next(pk for pk, status_code in results.items() if status_code == 201)
+        self.assertEqual(booked.get().client_id, winner)
+
+
+class SubtractIntervalsTests(SimpleTestCase):
+    def test_busy_intervals_are_cut_out_of_the_window(self):
+        self.assertEqual(subtract_intervals((540, 720), []), [(540, 720)])
+        self.assertEqual(subtract_intervals((540, 720), [(600, 660)]), [(540, 600), (660, 720)])
+        # Overlapping and touching busy intervals, one starting before the window
+        self.assertEqual(
+            subtract_intervals((540, 720), [(500, 570), (600, 660), (630, 690)]),
+            [(570, 600), (690, 720)],
+        )
+        self.assertEqual(subtract_intervals((540, 720), [(540, 600), (600, 720)]), [])
+        self.assertEqual(subtract_intervals((540, 600), [(400, 500), (700, 800)]), [(540, 600)])
+
+
+class FreeSlotTests(TestCase):
+    def setUp(self):
+        self.agent = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.client_user = User.objects.create_user('client', 'client@example.com', 'pw')
+        self.listing = make_listing(self.agent)
+        today = timezone.localdate()
+        self.monday = today + timedelta(days=7 - today.weekday())
+        self.now = timezone.make_aware(datetime.combine(self.monday - timedelta(days=1), time(12, 0)))
+        AgentAvailability.objects.create(agent=self.agent, weekday=0, start_time=time(9, 0), end_time=time(13, 0))
+
+    def book(self, at, status='pending'):
+        Appointment.objects.create(
+            listing=self.listing, client=self.client_user, agent=self.agent,
+            scheduled_date=self.monday, scheduled_time=at, status=status,
+        )
+
+    def starts(self, date_from, date_to, now=None):
+        return [
+            (slot['date'], slot['start_time'])
+            for slot in compute_free_slots(self.agent, date_from, date_to, slot_minutes=60, now=now or self.now)
+        ]
+
+    def test_booked_and_overlapping_appointments_are_excluded(self):
+        self.book(time(10, 0))
+        self.book(time(10, 30))  # overlaps the 10:00 booking
+        self.book(time(9, 0), status='cancelled')
+        self.assertEqual(
+            self.starts(self.monday, self.monday + timedelta(days=6)),
+            [(self.monday, time(9, 0)), (self.monday, time(11, 30))],
+        )
+
+    def test_blackouts_and_past_times_are_excluded(self):
+        self.assertEqual(len(self.starts(self.monday, self.monday)), 4)
+        during = timezone.make_aware(datetime.combine(self.monday, time(10, 30)))
+        self.assertEqual(
+            self.starts(self.monday, self.monday, now=during),
+            [(self.monday, time(11, 0)), (self.monday, time(12, 0))],
+        )
+        AgentBlackout.objects.create(agent=self.agent, date=self.monday)
+        self.assertEqual(self.starts(self.monday, self.monday), [])
+
+    def test_slots_endpoint_rejects_invalid_dates(self):
+        url = f'/api/listings/{self.listing.id}/slots/'
+        self.assertEqual(APIClient().get(url, {'from': self.monday.isoformat()}).status_code, 200)
+        for params in ({'from': '2026-02-30'}, {'to': 'soon'}, {'from': '2026-03-10', 'to': '2026-03-01'}):
+            self.assertEqual(APIClient().get(url, params).status_code, 400)
+
+
+class ReminderSweepTests(TestCase):
+    def setUp(self):
+        self.agent = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.client_user = User.objects.create_user('client', 'client@example.com', 'pw')
+        self.listing = make_listing(self.agent)
+        self.start = datetime.combine(timezone.localdate() + timedelta(days=3), time(9, 0))
+        self.now = timezone.make_aware(self.start)
+
+    def book(self, offset, status='pending'):
+        at = self.start + offset
+        return Appointment.objects.create(
+            listing=self.listing, client=self.client_user, agent=self.agent,
+            scheduled_date=at.date(), scheduled_time=at.time(), status=status,
+        )
+
+    def test_only_appointments_inside_the_window_are_reminded(self):
+        inside = [self.book(timedelta(minutes=1)), self.book(timedelta(hours=24))]
+        self.book(timedelta(0))  # starts now: too late to remind
+        self.book(timedelta(hours=24, minutes=1))  # not due yet
+        self.book(timedelta(hours=2), status='cancelled')
+
+        self.assertEqual(send_due_reminders(now=self.now, lead_hours=24, batch_size=1), 4)
+        self.assertEqual(
+            sorted(AppointmentReminder.objects.values_list('appointment_id', 'recipient')),
+            sorted((appointment.id, recipient) for appointment in inside for recipient in ('client', 'agent')),
+        )
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(deliver_outbox(), 4)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['agent@example.com', 'agent@example.com', 'client@example.com', 'client@example.com'],
+        )
+
+    def test_sweeps_are_idempotent_and_failed_batches_are_retried(self):
+        self.book(timedelta(hours=1))
+        with mock.patch('appointments.reminders.enqueue_messages', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                send_due_reminders(now=self.now)
+        self.assertFalse(AppointmentReminder.objects.exists())
+
+        self.assertEqual(send_due_reminders(now=self.now), 2)
+        self.assertEqual(send_due_reminders(now=self.now), 0)
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_batch_recorded_by_an_overlapping_sweep_is_not_queued_again(self):
+        self.book(timedelta(hours=1))
+        conflict = IntegrityError('UNIQUE constraint failed')
+        with mock.patch.object(AppointmentReminder.objects, 'bulk_create', side_effect=conflict):
+            self.assertEqual(send_due_reminders(now=self.now), 0)
+        self.assertFalse(OutboundEmail.objects.exists())
+        self.assertEqual(send_due_reminders(now=self.now), 2)
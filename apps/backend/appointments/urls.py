@@ -1,10 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AppointmentViewSet
+from .views import AppointmentViewSet, AgentAvailabilityViewSet, AgentBlackoutViewSet, calendar_feed
 
 router = DefaultRouter()
+# Register fixed prefixes before the appointment pk route
+router.register(r'availability', AgentAvailabilityViewSet, basename='agent-availability')
+router.register(r'blackouts', AgentBlackoutViewSet, basename='agent-blackout')
 router.register(r'', AppointmentViewSet, basename='appointment')
 
 urlpatterns = [
+    path('calendar.ics', calendar_feed, name='appointment-calendar'),
     path('', include(router.urls)),
 ]
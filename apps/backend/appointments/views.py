@@ -1,7 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import HttpResponseForbidden, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.http import condition, require_GET
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from .models import Appointment
-from .serializers import AppointmentSerializer, AppointmentCreateSerializer
+from core.exceptions import Conflict
+from core.idempotency import idempotent
+from core.params import date_param
+from .calendar import feed_etag, iter_calendar, make_calendar_token, read_calendar_token
+from .models import Appointment, AgentAvailability, AgentBlackout
+from .notifications import notify_status_change
+from .serializers import (
+    AppointmentSerializer,
+    AppointmentCreateSerializer,
+    AppointmentBulkStatusSerializer,
+    AgentAvailabilitySerializer,
+    AgentBlackoutSerializer,
+)
+
+User = get_user_model()
+
+
+class IsAgent(permissions.BasePermission):
+    """Only agents may manage availability"""
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.is_agent
 
 
 class AppointmentViewSet(viewsets.ModelViewSet):
@@ -9,28 +38,55 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     ViewSet for appointment operations
     
     list: GET /api/appointments/ - Get user's appointments
+          (?upcoming=true|false, ?from=&to= date range, ?status=pending,confirmed)
     retrieve: GET /api/appointments/{id}/ - Get appointment details
     create: POST /api/appointments/ - Create new appointment
     update: PATCH /api/appointments/{id}/ - Update appointment status
+    bulk_status: POST /api/appointments/bulk_status/ - Agent moves many appointments to one status
     destroy: DELETE /api/appointments/{id}/ - Cancel appointment
     """
     
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        """Get appointments based on user role"""
+        """Get appointments based on user role, filtered in SQL by query params"""
         user = self.request.user
         
         if user.is_agent:
             # Agents see appointments for their listings
-            return Appointment.objects.filter(
-                agent=user
-            ).select_related('listing', 'client', 'agent')
+            queryset = Appointment.objects.filter(agent=user)
         else:
             # Clients see their own appointments
-            return Appointment.objects.filter(
-                client=user
-            ).select_related('listing', 'client', 'agent')
+            queryset = Appointment.objects.filter(client=user)
+        
+        params = self.request.query_params
+        
+        # ?upcoming=true / ?upcoming=false
+        upcoming = params.get('upcoming')
+        if upcoming is not None:
+            if upcoming.lower() in ('1', 'true', 'yes'):
+                queryset = queryset.upcoming()
+            elif upcoming.lower() in ('0', 'false', 'no'):
+                queryset = queryset.not_upcoming()
+        
+        # ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive, on scheduled_date)
+        try:
+            date_from = date_param(self.request, 'from')
+            date_to = date_param(self.request, 'to')
+        except ValueError as exc:
+            raise ValidationError({'error': str(exc)})
+        if date_from or date_to:
+            queryset = queryset.between(date_from, date_to)
+        
+        # ?status=pending or ?status=pending,confirmed
+        status_param = params.get('status')
+        if status_param:
+            queryset = queryset.filter(status__in=status_param.split(','))
+        
+        if self.action in ('list', 'retrieve'):
+            # Only for read-only responses: after a write the flag would be stale
+            queryset = queryset.with_upcoming()
+        return queryset.select_related('listing', 'client', 'agent')
     
     def get_serializer_class(self):
         """Return appropriate serializer based on action"""
@@ -38,13 +94,31 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             return AppointmentCreateSerializer
         return AppointmentSerializer
     
+    slot_conflict_message = 'This time slot is already booked for this listing.'
+    
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
-        """Create appointment with client and agent"""
+        """Create appointment with client and agent; a taken slot fails the insert with 409"""
         listing = serializer.validated_data['listing']
-        serializer.save(
-            client=self.request.user,
-            agent=listing.agent
-        )
+        try:
+            with transaction.atomic():
+                serializer.save(
+                    client=self.request.user,
+                    agent=listing.agent
+                )
+        except IntegrityError:
+            raise Conflict(self.slot_conflict_message)
+    
+    def perform_update(self, serializer):
+        """Save changes; a concurrent booking of the new slot fails with 409"""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise Conflict(self.slot_conflict_message)
     
     def update(self, request, *args, **kwargs):
         """Update appointment: client can update date/time/notes; agent can update status."""
@@ -80,6 +154,63 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         self.perform_update(serializer)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['post'], permission_classes=[IsAgent])
+    def bulk_status(self, request):
+        """
+        Move many of the agent's appointments to one status in a single UPDATE
+        POST /api/appointments/bulk_status/ body {ids: [1, 2], status: "confirmed"}
+        """
+        serializer = AppointmentBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        new_status = serializer.validated_data['status']
+        
+        with transaction.atomic():
+            # Ownership is part of the WHERE clause; other agents' ids read as not found
+            owned = {
+                appointment.id: appointment
+                for appointment in Appointment.objects.select_for_update().filter(
+                    agent=request.user, id__in=ids
+                ).select_related('client', 'listing')
+            }
+            changed = [pk for pk, appointment in owned.items() if appointment.status != new_status]
+            if changed:
+                try:
+                    with transaction.atomic():
+                        Appointment.objects.filter(agent=request.user, id__in=changed).update(
+                            status=new_status, updated_at=timezone.now()
+                        )
+                except IntegrityError:
+                    raise Conflict('One or more appointments would double-book a time slot.')
+                # Queued in the same transaction: a failed enqueue rolls back the change
+                notify_status_change([owned[pk] for pk in changed], new_status)
+        
+        results = []
+        for pk in ids:
+            if pk not in owned:
+                outcome = 'not_found'
+            elif pk in changed:
+                outcome = 'updated'
+            else:
+                outcome = 'unchanged'
+            results.append({'id': pk, 'result': outcome})
+        return Response({'status': new_status, 'updated': len(changed), 'results': results})
+    
+    @action(detail=False, methods=['get', 'post'], permission_classes=[IsAgent])
+    def calendar_token(self, request):
+        """
+        Subscription URL for the agent's iCalendar feed
+        GET  /api/appointments/calendar_token/
+        POST /api/appointments/calendar_token/ - rotate: earlier feed URLs stop working
+        """
+        agent = request.user
+        if request.method == 'POST':
+            User.objects.filter(pk=agent.pk).update(calendar_feed_version=F('calendar_feed_version') + 1)
+        agent = User.objects.only('pk', 'token_version', 'calendar_feed_version').get(pk=agent.pk)
+        token = make_calendar_token(agent)
+        feed_url = request.build_absolute_uri(reverse('appointment-calendar')) + f'?token={token}'
+        return Response({'token': token, 'url': feed_url})
+    
     def destroy(self, request, *args, **kwargs):
         """Cancel appointment"""
         instance = self.get_object()
@@ -98,3 +229,63 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             {'message': 'Appointment cancelled successfully'},
             status=status.HTTP_200_OK
         )
+
+
+class AgentAvailabilityViewSet(viewsets.ModelViewSet):
+    """
+    Weekly availability windows for the current agent
+
+    list/create: GET/POST /api/appointments/availability/
+    update/destroy: PATCH/DELETE /api/appointments/availability/{id}/
+    """
+
+    serializer_class = AgentAvailabilitySerializer
+    permission_classes = [IsAgent]
+
+    def get_queryset(self):
+        return AgentAvailability.objects.filter(agent=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(agent=self.request.user)
+
+
+class AgentBlackoutViewSet(viewsets.ModelViewSet):
+    """
+    Blackout dates for the current agent
+
+    list/create: GET/POST /api/appointments/blackouts/
+    destroy: DELETE /api/appointments/blackouts/{id}/
+    """
+
+    serializer_class = AgentBlackoutSerializer
+    permission_classes = [IsAgent]
+
+    def get_queryset(self):
+        return AgentBlackout.objects.filter(agent=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(agent=self.request.user)
+
+
+def _calendar_etag(request):
+    agent_id = read_calendar_token(request.GET.get('token', ''))
+    request.calendar_agent_id = agent_id
+    return feed_etag(agent_id) if agent_id else None
+
+
+@require_GET
+@condition(etag_func=_calendar_etag)
+def calendar_feed(request):
+    """
+    Streaming iCalendar feed of the agent's appointments
+    GET /api/appointments/calendar.ics?token=<token from calendar_token>
+    """
+    if not request.calendar_agent_id:
+        return HttpResponseForbidden('Invalid calendar token.')
+    response = StreamingHttpResponse(
+        iter_calendar(request.calendar_agent_id),
+        content_type='text/calendar; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'inline; filename="keja-appointments.ics"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
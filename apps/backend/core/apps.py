@@ -5,3 +5,7 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     label = 'core'
+
+    def ready(self):
+        from .querycache import connect_signals
+        connect_signals()
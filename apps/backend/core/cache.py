@@ -0,0 +1,272 @@
+"""
+Two-level cache with versioned namespaces.
+
+Each `Namespace` (create one per feature with `namespace(name, ...)`) reads
+through an L1 per-process LRU, bounded by entry count and bytes and with a
+short TTL, then the shared Django cache (L2: Redis when REDIS_URL is set, else
+the file cache; see CACHES). Values are pickled and zlib-compressed above
+CACHE_COMPRESS_MIN_BYTES; L1 holds the same bytes, so callers always get a
+private copy.
+
+Invalidation is by version: `ns.invalidate()` drops every key in the
+namespace and `ns.invalidate(group)` every key stored under that group (a key
+can be stored under several groups and is dropped when any of them is).
+Versions live in L2 and are re-read at most every CACHE_VERSION_CHECK_SECONDS,
+which bounds how long another process can serve an invalidated L1 entry.
+
+`ns.get_or_set(key, loader)` coalesces concurrent misses: threads of one
+process wait for a single loader call, and other processes wait briefly on an
+L2 lock for its result. `stats()` reports per-namespace hit/miss counters for
+this process.
+
+Versions are random tokens written with a plain `set`, so invalidation is safe
+on every backend. The L2 lock (`add`) is only atomic on Redis: on the file
+cache two processes can both take it and run the loader twice. Multi-worker
+deployments should set REDIS_URL.
+"""
+import hashlib
+import pickle
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+_RAW = b'p'
+_COMPRESSED = b'z'
+_MISSING = object()
+
+
+def pack(value, compress_min_bytes):
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) >= compress_min_bytes:
+        return _COMPRESSED + zlib.compress(data, 6)
+    return _RAW + data
+
+
+def unpack(data):
+    if data[:1] == _COMPRESSED:
+        return pickle.loads(zlib.decompress(data[1:]))
+    return pickle.loads(data[1:])
+
+
+class LRUCache:
+    """Thread-safe LRU of bytes values with a per-entry TTL and entry/byte bounds."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            data, expires = item
+            if expires <= now:
+                self._remove(key)
+                return None
+            self._items.move_to_end(key)
+            return data
+
+    def set(self, key, data, ttl, now):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._items[key] = (data, now + ttl)
+            self.size += len(data)
+            while len(self._items) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._items)))
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.size -= len(item[0])
+
+
+class Namespace:
+    """A named, versioned key space over L1 and L2 (see module docstring)."""
+
+    def __init__(self, name, ttl=300, l1_ttl=5, alias='default', lock_timeout=10):
+        self.name = name
+        self.ttl = ttl
+        self.l1_ttl = l1_ttl
+        self.alias = alias
+        self.lock_timeout = lock_timeout
+        self.metrics = Counter()
+        self.l1 = LRUCache(
+            getattr(settings, 'CACHE_L1_MAX_ENTRIES', 1000),
+            getattr(settings, 'CACHE_L1_MAX_BYTES', 8 * 1024 * 1024),
+        )
+        self._versions = {}
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+    @property
+    def l2(self):
+        return caches[self.alias]
+
+    # Versions
+
+    def _version_key(self, group):
+        return f'ns:{self.name}:version' if group is None else f'ns:{self.name}:{group}:version'
+
+    def _version(self, group, now):
+        cached = self._versions.get(group)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        version = self.l2.get(self._version_key(group))
+        if version is None:
+            # A random start, so an evicted version never revives old entries
+            self.l2.add(self._version_key(group), uuid.uuid4().hex, None)
+            version = self.l2.get(self._version_key(group))
+        self._versions[group] = (version, now + getattr(settings, 'CACHE_VERSION_CHECK_SECONDS', 2))
+        return version
+
+    def invalidate(self, group=None):
+        """Drop every key in the namespace, or only those stored under `group`."""
+        # A fresh random version rather than incr(): a plain set is safe on every
+        # backend, and concurrent invalidations can never land on the same version
+        version = uuid.uuid4().hex
+        self.l2.set(self._version_key(group), version, None)
+        self._versions[group] = (version, time.monotonic() + getattr(settings, 'CACHE_VERSION_CHECK_SECONDS', 2))
+        if group is None:
+            self._versions = {}
+            self.l1.clear()
+        self.metrics['invalidations'] += 1
+
+    def full_key(self, key, group=None):
+        """Versioned key; `group` may be a tuple to depend on several groups' versions."""
+        now = time.monotonic()
+        parts = [self.name, str(self._version(None, now))]
+        for name in (group if isinstance(group, tuple) else () if group is None else (group,)):
+            parts += [str(name), str(self._version(name, now))]
+        full = ':'.join(parts + [str(key)])
+        if len(full) > 200:
+            full = f'{self.name}:{hashlib.md5(full.encode()).hexdigest()}'
+        return full
+
+    # Reads and writes
+
+    def _get(self, full):
+        now = time.monotonic()
+        data = self.l1.get(full, now)
+        if data is not None:
+            self.metrics['l1_hits'] += 1
+            return unpack(data)
+        data = self.l2.get(full)
+        if data is not None:
+            self.metrics['l2_hits'] += 1
+            self.l1.set(full, data, self.l1_ttl, now)
+            return unpack(data)
+        self.metrics['misses'] += 1
+        return _MISSING
+
+    def _set(self, full, value, ttl):
+        data = pack(value, getattr(settings, 'CACHE_COMPRESS_MIN_BYTES', 1024))
+        self.l2.set(full, data, self.ttl if ttl is None else ttl)
+        self.l1.set(full, data, self.l1_ttl, time.monotonic())
+        self.metrics['sets'] += 1
+
+    def get(self, key, default=None, group=None):
+        value = self._get(self.full_key(key, group))
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl=None, group=None):
+        self._set(self.full_key(key, group), value, ttl)
+
+    def delete(self, key, group=None):
+        full = self.full_key(key, group)
+        self.l1.delete(full)
+        self.l2.delete(full)
+
+    def get_or_set(self, key, loader, ttl=None, group=None):
+        """Cached value for `key`, calling `loader()` once across concurrent misses."""
+        full = self.full_key(key, group)
+        value = self._get(full)
+        if value is not _MISSING:
+            return value
+
+        with self._flights_lock:
+            flight = self._flights.setdefault(full, threading.Lock())
+        with flight:
+            try:
+                value = self._get_quietly(full)
+                if value is not _MISSING:
+                    self.metrics['coalesced'] += 1
+                    return value
+                return self._load(full, loader, ttl)
+            finally:
+                with self._flights_lock:
+                    self._flights.pop(full, None)
+
+    def _get_quietly(self, full):
+        data = self.l1.get(full, time.monotonic())
+        if data is None:
+            data = self.l2.get(full)
+        return unpack(data) if data is not None else _MISSING
+
+    def _load(self, full, loader, ttl):
+        lock_key = f'{full}:lock'
+        locked = self.l2.add(lock_key, 1, self.lock_timeout)
+        if not locked:
+            # Another process is loading; wait for its result, then give up and load
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                data = self.l2.get(full)
+                if data is not None:
+                    self.metrics['coalesced'] += 1
+                    self.l1.set(full, data, self.l1_ttl, time.monotonic())
+                    return unpack(data)
+        try:
+            self.metrics['loads'] += 1
+            value = loader()
+            self._set(full, value, ttl)
+            return value
+        finally:
+            if locked:
+                self.l2.delete(lock_key)
+
+
+_namespaces = {}
+_registry_lock = threading.Lock()
+
+
+def namespace(name, **options):
+    """The process-wide Namespace called `name`, created with `options` on first use."""
+    with _registry_lock:
+        if name not in _namespaces:
+            _namespaces[name] = Namespace(name, **options)
+        return _namespaces[name]
+
+
+def stats():
+    """{namespace: {counter: value}} for this process, with L1 occupancy."""
+    return {
+        name: {**ns.metrics, 'l1_entries': len(ns.l1._items), 'l1_bytes': ns.l1.size}
+        for name, ns in _namespaces.items()
+    }
+
+
+def clear_local():
+    """Empty every L1 and forget cached versions (e.g. between tests)."""
+    for ns in _namespaces.values():
+        ns.l1.clear()
+        ns._versions.clear()
@@ -1,10 +1,19 @@
 """
 Custom exception handler for consistent error responses across the API.
 """
+from rest_framework import status
+from rest_framework.exceptions import APIException
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
 
 
+class Conflict(APIException):
+    """Request conflicts with the current state of a resource (e.g. a booked slot)."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The request conflicts with the current state of the resource.'
+    default_code = 'conflict'
+
+
 def custom_exception_handler(exc, context):
     """
     Return a consistent error format: { error: { code, message, details } }.
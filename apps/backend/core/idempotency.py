@@ -0,0 +1,110 @@
+"""
+Idempotency-Key support for mutating endpoints.
+
+Decorate a view method with `@idempotent`. A request without the header runs
+as usual. The first request with a key claims it with a single INSERT and its
+response (anything below 500) is stored; repeats within IDEMPOTENCY_KEY_TTL_HOURS
+replay that response after one indexed lookup. A repeat that arrives while the
+first is still running gets 409, and reusing a key with a different body gets 422.
+"""
+import functools
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .exceptions import Conflict
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used with a different request body.'
+    default_code = 'idempotency_key_reused'
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+def idempotent(view_method):
+    """Honour the Idempotency-Key header on a DRF view method (create or a POST action)."""
+
+    @functools.wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(view, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: f'Must be at most {MAX_KEY_LENGTH} characters.'})
+
+        now = timezone.now()
+        key_hash = _sha256(request.user.pk or 'anon', request.method, request.path, key)
+        fingerprint = _sha256(request.body)
+
+        record = IdempotencyKey.objects.filter(key_hash=key_hash).first()
+        if record and record.expires_at <= now:
+            record.delete()
+            record = None
+        if record:
+            if record.fingerprint != fingerprint:
+                raise IdempotencyKeyReused()
+            if record.status_code is None:
+                raise Conflict('A request with this Idempotency-Key is still being processed.')
+            response = Response(record.response_body, status=record.status_code)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    key_hash=key_hash, fingerprint=fingerprint, expires_at=now + _ttl()
+                )
+        except IntegrityError:
+            raise Conflict('A request with this Idempotency-Key is still being processed.')
+
+        try:
+            response = view_method(view, request, *args, **kwargs)
+        except Exception:
+            record.delete()  # nothing was stored, so a retry may run again
+            raise
+
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                status_code=response.status_code, response_body=response.data
+            )
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys(batch_size=5000):
+    """Delete expired keys in index-ordered batches. Returns the number removed."""
+    removed = 0
+    now = timezone.now()
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=now)
+            .order_by('expires_at').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return removed
+        removed += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,106 @@
+"""
+Outbound email queue.
+
+Request handlers call `enqueue_email`/`enqueue_messages`, which only INSERT into
+OutboundEmail. `deliver_outbox` (run by run_scheduler, or
+`python manage.py deliver_outbox`) claims due messages in batches, sends each
+batch over one mail connection, and reschedules failures with exponential
+backoff until OUTBOX_MAX_ATTEMPTS.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def _default_from():
+    return getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@keja.com')
+
+
+def enqueue_messages(messages):
+    """Queue EmailMessage objects with one INSERT. Messages without recipients are dropped."""
+    now = timezone.now()
+    rows = [
+        OutboundEmail(
+            subject=message.subject[:255],
+            body=message.body,
+            from_email=message.from_email or _default_from(),
+            to=list(message.to),
+            next_attempt_at=now,
+        )
+        for message in messages
+        if any(message.to)
+    ]
+    return OutboundEmail.objects.bulk_create(rows)
+
+
+def enqueue_email(subject, body, to, from_email=None):
+    """Queue a plain-text email to the `to` addresses."""
+    return enqueue_messages([EmailMessage(subject=subject, body=body, from_email=from_email, to=to)])
+
+
+def _backoff(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 60)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def deliver_outbox(batch_size=100):
+    """Send due queued emails batch by batch. Returns the number sent."""
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    sent_total = 0
+    connection = get_connection()
+    try:
+        while True:
+            with transaction.atomic():
+                now = timezone.now()
+                batch = list(
+                    OutboundEmail.objects.select_for_update(skip_locked=True)
+                    .filter(status='pending', next_attempt_at__lte=now)
+                    .order_by('next_attempt_at', 'id')[:batch_size]
+                )
+                if not batch:
+                    return sent_total
+
+                try:
+                    connection.open()
+                    connection_error = None
+                except Exception as exc:
+                    connection_error = exc
+
+                for email in batch:
+                    email.attempts += 1
+                    error = connection_error
+                    if error is None:
+                        try:
+                            message = EmailMessage(email.subject, email.body, email.from_email, email.to)
+                            connection.send_messages([message])
+                        except Exception as exc:
+                            error = exc
+                    if error is None:
+                        email.status = 'sent'
+                        email.sent_at = now
+                        email.last_error = ''
+                        sent_total += 1
+                    else:
+                        email.last_error = repr(error)
+                        if email.attempts >= max_attempts:
+                            email.status = 'failed'
+                        else:
+                            email.next_attempt_at = now + _backoff(email.attempts)
+
+                OutboundEmail.objects.bulk_update(
+                    batch, ['status', 'attempts', 'last_error', 'next_attempt_at', 'sent_at']
+                )
+
+            if connection_error is not None:
+                logger.warning('Outbox delivery paused: %r', connection_error)
+                return sent_total
+    finally:
+        connection.close()
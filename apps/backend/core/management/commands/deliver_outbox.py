@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.mail import deliver_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbound emails that are due, in batches over one mail connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails claimed per transaction')
+
+    def handle(self, *args, **options):
+        sent = deliver_outbox(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} email(s).'))
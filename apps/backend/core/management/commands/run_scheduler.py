@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = 'Run the background jobs listed in SCHEDULER_JOBS, each on its own interval.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run every job once and exit')
+        parser.add_argument('--job', action='append', help='Only run jobs whose dotted path contains this text')
+        parser.add_argument('--tick', type=float, default=5.0, help='Seconds between schedule checks')
+
+    def handle(self, *args, **options):
+        jobs = [
+            (path, import_string(path), interval)
+            for path, interval in getattr(settings, 'SCHEDULER_JOBS', [])
+            if not options['job'] or any(name in path for name in options['job'])
+        ]
+        if not jobs:
+            self.stdout.write('No jobs configured.')
+            return
+
+        next_run = {path: 0.0 for path, _, _ in jobs}
+        while True:
+            for path, job, interval in jobs:
+                if time.monotonic() < next_run[path]:
+                    continue
+                self.run_job(path, job)
+                next_run[path] = time.monotonic() + interval
+            if options['once']:
+                return
+            time.sleep(options['tick'])
+
+    def run_job(self, path, job):
+        close_old_connections()
+        started = time.monotonic()
+        try:
+            result = job()
+        except Exception as exc:  # keep the scheduler alive; the job retries next interval
+            self.stderr.write(f'{path} failed: {exc!r}')
+            return
+        elapsed = (time.monotonic() - started) * 1000
+        self.stdout.write(f'{path}: {result} ({elapsed:.0f} ms)')
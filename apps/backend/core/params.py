@@ -0,0 +1,18 @@
+"""
+Shared parsing of request query parameters.
+"""
+from django.utils.dateparse import parse_date
+
+
+def date_param(request, name):
+    """Parse an optional YYYY-MM-DD query param; raises ValueError when it is not a real date"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError(f'"{name}" must be a valid YYYY-MM-DD date')
+    return parsed
@@ -0,0 +1,149 @@
+"""
+Opt-in result caching for querysets.
+
+Give a model `objects = CachedManager()` and call `.cached()` on a queryset
+(optionally `.cached(ttl=60)`): evaluating it, or calling `.get()`,
+`.first()`, `.exists()` or `.count()` on it, reads the result from the
+core.cache 'querycache' namespace, keyed by the compiled SQL and parameters.
+Querysets without `.cached()` behave as usual.
+
+Each entry is stored under one group per table its SQL mentions (joins and
+subqueries included). `post_save` and `post_delete` on models with a
+CachedManager or listed in QUERY_CACHE_EXTRA_MODELS, and bulk writes through
+a CachedQuerySet, invalidate that model's table, again on commit so a reader
+cannot re-cache rows the writer is replacing. A model joined into a cached
+query without a CachedManager must be listed in QUERY_CACHE_EXTRA_MODELS;
+writes that bypass these signals (raw SQL, bulk writes of other models) are
+only picked up when the entry expires. prefetch_related results are not
+tracked and cannot be cached.
+"""
+import functools
+import hashlib
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .cache import namespace
+
+query_cache = namespace('querycache')
+
+
+def _table_group(table):
+    return f'table:{table}'
+
+
+def invalidate_model(model, using=None):
+    group = _table_group(model._meta.db_table)
+    query_cache.invalidate(group)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: query_cache.invalidate(group), using=using)
+
+
+@functools.lru_cache(maxsize=1024)
+def _tables_in(sql, using):
+    quote = connections[using].ops.quote_name
+    return tuple(sorted({
+        model._meta.db_table for model in apps.get_models(include_auto_created=True)
+        if quote(model._meta.db_table) in sql
+    }))
+
+
+class CachedQuerySet(models.QuerySet):
+    """QuerySet whose `.cached()` clones read their results through query_cache."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_ttl = None
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._cache_ttl = self._cache_ttl
+        return clone
+
+    def cached(self, ttl=None):
+        """Clone that caches its results for `ttl` seconds (QUERY_CACHE_SECONDS by default)."""
+        if self._prefetch_related_lookups:
+            raise ValueError('cached() cannot be combined with prefetch_related().')
+        clone = self._chain()
+        clone._cache_ttl = ttl if ttl is not None else getattr(settings, 'QUERY_CACHE_SECONDS', 300)
+        return clone
+
+    def _cached_call(self, kind, query, compute):
+        sql, params = query.get_compiler(using=self.db).as_sql()
+        key = hashlib.sha256(repr((self.db, kind, sql, params)).encode()).hexdigest()
+        groups = tuple(_table_group(table) for table in _tables_in(sql, self.db))
+        return query_cache.get_or_set(key, compute, ttl=self._cache_ttl, group=groups)
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._cache_ttl is not None:
+            try:
+                kind = self._iterable_class.__name__
+                self._result_cache = self._cached_call(kind, self.query, lambda: list(self._iterable_class(self)))
+            except EmptyResultSet:
+                self._result_cache = []
+        super()._fetch_all()
+
+    def exists(self):
+        if self._result_cache is None and self._cache_ttl is not None:
+            try:
+                return self._cached_call('exists', self.query.exists(), super().exists)
+            except EmptyResultSet:
+                return False
+        return super().exists()
+
+    def count(self):
+        if self._result_cache is None and self._cache_ttl is not None:
+            try:
+                return self._cached_call('count', self.query, super().count)
+            except EmptyResultSet:
+                return 0
+        return super().count()
+
+    def bulk_create(self, *args, **kwargs):
+        objs = super().bulk_create(*args, **kwargs)
+        invalidate_model(self.model, self.db)
+        return objs
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        invalidate_model(self.model, self.db)
+        return rows
+
+    update.alters_data = True
+
+    def _raw_delete(self, using):
+        rows = super()._raw_delete(using)
+        invalidate_model(self.model, using)
+        return rows
+
+    _raw_delete.alters_data = True
+
+
+CachedManager = models.Manager.from_queryset(CachedQuerySet)
+
+
+def model_changed(sender, using=None, **kwargs):
+    invalidate_model(sender, using)
+
+
+def connect_signals():
+    """
+    Invalidate on saves and deletes of models with a CachedManager and of
+    QUERY_CACHE_EXTRA_MODELS ('app_label.ModelName').
+
+    Receivers are connected per model: one for all senders would run on every
+    save in the project, and for post_delete would make Django give up fast
+    (single-query) deletes for every model.
+    """
+    models_to_watch = {
+        model for model in apps.get_models()
+        if isinstance(model._default_manager.get_queryset(), CachedQuerySet)
+    }
+    models_to_watch.update(apps.get_model(label) for label in getattr(settings, 'QUERY_CACHE_EXTRA_MODELS', ()))
+    for model in models_to_watch:
+        label = model._meta.label
+        post_save.connect(model_changed, sender=model, dispatch_uid=f'core.querycache.saved.{label}')
+        post_delete.connect(model_changed, sender=model, dispatch_uid=f'core.querycache.deleted.{label}')
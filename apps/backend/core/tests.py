@@ -0,0 +1,145 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.test import SimpleTestCase, TestCase
+
+from payments.models import SubscriptionPlan
+from users.models import User
+from .cache import LRUCache, Namespace, clear_local, pack, unpack
+from .querycache import connect_signals, query_cache
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used_and_expired_entries(self):
+        lru = LRUCache(max_entries=2, max_bytes=10)
+        lru.set('a', b'1111', 5, now=0)
+        lru.set('b', b'2222', 5, now=0)
+        lru.get('a', now=1)
+        lru.set('c', b'3333', 5, now=1)  # over 10 bytes: drops b
+        self.assertIsNone(lru.get('b', now=1))
+        self.assertEqual(lru.get('a', now=1), b'1111')
+        self.assertIsNone(lru.get('a', now=6))
+        lru.set('huge', b'x' * 11, 5, now=1)
+        self.assertIsNone(lru.get('huge', now=1))
+
+
+class NamespaceTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.ns = Namespace('test')
+
+    def test_large_values_are_compressed(self):
+        value = {'rows': ['same text'] * 500}
+        data = pack(value, compress_min_bytes=1024)
+        self.assertEqual(data[:1], b'z')
+        self.assertLess(len(data), 200)
+        self.assertEqual(unpack(data), value)
+
+    def test_reads_go_through_l1_then_l2(self):
+        self.ns.set('k', [1, 2])
+        self.assertEqual(self.ns.get('k'), [1, 2])
+        self.ns.l1.clear()
+        self.assertEqual(self.ns.get('k'), [1, 2])
+        self.assertIsNone(self.ns.get('missing'))
+        self.assertEqual(
+            {name: self.ns.metrics[name] for name in ('l1_hits', 'l2_hits', 'misses')},
+            {'l1_hits': 1, 'l2_hits': 1, 'misses': 1},
+        )
+
+    def test_group_and_namespace_invalidation(self):
+        self.ns.set('page', 'a', group='agent:1')
+        self.ns.set('page', 'b', group='agent:2')
+        self.ns.invalidate('agent:1')
+        self.assertIsNone(self.ns.get('page', group='agent:1'))
+        self.assertEqual(self.ns.get('page', group='agent:2'), 'b')
+
+        # Another process sees the bump once its cached version expires
+        other = Namespace('test')
+        self.assertEqual(other.get('page', group='agent:2'), 'b')
+        self.ns.invalidate()
+        with self.settings(CACHE_VERSION_CHECK_SECONDS=0):
+            other._versions.clear()
+            self.assertIsNone(other.get('page', group='agent:2'))
+
+    def test_every_invalidation_writes_a_new_version(self):
+        self.ns.get('page', group='agent:1')
+        key = self.ns._version_key('agent:1')
+        versions = [cache.get(key)]
+        for ns in (self.ns, Namespace('test')):
+            ns.invalidate('agent:1')
+            versions.append(cache.get(key))
+        self.assertEqual(len(set(versions)), 3)
+
+    def test_concurrent_misses_call_the_loader_once(self):
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.ns.get_or_set('cold', loader)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.ns.metrics['loads'], 1)
+
+
+class QueryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.plan = SubscriptionPlan.objects.create(name='Basic', plan_type='basic', price=1000)
+
+    def test_results_are_served_from_cache_until_the_table_changes(self):
+        def lookups():
+            return (
+                [plan.name for plan in SubscriptionPlan.objects.filter(is_active=True).cached()],
+                SubscriptionPlan.objects.cached().get(pk=self.plan.pk).name,
+                SubscriptionPlan.objects.cached().filter(pk=self.plan.pk).exists(),
+            )
+
+        with self.assertNumQueries(3):
+            self.assertEqual(lookups(), (['Basic'], 'Basic', True))
+        with self.assertNumQueries(0):
+            self.assertEqual(lookups(), (['Basic'], 'Basic', True))
+
+        self.plan.name = 'Starter'
+        self.plan.save()
+        self.assertEqual(SubscriptionPlan.objects.cached().get(pk=self.plan.pk).name, 'Starter')
+        SubscriptionPlan.objects.filter(pk=self.plan.pk).update(is_active=False)
+        self.assertEqual(list(SubscriptionPlan.objects.filter(is_active=True).cached()), [])
+        self.plan.delete()
+        self.assertFalse(SubscriptionPlan.objects.cached().filter(pk=self.plan.pk).exists())
+
+    def test_uncached_querysets_and_empty_filters(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(SubscriptionPlan.objects.count(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(list(SubscriptionPlan.objects.cached().filter(pk__in=[])), [])
+        with self.assertRaises(ValueError):
+            SubscriptionPlan.objects.prefetch_related('subscriptions').cached()
+
+    def test_only_watched_models_invalidate_on_save(self):
+        user = User.objects.create_user('watched', 'watched@example.com', 'pw')
+        with mock.patch.object(query_cache, 'invalidate') as invalidate:
+            user.save()
+        invalidate.assert_not_called()
+
+        with self.settings(QUERY_CACHE_EXTRA_MODELS=['users.User']):
+            connect_signals()
+        self.addCleanup(post_save.disconnect, sender=User, dispatch_uid='core.querycache.saved.users.User')
+        self.addCleanup(post_delete.disconnect, sender=User, dispatch_uid='core.querycache.deleted.users.User')
+        with mock.patch.object(query_cache, 'invalidate') as invalidate:
+            user.save()
+        invalidate.assert_any_call(f'table:{User._meta.db_table}')
@@ -0,0 +1,127 @@
+"""
+Token-bucket request throttling.
+
+Views opt in by setting `throttle_scope`; each scope has a DRF-style rate in
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] ("10/min"), read as a bucket of that
+many tokens refilled evenly over the period, so clients get short bursts but a
+bounded sustained rate. Buckets are keyed per user when authenticated and per
+client IP otherwise; the IP is DRF's `get_ident`, which only trusts as many
+X-Forwarded-For hops as REST_FRAMEWORK['NUM_PROXIES'] says sit in front of
+the app.
+
+Buckets live in process memory by default (one dict lookup per request; each
+worker process enforces the rate on its own). Set THROTTLE_CACHE_ALIAS to a
+configured cache alias to share buckets between workers; updates there are a
+get and a set, so concurrent requests can occasionally slip an extra token.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60); None -> (None, None)."""
+    if rate is None:
+        return None, None
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class LocalBucketStore:
+    """Per-process buckets: {key: (tokens, updated_at, seconds_to_refill)}."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_per_second, now):
+        """Take one token; returns seconds to wait (0.0 when allowed)."""
+        full_after = capacity / refill_per_second
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (capacity, now, full_after))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            if tokens >= 1:
+                if len(self._buckets) >= self.max_keys and key not in self._buckets:
+                    self._prune(now)
+                self._buckets[key] = (tokens - 1, now, full_after)
+                return 0.0
+            self._buckets[key] = (tokens, now, full_after)
+            return (1 - tokens) / refill_per_second
+
+    def _prune(self, now):
+        # Buckets that would be full again carry no state worth keeping; each
+        # refills at its own scope's rate
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < bucket[2]
+        }
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """Buckets shared through a Django cache alias."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def consume(self, key, capacity, refill_per_second, now):
+        cache = caches[self.alias]
+        tokens, updated_at = cache.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / refill_per_second
+        if not wait:
+            tokens -= 1
+        cache.set(key, (tokens, now), int(capacity / refill_per_second) + 1)
+        return wait
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+local_store = LocalBucketStore()
+
+
+def get_store():
+    alias = getattr(settings, 'THROTTLE_CACHE_ALIAS', None)
+    return CacheBucketStore(alias) if alias else local_store
+
+
+class ScopedTokenBucketThrottle(BaseThrottle):
+    """Token bucket per (view.throttle_scope, user or IP); views without a scope are not throttled."""
+
+    def __init__(self):
+        self._wait = None
+
+    def get_rate(self, scope):
+        return parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+
+    def get_cache_key(self, request, scope):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'throttle:{scope}:{ident}'
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return True
+        capacity, period = self.get_rate(scope)
+        if capacity is None:
+            return True
+        self._wait = get_store().consume(
+            self.get_cache_key(request, scope), capacity, capacity / period, time.time()
+        )
+        return not self._wait
+
+    def wait(self):
+        return self._wait
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import importlib.util
 import os
 from pathlib import Path
 
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
     # Third-party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'django_filters',
     'drf_spectacular',
@@ -95,6 +97,42 @@ DATABASES = {
 }
 
 
+# Shared cache (also L2 of core.cache): Redis when REDIS_URL is set, otherwise a
+# file cache that every worker process on this host shares. Set REDIS_URL when
+# running more than one worker: FileBasedCache add() and incr() are a read then
+# a write, not atomic, so across workers the core.cache single-flight lock can
+# admit several loaders and the listing-usage counter can miss increments.
+# Tests use per-process memory instead (keja_backend/test_settings.py).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / '.cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# core.cache: per-process L1 bounds, pickles larger than this are zlib-compressed,
+# and how often namespace versions are re-read from the shared cache
+CACHE_L1_MAX_ENTRIES = int(os.environ.get('CACHE_L1_MAX_ENTRIES', '1000'))
+CACHE_L1_MAX_BYTES = int(os.environ.get('CACHE_L1_MAX_BYTES', str(8 * 1024 * 1024)))
+CACHE_COMPRESS_MIN_BYTES = int(os.environ.get('CACHE_COMPRESS_MIN_BYTES', '1024'))
+CACHE_VERSION_CHECK_SECONDS = float(os.environ.get('CACHE_VERSION_CHECK_SECONDS', '2'))
+
+# Default lifetime of querysets cached with .cached() (core.querycache)
+QUERY_CACHE_SECONDS = int(os.environ.get('QUERY_CACHE_SECONDS', '300'))
+# Models without a CachedManager that are joined into .cached() queries, as
+# 'app_label.ModelName'; their saves and deletes invalidate cached results too
+QUERY_CACHE_EXTRA_MODELS = []
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -113,6 +151,33 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing (users.hashers): PASSWORD_HASHER_PROFILE picks the hasher for new
+# hashes ('argon2' needs argon2-cffi, otherwise PBKDF2 is used); stored hashes are
+# upgraded on the next successful login. Unset costs keep Django's defaults.
+_ARGON2_AVAILABLE = importlib.util.find_spec('argon2') is not None
+PASSWORD_HASHER_PROFILE = os.environ.get('PASSWORD_HASHER_PROFILE', 'pbkdf2')
+PASSWORD_HASHERS = [
+    'users.hashers.TunedArgon2PasswordHasher',
+    'users.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if PASSWORD_HASHER_PROFILE != 'argon2' or not _ARGON2_AVAILABLE:
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ['PASSWORD_PBKDF2_ITERATIONS']) if os.environ.get('PASSWORD_PBKDF2_ITERATIONS') else None
+ARGON2_TIME_COST = int(os.environ['ARGON2_TIME_COST']) if os.environ.get('ARGON2_TIME_COST') else None
+ARGON2_MEMORY_COST = int(os.environ['ARGON2_MEMORY_COST']) if os.environ.get('ARGON2_MEMORY_COST') else None  # KiB
+ARGON2_PARALLELISM = int(os.environ['ARGON2_PARALLELISM']) if os.environ.get('ARGON2_PARALLELISM') else None
+
+# Run password hashing in a pool of this many processes (0 = in the request thread).
+# At most PASSWORD_HASH_MAX_IN_FLIGHT request threads per process wait on the pool;
+# keep it below gunicorn's --threads (4 in railway.json). Requests that find no free
+# slot within PASSWORD_HASH_QUEUE_TIMEOUT seconds get 503.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '0'))
+PASSWORD_HASH_MAX_IN_FLIGHT = int(os.environ.get('PASSWORD_HASH_MAX_IN_FLIGHT', '2'))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', '0'))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -172,6 +237,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -181,7 +247,7 @@ CORS_ALLOW_HEADERS = [
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -195,8 +261,26 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'EXCEPTION_HANDLER': 'core.exceptions.custom_exception_handler',
+    # Token buckets for views that set throttle_scope (see core.throttling)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.ScopedTokenBucketThrottle',
+    ],
+    # Reverse proxies in front of the app (Railway and PythonAnywhere each add
+    # one); throttles key anonymous clients on the X-Forwarded-For address that
+    # many hops from the right, so clients cannot pick their own. 0 when
+    # serving clients directly.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '1')),
+    'DEFAULT_THROTTLE_RATES': {
+        'search': os.environ.get('THROTTLE_RATE_SEARCH', '120/min'),
+        'login': os.environ.get('THROTTLE_RATE_LOGIN', '10/min'),
+        'register': os.environ.get('THROTTLE_RATE_REGISTER', '5/hour'),
+        'message': os.environ.get('THROTTLE_RATE_MESSAGE', '30/min'),
+    },
 }
 
+# Throttle buckets are kept per process unless this names a shared cache alias
+THROTTLE_CACHE_ALIAS = os.environ.get('THROTTLE_CACHE_ALIAS') or None
+
 # JWT Configuration
 from datetime import timedelta
 
@@ -206,6 +290,9 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.KejaTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.KejaTokenRefreshSerializer',
+    'TOKEN_BLACKLIST_SERIALIZER': 'users.serializers.KejaTokenBlacklistSerializer',
 }
 
 # API Documentation
@@ -225,6 +312,52 @@ PAYSTACK_PUBLIC_KEY = 'pk_test_648e125ad0c93edbe5be27f4b44ac4bd635c2a1d'  # Repl
 # PAYSTACK_SECRET_KEY = os.environ.get('PAYSTACK_SECRET_KEY', '')
 # PAYSTACK_PUBLIC_KEY = os.environ.get('PAYSTACK_PUBLIC_KEY', '')
 
+# Paystack gateway client (payments/gateway.py): pooled session, timeouts, retries, circuit breaker
+PAYSTACK_BASE_URL = os.environ.get('PAYSTACK_BASE_URL', 'https://api.paystack.co')
+PAYSTACK_CONNECT_TIMEOUT = float(os.environ.get('PAYSTACK_CONNECT_TIMEOUT', '3.05'))
+PAYSTACK_READ_TIMEOUT = float(os.environ.get('PAYSTACK_READ_TIMEOUT', '10'))
+PAYSTACK_MAX_RETRIES = int(os.environ.get('PAYSTACK_MAX_RETRIES', '2'))  # idempotent calls only
+PAYSTACK_POOL_SIZE = int(os.environ.get('PAYSTACK_POOL_SIZE', '10'))
+PAYSTACK_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('PAYSTACK_CIRCUIT_FAILURE_THRESHOLD', '5'))
+PAYSTACK_CIRCUIT_RESET_SECONDS = float(os.environ.get('PAYSTACK_CIRCUIT_RESET_SECONDS', '30'))
+
+# Pending payments are re-verified by payments.reconciliation once this old, and
+# cancelled if still unpaid after PAYMENT_PENDING_EXPIRY_HOURS
+PAYMENT_RECONCILE_MIN_AGE_MINUTES = int(os.environ.get('PAYMENT_RECONCILE_MIN_AGE_MINUTES', '15'))
+PAYMENT_PENDING_EXPIRY_HOURS = int(os.environ.get('PAYMENT_PENDING_EXPIRY_HOURS', '24'))
+PAYMENT_RECONCILE_CONCURRENCY = int(os.environ.get('PAYMENT_RECONCILE_CONCURRENCY', '4'))
+
+# Auto-renewing subscriptions whose renewal is still unpaid this many days after
+# the billing date are expired by payments.subscriptions.sweep_subscriptions
+SUBSCRIPTION_GRACE_DAYS = int(os.environ.get('SUBSCRIPTION_GRACE_DAYS', '3'))
+
+# Page linked from renewal emails (?payment=<id>); it opens checkout via POST /api/payments/<id>/pay/
+SUBSCRIPTION_RENEWAL_URL = os.environ.get('SUBSCRIPTION_RENEWAL_URL', 'http://localhost:3000/dashboard/subscription')
+
+# Listing quota for agents without an active subscription (None = unlimited), and how
+# long resolved plan entitlements are cached per user
+FREE_TIER_MAX_LISTINGS = int(os.environ['FREE_TIER_MAX_LISTINGS']) if os.environ.get('FREE_TIER_MAX_LISTINGS') else None
+ENTITLEMENTS_CACHE_SECONDS = int(os.environ.get('ENTITLEMENTS_CACHE_SECONDS', '300'))
+
+# Users loaded from the database by CachedJWTAuthentication are memoised per process this long
+AUTH_USER_CACHE_SECONDS = int(os.environ.get('AUTH_USER_CACHE_SECONDS', '30'))
+
+# Each process tops up its Bloom filter of blacklisted refresh tokens this often (users.blacklist)
+BLACKLIST_SYNC_SECONDS = int(os.environ.get('BLACKLIST_SYNC_SECONDS', '30'))
+
+# Avatars are re-encoded in the background to a square AVATAR_MAX_SIZE image plus these sizes (px)
+AVATAR_SIZES = [64, 128, 256]
+AVATAR_MAX_SIZE = 512
+
+# Agent discovery (users.agent_stats): cached list pages live this long, and response
+# rates count enquiries from the last AGENT_RESPONSE_WINDOW_DAYS
+AGENT_LIST_CACHE_SECONDS = int(os.environ.get('AGENT_LIST_CACHE_SECONDS', '300'))
+AGENT_RESPONSE_WINDOW_DAYS = int(os.environ.get('AGENT_RESPONSE_WINDOW_DAYS', '90'))
+
+# Public agent profiles (GET /api/auth/agents/{id}/): cache lifetime and listing cards shown
+AGENT_PROFILE_CACHE_SECONDS = int(os.environ.get('AGENT_PROFILE_CACHE_SECONDS', '600'))
+AGENT_PROFILE_LISTINGS = int(os.environ.get('AGENT_PROFILE_LISTINGS', '24'))
+
 # Email: use SMTP in production (set env vars); development uses console
 if os.environ.get('EMAIL_HOST'):
     EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -237,3 +370,36 @@ if os.environ.get('EMAIL_HOST'):
 else:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
     DEFAULT_FROM_EMAIL = 'Keja <noreply@keja.com>'
+
+# Messaging: messages older than this many days are moved to the archive table
+# by `python manage.py archive_messages` (schedule it daily)
+MESSAGE_ARCHIVE_AFTER_DAYS = int(os.environ.get('MESSAGE_ARCHIVE_AFTER_DAYS', '180'))
+
+# Appointments: length of a bookable viewing slot in minutes
+APPOINTMENT_SLOT_MINUTES = int(os.environ.get('APPOINTMENT_SLOT_MINUTES', '60'))
+
+# Appointments: calendar feed URLs expire after this many days (agents fetch a new one from calendar_token)
+CALENDAR_TOKEN_MAX_AGE_DAYS = int(os.environ.get('CALENDAR_TOKEN_MAX_AGE_DAYS', '365'))
+
+# Appointments: reminders go out this many hours before a viewing
+APPOINTMENT_REMINDER_LEAD_HOURS = int(os.environ.get('APPOINTMENT_REMINDER_LEAD_HOURS', '24'))
+
+# Responses to requests sent with an Idempotency-Key header are replayed for this long
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
+# Queued email (core.mail): attempts before giving up, and the first retry delay (doubles each attempt)
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_RETRY_BASE_SECONDS = int(os.environ.get('OUTBOX_RETRY_BASE_SECONDS', '60'))
+
+# Background jobs run by `python manage.py run_scheduler`: (dotted path, interval in seconds)
+SCHEDULER_JOBS = [
+    ('appointments.reminders.send_due_reminders', 300),
+    ('payments.webhooks.process_webhook_events', 5),
+    ('core.mail.deliver_outbox', 10),
+    ('users.avatars.process_pending_avatars', 30),
+    ('payments.reconciliation.reconcile_pending_payments', 600),
+    ('payments.subscriptions.sweep_subscriptions', 3600),
+    ('users.agent_stats.refresh_all_agent_stats', 3600),
+    ('core.idempotency.purge_expired_keys', 3600),
+    ('users.blacklist.purge_expired_tokens', 86400),
+]
@@ -0,0 +1,13 @@
+"""
+Settings for `python manage.py test` (manage.py selects them for the test
+command): the shared cache is swapped for per-process memory so test runs
+neither read nor clear the file cache under BASE_DIR/.cache.
+"""
+from .settings import *  # noqa: F401,F403
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'keja-tests',
+    }
+}
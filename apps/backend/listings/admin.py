@@ -1,4 +1,7 @@
 from django.contrib import admin
+
+from payments.entitlements import reset_listing_usage
+from users.agent_stats import schedule_refresh
 from .models import Listing, ListingImage, SavedListing
 
 
@@ -56,28 +59,37 @@ class ListingAdmin(admin.ModelAdmin):
         return qs
     
     actions = ['mark_as_active', 'mark_as_sold', 'soft_delete', 'restore']
+
+    def _bulk_update(self, queryset, **fields):
+        """UPDATE the listings, then refresh what post_save would have (agent stats, listing quota)"""
+        agent_ids = set(queryset.values_list('agent_id', flat=True))
+        updated = queryset.update(**fields)
+        schedule_refresh(*agent_ids)
+        for agent_id in agent_ids:
+            reset_listing_usage(agent_id)
+        return updated
     
     def mark_as_active(self, request, queryset):
         """Mark selected listings as active"""
-        updated = queryset.update(status='active', is_deleted=False)
+        updated = self._bulk_update(queryset, status='active', is_deleted=False)
         self.message_user(request, f'{updated} listing(s) marked as active.')
     mark_as_active.short_description = 'Mark selected as active'
     
     def mark_as_sold(self, request, queryset):
         """Mark selected listings as sold"""
-        updated = queryset.update(status='sold')
+        updated = self._bulk_update(queryset, status='sold')
         self.message_user(request, f'{updated} listing(s) marked as sold.')
     mark_as_sold.short_description = 'Mark selected as sold'
     
     def soft_delete(self, request, queryset):
         """Soft delete selected listings"""
-        updated = queryset.update(is_deleted=True)
+        updated = self._bulk_update(queryset, is_deleted=True)
         self.message_user(request, f'{updated} listing(s) soft deleted.')
     soft_delete.short_description = 'Soft delete selected'
     
     def restore(self, request, queryset):
         """Restore soft deleted listings"""
-        updated = queryset.update(is_deleted=False)
+        updated = self._bulk_update(queryset, is_deleted=False)
         self.message_user(request, f'{updated} listing(s) restored.')
     restore.short_description = 'Restore selected'
 
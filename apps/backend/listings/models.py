@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
+from core.querycache import CachedManager
 
 
 class Listing(models.Model):
@@ -118,6 +119,9 @@ class Listing(models.Model):
         help_text='Soft delete flag'
     )
     
+    # Supports .cached() for hot lookups (see core.querycache)
+    objects = CachedManager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Listing'
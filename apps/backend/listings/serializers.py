@@ -118,27 +118,19 @@ class ListingListSerializer(serializers.ModelSerializer):
         return obj.agent.username
     
     def get_primary_image(self, obj):
-        """Get primary image URL"""
-        primary = obj.images.filter(is_primary=True).first()
-        if primary:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(primary.image.url)
-            return primary.image.url
-        
-        # Return first image if no primary set
-        first_image = obj.images.first()
-        if first_image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(first_image.image.url)
-            return first_image.image.url
-        
-        return None
+        """Get primary image URL (from the prefetched images)"""
+        images = obj.images.all()
+        image = next((image for image in images if image.is_primary), None) or next(iter(images), None)
+        if image is None:
+            return None
+        request = self.context.get('request')
+        if request:
+            return request.build_absolute_uri(image.image.url)
+        return image.image.url
     
     def get_image_count(self, obj):
         """Get total number of images"""
-        return obj.images.count()
+        return len(obj.images.all())
 
     def get_is_saved(self, obj):
         """True if current user has saved this listing"""
@@ -185,7 +177,7 @@ class SavedListingSerializer(serializers.ModelSerializer):
 
     def validate_listing_id(self, value):
         """Ensure listing exists and is not deleted"""
-        if not Listing.objects.filter(pk=value, is_deleted=False).exists():
+        if not Listing.objects.cached(ttl=60).filter(pk=value, is_deleted=False).exists():
             raise serializers.ValidationError("Listing not found or unavailable.")
         return value
 
@@ -195,3 +187,10 @@ class SavedListingSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
         saved, _ = SavedListing.objects.get_or_create(user=user, listing=listing)
         return saved
+
+
+class AgentListingCardSerializer(ListingListSerializer):
+    """Listing card for the public agent profile; no per-user fields so it can be cached"""
+
+    class Meta(ListingListSerializer.Meta):
+        fields = [field for field in ListingListSerializer.Meta.fields if field != 'is_saved']
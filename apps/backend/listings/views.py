@@ -3,6 +3,14 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from core.idempotency import idempotent
+from core.params import date_param
+from payments.entitlements import enforce_listing_quota
+from appointments.serializers import FreeSlotSerializer
+from appointments.slots import compute_free_slots
 from .models import Listing, ListingImage, SavedListing
 from .serializers import (
     ListingSerializer,
@@ -38,10 +46,11 @@ class ListingViewSet(viewsets.ModelViewSet):
     
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['property_type', 'city', 'status', 'state']
+    filterset_fields = ['property_type', 'city', 'status', 'state', 'agent']
     search_fields = ['title', 'description', 'address', 'city', 'state']
     ordering_fields = ['price', 'created_at', 'bedrooms', 'bathrooms', 'square_feet']
     ordering = ['-created_at']
+    max_slot_range_days = 31
     
     def get_queryset(self):
         """Get queryset with filtering and optimization"""
@@ -74,6 +83,12 @@ class ListingViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def get_throttles(self):
+        """Listing search/browse is throttled per user or IP"""
+        if self.action == 'list':
+            self.throttle_scope = 'search'
+        return super().get_throttles()
+    
     def get_serializer_class(self):
         """Return appropriate serializer based on action"""
         if self.action == 'list':
@@ -83,8 +98,10 @@ class ListingViewSet(viewsets.ModelViewSet):
         return ListingSerializer
     
     def perform_create(self, serializer):
-        """Set the agent to the current user when creating"""
-        serializer.save(agent=self.request.user)
+        """Set the agent to the current user when creating, within their plan's listing quota"""
+        with transaction.atomic():
+            enforce_listing_quota(self.request.user)
+            serializer.save(agent=self.request.user)
     
     def perform_destroy(self, instance):
         """Soft delete instead of actual deletion"""
@@ -100,6 +117,38 @@ class ListingViewSet(viewsets.ModelViewSet):
             status=status.HTTP_204_NO_CONTENT
         )
     
+    @action(detail=True, methods=['get'])
+    def slots(self, request, pk=None):
+        """
+        Free viewing slots for a listing's agent
+        GET /api/listings/{id}/slots/?from=YYYY-MM-DD&to=YYYY-MM-DD
+        """
+        listing = self.get_object()
+        try:
+            date_from = date_param(request, 'from') or timezone.localdate()
+            date_to = date_param(request, 'to') or date_from + timedelta(days=6)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if date_to < date_from:
+            return Response(
+                {'error': '"to" must be on or after "from"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (date_to - date_from).days >= self.max_slot_range_days:
+            return Response(
+                {'error': f'Date range cannot exceed {self.max_slot_range_days} days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        slots = compute_free_slots(listing.agent_id, date_from, date_to)
+        return Response({
+            'listing': listing.id,
+            'from': date_from,
+            'to': date_to,
+            'slots': FreeSlotSerializer(slots, many=True).data,
+        })
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def upload_images(self, request, pk=None):
         """
@@ -223,6 +272,10 @@ class SavedListingViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     @action(detail=False, methods=['delete'], url_path='unsave')
     def unsave(self, request):
         """Remove saved listing by listing_id. DELETE /api/listings/saved/unsave/?listing_id=1"""
@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'keja_backend.settings')
+    # Tests run against their own cache (see keja_backend/test_settings.py)
+    default_settings = 'keja_backend.test_settings' if sys.argv[1:2] == ['test'] else 'keja_backend.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', default_settings)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
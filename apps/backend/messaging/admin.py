@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Message
+from .models import Message, ArchivedMessage
 
 
 @admin.register(Message)
@@ -9,3 +9,12 @@ class MessageAdmin(admin.ModelAdmin):
     search_fields = ['body', 'sender__username', 'recipient__username']
     raw_id_fields = ['sender', 'recipient', 'listing']
     readonly_fields = ['created_at']
+
+
+@admin.register(ArchivedMessage)
+class ArchivedMessageAdmin(admin.ModelAdmin):
+    list_display = ['id', 'sender', 'recipient', 'listing', 'created_at', 'archived_at']
+    list_filter = ['created_at']
+    search_fields = ['body', 'sender__username', 'recipient__username']
+    raw_id_fields = ['sender', 'recipient', 'listing']
+    readonly_fields = ['created_at', 'archived_at']
@@ -0,0 +1,73 @@
+"""
+Cold storage for old messages.
+
+Messages older than MESSAGE_ARCHIVE_AFTER_DAYS are moved in batches from the
+hot `Message` table into `ArchivedMessage` so inbox and thread indexes only
+cover recent history. Thread pages fall through to the archive only when a
+reader scrolls past the oldest hot message.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Message, ArchivedMessage
+
+ARCHIVED_FIELDS = ['id', 'sender_id', 'recipient_id', 'body', 'listing_id', 'read_at', 'created_at']
+
+
+def archive_cutoff(now, days=None):
+    """Return the created_at boundary before which messages are archived."""
+    if days is None:
+        days = getattr(settings, 'MESSAGE_ARCHIVE_AFTER_DAYS', 180)
+    return now - timedelta(days=days)
+
+
+def archive_messages_before(cutoff, batch_size=1000):
+    """
+    Move messages created before `cutoff` into the archive, one batch per transaction.
+    Yields the number of messages moved by each batch.
+    """
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Message.objects.filter(created_at__lt=cutoff)
+                .order_by('id')
+                .values(*ARCHIVED_FIELDS)[:batch_size]
+            )
+            if not rows:
+                return
+            ArchivedMessage.objects.bulk_create(
+                [ArchivedMessage(**row) for row in rows],
+                ignore_conflicts=True,
+            )
+            Message.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        yield len(rows)
+
+
+def thread_filter(me, other_id):
+    """Both directions of a conversation between `me` and `other_id`."""
+    return Q(sender=me, recipient_id=other_id) | Q(sender_id=other_id, recipient=me)
+
+
+def thread_page(me, other_id, before, limit):
+    """
+    Return up to `limit` messages older than message id `before`, oldest first.
+    Reads the hot table first and only queries the archive for the remainder.
+    """
+    hot = list(
+        Message.objects.filter(thread_filter(me, other_id), id__lt=before)
+        .select_related('sender', 'recipient', 'listing')
+        .order_by('-id')[:limit]
+    )
+    remaining = limit - len(hot)
+    if remaining > 0:
+        oldest = hot[-1].id if hot else before
+        hot.extend(
+            ArchivedMessage.objects.filter(thread_filter(me, other_id), id__lt=oldest)
+            .select_related('sender', 'recipient', 'listing')
+            .order_by('-id')[:remaining]
+        )
+    hot.reverse()
+    return hot
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from messaging.archive import archive_cutoff, archive_messages_before
+
+
+class Command(BaseCommand):
+    help = 'Move messages older than MESSAGE_ARCHIVE_AFTER_DAYS into the archive table in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Override MESSAGE_ARCHIVE_AFTER_DAYS')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Messages moved per transaction')
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(timezone.now(), options['days'])
+        total = 0
+        for moved in archive_messages_before(cutoff, batch_size=options['batch_size']):
+            total += moved
+            self.stdout.write(f'Archived {moved} message(s) ({total} total)')
+        self.stdout.write(self.style.SUCCESS(f'Done. {total} message(s) created before {cutoff:%Y-%m-%d} archived.'))
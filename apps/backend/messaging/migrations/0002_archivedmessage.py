@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0003_remove_savedlisting_listings_savedlisting_unique_user_listing_and_more'),
+        ('messaging', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('body', models.TextField(help_text='Message content')),
+                ('read_at', models.DateTimeField(blank=True, help_text='When the recipient read the message', null=True)),
+                ('created_at', models.DateTimeField(help_text='When the message was originally sent')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('listing', models.ForeignKey(blank=True, help_text='Optional: listing this message is about', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='listings.listing')),
+                ('recipient', models.ForeignKey(help_text='User who receives the message', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('sender', models.ForeignKey(help_text='User who sent the message', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived Message',
+                'verbose_name_plural': 'Archived Messages',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['sender', 'recipient', 'id'], name='messaging_a_sender__59a307_idx')],
+            },
+        ),
+    ]
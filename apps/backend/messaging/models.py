@@ -41,3 +41,47 @@ class Message(models.Model):
 
     def __str__(self):
         return f"{self.sender_id} → {self.recipient_id}: {self.body[:50]}..."
+
+
+class ArchivedMessage(models.Model):
+    """
+    Cold copy of a Message moved out of the hot table by `archive_messages`.
+    Keeps the original primary key so thread cursors work across both tables.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        help_text='User who sent the message',
+    )
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        help_text='User who receives the message',
+    )
+    body = models.TextField(help_text='Message content')
+    listing = models.ForeignKey(
+        Listing,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text='Optional: listing this message is about',
+    )
+    read_at = models.DateTimeField(null=True, blank=True, help_text='When the recipient read the message')
+    created_at = models.DateTimeField(help_text='When the message was originally sent')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Archived Message'
+        verbose_name_plural = 'Archived Messages'
+        indexes = [
+            models.Index(fields=['sender', 'recipient', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.sender_id} → {self.recipient_id}: {self.body[:50]}... (archived)"
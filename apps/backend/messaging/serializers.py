@@ -1,10 +1,12 @@
 from rest_framework import serializers
 from django.conf import settings
+from users.avatars import avatar_url
 from .models import Message
 
 
 class MessageSerializer(serializers.ModelSerializer):
     sender_name = serializers.SerializerMethodField()
+    sender_avatar = serializers.SerializerMethodField()
     recipient_name = serializers.SerializerMethodField()
     listing_title = serializers.SerializerMethodField()
     is_from_me = serializers.SerializerMethodField()
@@ -12,7 +14,7 @@ class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = [
-            'id', 'sender', 'recipient', 'sender_name', 'recipient_name',
+            'id', 'sender', 'recipient', 'sender_name', 'sender_avatar', 'recipient_name',
             'body', 'listing', 'listing_title', 'read_at', 'created_at', 'is_from_me',
         ]
         read_only_fields = ['id', 'sender', 'created_at']
@@ -22,6 +24,9 @@ class MessageSerializer(serializers.ModelSerializer):
             return f"{obj.sender.first_name or ''} {obj.sender.last_name or ''}".strip()
         return obj.sender.username
 
+    def get_sender_avatar(self, obj):
+        return avatar_url(obj.sender, 64, self.context.get('request'))
+
     def get_recipient_name(self, obj):
         if obj.recipient.first_name or obj.recipient.last_name:
             return f"{obj.recipient.first_name or ''} {obj.recipient.last_name or ''}".strip()
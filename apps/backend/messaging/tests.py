@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User
+from .archive import archive_messages_before, thread_page
+from .models import ArchivedMessage, Message
+
+
+class MessageArchiveTests(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user('client', 'client@example.com', 'pw', role='client')
+        self.agent = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.other = User.objects.create_user('other', 'other@example.com', 'pw', role='client')
+        now = timezone.now()
+        self.messages = []
+        for i in range(6):
+            sender, recipient = (self.client_user, self.agent) if i % 2 == 0 else (self.agent, self.client_user)
+            message = Message.objects.create(sender=sender, recipient=recipient, body=f'message {i}')
+            # Oldest first: messages 0-3 are past the cutoff, 4-5 are recent
+            Message.objects.filter(pk=message.pk).update(created_at=now - timedelta(days=400 - i * 60))
+            self.messages.append(message.pk)
+        self.unrelated = Message.objects.create(sender=self.other, recipient=self.agent, body='elsewhere')
+        Message.objects.filter(pk=self.unrelated.pk).update(created_at=now - timedelta(days=365))
+        self.cutoff = now - timedelta(days=180)
+
+    def test_moves_old_messages_in_batches(self):
+        self.assertEqual(list(archive_messages_before(self.cutoff, batch_size=2)), [2, 2, 1])
+        self.assertEqual(
+            sorted(ArchivedMessage.objects.values_list('id', flat=True)),
+            sorted(self.messages[:4] + [self.unrelated.pk]),
+        )
+        self.assertEqual(list(Message.objects.order_by('id').values_list('id', flat=True)), self.messages[4:])
+        archived = ArchivedMessage.objects.get(pk=self.messages[0])
+        self.assertEqual((archived.sender_id, archived.body), (self.client_user.pk, 'message 0'))
+        self.assertEqual(list(archive_messages_before(self.cutoff)), [])
+
+    def test_pages_cross_from_hot_to_archived_messages(self):
+        list(archive_messages_before(self.cutoff))
+        newest = self.messages[-1]
+
+        page = thread_page(self.client_user, self.agent.pk, newest + 1, 3)
+        self.assertEqual([m.pk for m in page], self.messages[3:])
+        self.assertIsInstance(page[0], ArchivedMessage)
+
+        page = thread_page(self.agent, self.client_user.pk, page[0].pk, 10)
+        self.assertEqual([m.pk for m in page], self.messages[:3])
+        self.assertEqual(thread_page(self.client_user, self.agent.pk, self.messages[0], 10), [])
+
+    def test_thread_endpoint_pages_with_before(self):
+        list(archive_messages_before(self.cutoff))
+        api = APIClient()
+        api.force_authenticate(self.client_user)
+        url = f'/api/messaging/conversations/{self.agent.pk}/messages/'
+
+        response = api.get(url, {'before': self.messages[-1] + 1, 'limit': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['id'] for m in response.data], self.messages[2:])
+        self.assertEqual(api.get(url, {'before': 'x'}).status_code, 400)
@@ -4,7 +4,9 @@ from rest_framework.response import Response
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from core.idempotency import idempotent
 
+from .archive import thread_filter, thread_page
 from .models import Message
 from .serializers import MessageSerializer, ConversationSummarySerializer, SendMessageSerializer
 
@@ -64,19 +66,27 @@ class ConversationListView(generics.ListAPIView):
 class MessageThreadView(generics.ListCreateAPIView):
     """
     GET  /api/messaging/conversations/<user_id>/messages/  - list messages with that user
+    GET  /api/messaging/conversations/<user_id>/messages/?before=<id>&limit=50 - older page, reads the archive when needed
     POST /api/messaging/conversations/<user_id>/messages/ - send a message to that user
     """
+    default_page_size = 50
+    max_page_size = 200
     permission_classes = [IsAuthenticated]
     serializer_class = MessageSerializer
 
     def get_other_user_id(self):
         return self.kwargs.get('user_id')
 
+    def get_throttles(self):
+        if self.request.method == 'POST':
+            self.throttle_scope = 'message'
+        return super().get_throttles()
+
     def get_messages_queryset(self):
         me = self.request.user
         other_id = self.get_other_user_id()
         return Message.objects.filter(
-            Q(sender=me, recipient_id=other_id) | Q(sender_id=other_id, recipient=me)
+            thread_filter(me, other_id)
         ).select_related('sender', 'recipient', 'listing').order_by('created_at')
 
     def list(self, request, *args, **kwargs):
@@ -86,6 +96,18 @@ class MessageThreadView(generics.ListCreateAPIView):
                 {'detail': 'Cannot list messages with yourself.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        before = request.query_params.get('before')
+        if before:
+            try:
+                before = int(before)
+                limit = min(int(request.query_params.get('limit', self.default_page_size)), self.max_page_size)
+            except ValueError:
+                return Response(
+                    {'detail': 'before and limit must be integers.'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            messages = thread_page(request.user, other_id, before, max(limit, 1))
+            return Response(MessageSerializer(messages, many=True, context={'request': request}).data)
         qs = self.get_messages_queryset()
         serializer = MessageSerializer(qs, many=True, context={'request': request})
         # Mark messages I received as read
@@ -94,6 +116,7 @@ class MessageThreadView(generics.ListCreateAPIView):
         ).update(read_at=timezone.now())
         return Response(serializer.data)
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         other_id = self.get_other_user_id()
         if other_id == request.user.id:
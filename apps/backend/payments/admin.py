@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SubscriptionPlan, Subscription, Payment
+from .models import SubscriptionPlan, Subscription, SubscriptionEvent, Payment, WebhookEvent, DailyRevenue
 
 
 @admin.register(SubscriptionPlan)
@@ -44,3 +44,28 @@ class PaymentAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'user__email', 'paystack_reference', 'transaction_id']
     readonly_fields = ['created_at', 'updated_at', 'paid_at']
     date_hierarchy = 'created_at'
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'event', 'reference', 'status', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['status', 'event']
+    search_fields = ['reference', 'event_key']
+    readonly_fields = ['received_at', 'processed_at']
+
+
+@admin.register(SubscriptionEvent)
+class SubscriptionEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'subscription', 'event', 'billing_date', 'payment', 'created_at']
+    list_filter = ['event']
+    search_fields = ['subscription__user__username', 'subscription__user__email']
+    raw_id_fields = ['subscription', 'payment']
+    readonly_fields = ['created_at']
+
+
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(admin.ModelAdmin):
+    list_display = ['date', 'plan', 'currency', 'status', 'count', 'amount', 'updated_at']
+    list_filter = ['status', 'currency', 'plan']
+    date_hierarchy = 'date'
+    readonly_fields = ['date', 'plan', 'currency', 'status', 'count', 'amount', 'updated_at']
@@ -0,0 +1,124 @@
+"""
+Per-user subscription entitlements and listing quota.
+
+A user's active plan (name, max_listings, features) is resolved once and
+cached in the core.cache 'entitlements' namespace for
+ENTITLEMENTS_CACHE_SECONDS; `payments.signals` drops the entry when the
+user's Subscription or Payment rows change.
+
+The number of live listings is kept as a cache counter (incremented on
+create, recounted after any other change), so quota checks for an agent with
+slots to spare cost no query. Cache increments are not atomic on every
+backend, so when the counter says the agent is about to take their last slot,
+`enforce_listing_quota` re-counts in the database under a lock on the agent's
+user row, inside the transaction that creates the listing.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.exceptions import PermissionDenied
+
+from core.cache import namespace
+from .models import Subscription
+
+entitlement_cache = namespace('entitlements')
+
+
+def _usage_key(user_id):
+    return f'listing_usage:{user_id}'
+
+
+def _ttl():
+    return getattr(settings, 'ENTITLEMENTS_CACHE_SECONDS', 300)
+
+
+def get_entitlements(user):
+    """Dict with plan_id, plan_name, max_listings (None = unlimited) and features for `user`."""
+    return entitlement_cache.get_or_set(user.pk, lambda: _load_entitlements(user.pk), ttl=_ttl())
+
+
+def _load_entitlements(user_id):
+    subscription = (
+        Subscription.objects.filter(user_id=user_id, status='active')
+        .select_related('plan').order_by('-created_at').first()
+    )
+    if subscription:
+        plan = subscription.plan
+        return {
+            'plan_id': plan.id,
+            'plan_name': plan.name,
+            'max_listings': plan.max_listings,
+            'features': list(plan.features or []),
+        }
+    return {
+        'plan_id': None,
+        'plan_name': None,
+        'max_listings': getattr(settings, 'FREE_TIER_MAX_LISTINGS', None),
+        'features': [],
+    }
+
+
+def invalidate_entitlements(*user_ids):
+    for user_id in user_ids:
+        entitlement_cache.delete(user_id)
+
+
+def listing_usage(user_id):
+    """Number of listings `user_id` has that are not deleted (cached counter)."""
+    from listings.models import Listing
+
+    key = _usage_key(user_id)
+    usage = cache.get(key)
+    if usage is None:
+        usage = Listing.objects.filter(agent_id=user_id, is_deleted=False).count()
+        cache.add(key, usage, _ttl())
+    return usage
+
+
+def increment_listing_usage(user_id):
+    try:
+        cache.incr(_usage_key(user_id))
+    except ValueError:
+        pass  # not cached; the next check recounts
+
+
+def reset_listing_usage(user_id):
+    cache.delete(_usage_key(user_id))
+
+
+def _quota_exceeded(max_listings):
+    return PermissionDenied(
+        f'Your plan allows {max_listings} listing(s). Upgrade your subscription to add more.'
+    )
+
+
+def check_listing_quota(user):
+    """Raise PermissionDenied if the cached counter says `user` is already at their plan's limit."""
+    max_listings = get_entitlements(user)['max_listings']
+    if max_listings is None:
+        return
+    if listing_usage(user.pk) >= max_listings:
+        raise _quota_exceeded(max_listings)
+
+
+def enforce_listing_quota(user):
+    """
+    Raise PermissionDenied unless `user` may create another listing. Call inside the
+    transaction that creates the listing. Below their last slot the cached counter is
+    enough; for the last slot the user's row is locked until the transaction commits and
+    listings are counted in the database, so concurrent creates cannot both take it.
+    """
+    from listings.models import Listing
+
+    max_listings = get_entitlements(user)['max_listings']
+    if max_listings is None:
+        return
+    usage = listing_usage(user.pk)
+    if usage >= max_listings:
+        raise _quota_exceeded(max_listings)
+    if usage < max_listings - 1:
+        return
+    list(get_user_model().objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+    if Listing.objects.filter(agent_id=user.pk, is_deleted=False).count() >= max_listings:
+        reset_listing_usage(user.pk)
+        raise _quota_exceeded(max_listings)
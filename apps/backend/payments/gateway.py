@@ -0,0 +1,219 @@
+"""
+Paystack gateway client.
+
+One pooled keep-alive `requests.Session` per process with strict connect/read
+timeouts, bounded jittered retries for idempotent calls, a circuit breaker
+that fails fast while Paystack is degraded, and in-process latency metrics.
+Point PAYSTACK_BASE_URL at a local fake server to exercise it in tests.
+"""
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class PaystackError(Exception):
+    """Paystack rejected the request (4xx or status: false)."""
+
+    def __init__(self, message, status_code=None, payload=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.payload = payload or {}
+
+
+class PaystackUnavailable(PaystackError):
+    """Paystack could not be reached, timed out, returned 5xx, or the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures; open -> half-open
+    after `reset_timeout` seconds, where one trial call decides whether to close again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning('Paystack circuit opened after %s failure(s)', self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class GatewayMetrics:
+    """Per-operation call counts, errors and latency (ms) for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops = {}
+
+    def record(self, operation, elapsed_ms, ok):
+        with self._lock:
+            op = self._ops.setdefault(operation, {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            op['calls'] += 1
+            op['errors'] += 0 if ok else 1
+            op['total_ms'] += elapsed_ms
+            op['max_ms'] = max(op['max_ms'], elapsed_ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {**op, 'avg_ms': round(op['total_ms'] / op['calls'], 2) if op['calls'] else 0.0}
+                for name, op in self._ops.items()
+            }
+
+
+class PaystackClient:
+    """Thin Paystack REST client; returns the `data` object of successful responses."""
+
+    def __init__(self, secret_key, base_url='https://api.paystack.co', connect_timeout=3.05,
+                 read_timeout=10.0, max_retries=2, pool_size=10, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = GatewayMetrics()
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            status_forcelist=(502, 503, 504),
+            backoff_factor=0.2,
+            backoff_jitter=0.2,
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {secret_key}',
+            'Content-Type': 'application/json',
+        })
+
+    def _request(self, operation, method, path, **kwargs):
+        if not self.breaker.allow():
+            self.metrics.record(operation, 0.0, ok=False)
+            raise PaystackUnavailable('Payment provider is temporarily unavailable.')
+
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, f'{self.base_url}{path}', timeout=self.timeout, **kwargs)
+        except requests.exceptions.RequestException as exc:
+            self._finish(operation, started, ok=False)
+            raise PaystackUnavailable(f'Payment provider unreachable: {exc}') from exc
+
+        if response.status_code >= 500:
+            self._finish(operation, started, ok=False)
+            raise PaystackUnavailable(f'Payment provider error ({response.status_code}).', response.status_code)
+
+        # Paystack answered; a 4xx is our problem, not theirs, so it doesn't trip the breaker
+        self._finish(operation, started, ok=True)
+        try:
+            payload = response.json()
+        except ValueError:
+            raise PaystackError('Invalid response from payment provider.', response.status_code)
+        if response.status_code >= 400 or not payload.get('status'):
+            raise PaystackError(payload.get('message', 'Payment provider rejected the request.'), response.status_code, payload)
+        return payload.get('data') or {}
+
+    def _finish(self, operation, started, ok):
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.metrics.record(operation, elapsed_ms, ok)
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        logger.debug('paystack %s took %.1f ms (ok=%s)', operation, elapsed_ms, ok)
+
+    def initialize_transaction(self, payload):
+        """POST /transaction/initialize (not retried: it creates a transaction)"""
+        return self._request('initialize', 'POST', '/transaction/initialize', json=payload)
+
+    def verify_transaction(self, reference):
+        """GET /transaction/verify/<reference> (idempotent, retried)"""
+        return self._request('verify', 'GET', f'/transaction/verify/{reference}')
+
+    def status(self):
+        return {
+            'circuit': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'operations': self.metrics.snapshot(),
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client built from settings (shared so connections are reused)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PaystackClient(
+                    secret_key=getattr(settings, 'PAYSTACK_SECRET_KEY', ''),
+                    base_url=getattr(settings, 'PAYSTACK_BASE_URL', 'https://api.paystack.co'),
+                    connect_timeout=getattr(settings, 'PAYSTACK_CONNECT_TIMEOUT', 3.05),
+                    read_timeout=getattr(settings, 'PAYSTACK_READ_TIMEOUT', 10.0),
+                    max_retries=getattr(settings, 'PAYSTACK_MAX_RETRIES', 2),
+                    pool_size=getattr(settings, 'PAYSTACK_POOL_SIZE', 10),
+                    breaker=CircuitBreaker(
+                        failure_threshold=getattr(settings, 'PAYSTACK_CIRCUIT_FAILURE_THRESHOLD', 5),
+                        reset_timeout=getattr(settings, 'PAYSTACK_CIRCUIT_RESET_SECONDS', 30.0),
+                    ),
+                )
+    return _client
+
+
+def reset_client():
+    """Drop the shared client so the next get_client() re-reads settings."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.session.close()
+        _client = None
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from payments.revenue import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the DailyRevenue rollups for a date range from the Payment table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First day (YYYY-MM-DD), default 30 days ago')
+        parser.add_argument('--to', dest='date_to', help='Last day (YYYY-MM-DD), default today')
+
+    def handle(self, *args, **options):
+        date_to = self.parse(options['date_to']) or timezone.localdate()
+        date_from = self.parse(options['date_from']) or date_to - timedelta(days=30)
+        if date_to < date_from:
+            raise CommandError('--to must be on or after --from')
+        rows = rebuild_rollups(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} rollup row(s) for {date_from} to {date_to}.'))
+
+    def parse(self, value):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f'Invalid date: {value!r}')
+        return parsed
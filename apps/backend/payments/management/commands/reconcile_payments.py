@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from payments.reconciliation import reconcile_pending_payments
+
+
+class Command(BaseCommand):
+    help = 'Verify pending payments with Paystack in batches and expire stale ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=None, help='Override PAYMENT_RECONCILE_MIN_AGE_MINUTES')
+        parser.add_argument('--expire-after', type=int, default=None, help='Override PAYMENT_PENDING_EXPIRY_HOURS')
+        parser.add_argument('--batch-size', type=int, default=100, help='Payments verified per page')
+        parser.add_argument('--concurrency', type=int, default=None, help='Override PAYMENT_RECONCILE_CONCURRENCY')
+
+    def handle(self, *args, **options):
+        summary = reconcile_pending_payments(
+            min_age_minutes=options['min_age'],
+            expire_after_hours=options['expire_after'],
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Checked {checked}: {succeeded} succeeded, {failed} failed, {expired} expired, '
+            '{pending} still pending, {skipped} settled elsewhere, {errors} gateway error(s).'.format(**summary)
+        ))
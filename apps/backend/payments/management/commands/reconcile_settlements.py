@@ -0,0 +1,47 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.settlements import apply_corrections, read_settlement_lines, reconcile_settlements
+
+
+class Command(BaseCommand):
+    help = 'Match a Paystack settlement/transaction CSV export against payments and report discrepancies.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Path to the CSV export')
+        parser.add_argument('--apply', action='store_true', help='Correct payment statuses that disagree with the export')
+        parser.add_argument('--minor-units', action='store_true', help='Amounts in the export are in kobo/cents')
+        parser.add_argument('--report', help='Write every discrepancy to this CSV file')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Lines matched per query')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            with open(options['file'], newline='', encoding='utf-8-sig') as export:
+                report = reconcile_settlements(
+                    read_settlement_lines(export, minor_units=options['minor_units']),
+                    chunk_size=options['chunk_size'],
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        if options['report']:
+            with open(options['report'], 'w', newline='') as out:
+                writer = csv.writer(out)
+                writer.writerow(['issue', 'line', 'reference', 'detail'])
+                writer.writerows(report.issues())
+
+        corrected = apply_corrections(report) if options['apply'] and report.corrections else 0
+
+        self.stdout.write(
+            f'{report.lines} line(s), {report.matched} matched, {len(report.missing)} missing, '
+            f'{len(report.mismatched)} mismatched, {len(report.duplicates)} duplicate(s), '
+            f'{len(report.corrections)} status correction(s)'
+        )
+        if options['apply']:
+            self.stdout.write(self.style.SUCCESS(f'Corrected {corrected} payment(s).'))
+        elif report.corrections:
+            self.stdout.write('Run again with --apply to correct payment statuses.')
+        self.stdout.write(f'Finished in {time.monotonic() - started:.1f}s')
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_subscriptionplan_target_user_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_key', models.CharField(help_text='Event type plus Paystack id/reference; deduplicates retried deliveries', max_length=200, unique=True)),
+                ('event', models.CharField(help_text='Paystack event type, e.g. charge.success', max_length=100)),
+                ('reference', models.CharField(blank=True, help_text='Transaction reference from the payload', max_length=100)),
+                ('payload', models.JSONField(help_text='Full webhook payload')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processed', 'Processed'), ('ignored', 'Ignored'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Webhook Event',
+                'verbose_name_plural': 'Webhook Events',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(fields=['status', 'id'], name='payments_we_status_db1844_idx')],
+            },
+        ),
+    ]
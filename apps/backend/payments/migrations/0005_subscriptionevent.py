@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_payment_payments_pa_status_343680_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('renewal_queued', 'Renewal queued'), ('expired', 'Expired')], max_length=20)),
+                ('billing_date', models.DateField(blank=True, help_text='Billing date the event refers to', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('payment', models.ForeignKey(blank=True, help_text='Renewal payment queued by this event', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='subscription_events', to='payments.payment')),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='payments.subscription')),
+            ],
+            options={
+                'verbose_name': 'Subscription Event',
+                'verbose_name_plural': 'Subscription Events',
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(fields=('subscription', 'event', 'billing_date'), name='unique_subscription_event_per_billing_date')],
+            },
+        ),
+    ]
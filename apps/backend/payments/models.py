@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from decimal import Decimal
+from core.querycache import CachedManager
 
 
 class SubscriptionPlan(models.Model):
@@ -34,6 +35,9 @@ class SubscriptionPlan(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Plans change rarely; reads use .cached() (see core.querycache)
+    objects = CachedManager()
+    
     class Meta:
         ordering = ['price']
         verbose_name = 'Subscription Plan'
@@ -93,13 +97,8 @@ class Subscription(models.Model):
     
     @property
     def is_active(self):
-        """Check if subscription is currently active"""
-        from django.utils import timezone
-        today = timezone.now().date()
-        return (
-            self.status == 'active' and
-            (self.end_date is None or self.end_date >= today)
-        )
+        """Status is kept current by payments.subscriptions.sweep_subscriptions"""
+        return self.status == 'active'
 
 
 class Payment(models.Model):
@@ -169,7 +168,104 @@ class Payment(models.Model):
             models.Index(fields=['user', 'status']),
             models.Index(fields=['paystack_reference']),
             models.Index(fields=['transaction_id']),
+            models.Index(fields=['status', 'created_at']),
         ]
     
     def __str__(self):
         return f"Payment {self.id} - {self.user.username} - {self.currency} {self.amount} ({self.status})"
+
+
+class WebhookEvent(models.Model):
+    """Inbox of signature-verified Paystack webhook deliveries, applied by a background processor"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+    
+    event_key = models.CharField(max_length=200, unique=True, help_text='Event type plus Paystack id/reference; deduplicates retried deliveries')
+    event = models.CharField(max_length=100, help_text='Paystack event type, e.g. charge.success')
+    reference = models.CharField(max_length=100, blank=True, help_text='Transaction reference from the payload')
+    payload = models.JSONField(help_text='Full webhook payload')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-received_at']
+        verbose_name = 'Webhook Event'
+        verbose_name_plural = 'Webhook Events'
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event} {self.reference} ({self.status})"
+
+
+class SubscriptionEvent(models.Model):
+    """Audit trail of lifecycle transitions made by the subscription sweeper"""
+    
+    EVENT_RENEWAL_QUEUED = 'renewal_queued'
+    EVENT_EXPIRED = 'expired'
+    EVENT_CHOICES = [
+        (EVENT_RENEWAL_QUEUED, 'Renewal queued'),
+        (EVENT_EXPIRED, 'Expired'),
+    ]
+    
+    subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, related_name='events')
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES)
+    billing_date = models.DateField(null=True, blank=True, help_text='Billing date the event refers to')
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='subscription_events',
+        help_text='Renewal payment queued by this event'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Subscription Event'
+        verbose_name_plural = 'Subscription Events'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['subscription', 'event', 'billing_date'],
+                name='unique_subscription_event_per_billing_date',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.subscription_id} {self.event} ({self.billing_date})"
+
+
+class DailyRevenue(models.Model):
+    """Payment count and amount per day, plan, currency and status, maintained by payments.revenue"""
+    
+    date = models.DateField(help_text='Day the payments were created')
+    plan = models.ForeignKey(SubscriptionPlan, on_delete=models.PROTECT, related_name='daily_revenue')
+    currency = models.CharField(max_length=3)
+    status = models.CharField(max_length=20, choices=Payment.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-date', 'plan', 'currency', 'status']
+        verbose_name = 'Daily Revenue'
+        verbose_name_plural = 'Daily Revenue'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'plan', 'currency', 'status'],
+                name='unique_daily_revenue_bucket',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} {self.plan_id} {self.currency} {self.status}: {self.count} / {self.amount}"
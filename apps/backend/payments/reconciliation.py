@@ -0,0 +1,143 @@
+"""
+Background reconciliation of pending payments.
+
+`reconcile_pending_payments` pages through `pending` Payment rows by
+(created_at, id), verifies each page against Paystack with a bounded thread
+pool (only the HTTP calls run in threads), and writes the page's outcomes
+back with one bulk_update after locking the rows that are still pending, so a
+payment that a webhook or the verify endpoint settled meanwhile is left alone. Pending rows
+still unpaid after PAYMENT_PENDING_EXPIRY_HOURS are cancelled, except
+subscription renewals, which payments.subscriptions cancels when the grace
+period ends. Runs under run_scheduler or via
+`python manage.py reconcile_payments`.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .gateway import PaystackError, PaystackUnavailable, get_client
+from .models import Payment
+from .revenue import sync_revenue
+from .services import apply_successful_charge
+
+logger = logging.getLogger(__name__)
+
+# Paystack transaction statuses that mean the customer will not complete this charge
+FAILED_STATUSES = {'failed', 'reversed'}
+
+
+def _verify(reference):
+    """Returns (reference, transaction data or None, error or None); never raises."""
+    try:
+        return reference, get_client().verify_transaction(reference), None
+    except PaystackError as exc:
+        return reference, None, exc
+
+
+def _iter_pending_pages(before, batch_size):
+    """Pages of pending payments created before `before`, oldest first, via a keyset cursor."""
+    base = Payment.objects.filter(
+        status='pending', created_at__lte=before
+    ).select_related('plan').order_by('created_at', 'id')
+    cursor = None
+    while True:
+        queryset = base
+        if cursor:
+            created_at, payment_id = cursor
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=payment_id))
+        page = list(queryset[:batch_size])
+        if not page:
+            return
+        cursor = (page[-1].created_at, page[-1].id)
+        yield page
+
+
+def reconcile_pending_payments(now=None, min_age_minutes=None, expire_after_hours=None,
+                               batch_size=100, concurrency=None):
+    """
+    Verify pending payments older than `min_age_minutes` with the gateway and apply
+    the results. Returns a summary dict of counts.
+    """
+    now = now or timezone.now()
+    min_age = timedelta(minutes=min_age_minutes if min_age_minutes is not None
+                        else getattr(settings, 'PAYMENT_RECONCILE_MIN_AGE_MINUTES', 15))
+    expire_after = timedelta(hours=expire_after_hours if expire_after_hours is not None
+                             else getattr(settings, 'PAYMENT_PENDING_EXPIRY_HOURS', 24))
+    concurrency = concurrency or getattr(settings, 'PAYMENT_RECONCILE_CONCURRENCY', 4)
+    expires_before = now - expire_after
+    summary = {'checked': 0, 'succeeded': 0, 'failed': 0, 'expired': 0, 'pending': 0, 'skipped': 0, 'errors': 0}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for page in _iter_pending_pages(now - min_age, batch_size):
+            with_reference = [payment for payment in page if payment.paystack_reference]
+            results = {
+                reference: (data, error)
+                for reference, data, error in pool.map(_verify, [p.paystack_reference for p in with_reference])
+            }
+
+            changed = []
+            for payment in page:
+                data, error = results.get(payment.paystack_reference, (None, None))
+                summary['checked'] += 1
+                if isinstance(error, PaystackUnavailable):
+                    summary['errors'] += 1
+                    continue
+                gateway_status = (data or {}).get('status')
+
+                if gateway_status == 'success':
+                    # Activates the subscription too, so it goes through the shared service
+                    applied = apply_successful_charge(payment, data)
+                    if payment.status != 'success':
+                        summary['failed'] += 1
+                    else:
+                        summary['succeeded' if applied else 'skipped'] += 1
+                    continue
+
+                if gateway_status in FAILED_STATUSES:
+                    payment.status, outcome = 'failed', 'failed'
+                elif payment.created_at <= expires_before and not (payment.metadata or {}).get('renewal_for'):
+                    # Abandoned, never initialized, or unknown to Paystack and past the expiry window.
+                    # Renewals stay payable until the subscription sweep expires the subscription.
+                    payment.status, outcome = 'cancelled', 'expired'
+                else:
+                    summary['pending'] += 1
+                    continue
+
+                payment.metadata = {
+                    **(payment.metadata or {}),
+                    'reconciled_at': now.isoformat(),
+                    'gateway_status': gateway_status or (error.message if error else 'not initialized'),
+                }
+                payment.updated_at = now
+                changed.append((payment, outcome))
+
+            if changed:
+                with transaction.atomic():
+                    # Rows were read before the gateway calls; skip any settled since
+                    still_pending = set(
+                        Payment.objects.select_for_update()
+                        .filter(pk__in=[payment.pk for payment, _ in changed], status='pending')
+                        .values_list('pk', flat=True)
+                    )
+                    written = []
+                    for payment, outcome in changed:
+                        if payment.pk in still_pending:
+                            summary[outcome] += 1
+                            written.append(payment)
+                        else:
+                            summary['skipped'] += 1
+                    Payment.objects.bulk_update(written, ['status', 'metadata', 'updated_at'])
+                    sync_revenue(written)
+
+            if any(isinstance(error, PaystackUnavailable) for _, error in results.values()):
+                # The gateway is degraded (or the circuit is open); try the rest next run
+                logger.warning('Payment reconciliation stopped early: gateway unavailable')
+                break
+
+    logger.info('Payment reconciliation: %s', summary)
+    return summary
@@ -0,0 +1,100 @@
+"""
+Daily revenue rollups.
+
+DailyRevenue holds one row per (day, plan, currency, status) with the number
+and total amount of payments in that bucket. Payment saves and deletes adjust
+the affected buckets through `payments.signals`; code that writes payments
+with bulk_create/bulk_update calls `sync_revenue` itself. `rebuild_rollups`
+recomputes any date range from the Payment table
+(`python manage.py rebuild_revenue_rollups`), so reports never aggregate
+payments live.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyRevenue, Payment
+
+SNAPSHOT_FIELDS = ('created_at', 'plan_id', 'currency', 'status', 'amount')
+
+
+def snapshot(payment):
+    """((day, plan_id, currency, status), amount) for a saved payment, else None."""
+    values = payment.__dict__
+    if any(values.get(field) is None for field in SNAPSHOT_FIELDS):
+        return None  # unsaved, or loaded with deferred fields
+    day = timezone.localtime(values['created_at']).date()
+    return (day, values['plan_id'], values['currency'], values['status']), Decimal(str(values['amount']))
+
+
+def remember(payment):
+    payment._revenue_snapshot = snapshot(payment)
+
+
+def _add(deltas, state, sign):
+    if state is not None:
+        key, amount = state
+        deltas[key][0] += sign
+        deltas[key][1] += sign * amount
+
+
+def apply_deltas(deltas):
+    """Add {bucket: [count, amount]} to the rollup rows, creating buckets as needed."""
+    now = timezone.now()
+    for (day, plan_id, currency, status), (count, amount) in deltas.items():
+        if not count and not amount:
+            continue
+        bucket = DailyRevenue.objects.filter(date=day, plan_id=plan_id, currency=currency, status=status)
+        if bucket.update(count=F('count') + count, amount=F('amount') + amount, updated_at=now):
+            continue
+        try:
+            with transaction.atomic():
+                DailyRevenue.objects.create(
+                    date=day, plan_id=plan_id, currency=currency, status=status, count=count, amount=amount
+                )
+        except IntegrityError:
+            # Another writer created the bucket first
+            bucket.update(count=F('count') + count, amount=F('amount') + amount, updated_at=now)
+
+
+def sync_revenue(payments, deleted=False):
+    """Move each payment's contribution from its remembered bucket to its current one."""
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    for payment in payments:
+        before = getattr(payment, '_revenue_snapshot', None)
+        after = None if deleted else snapshot(payment)
+        if before != after:
+            _add(deltas, before, -1)
+            _add(deltas, after, 1)
+        payment._revenue_snapshot = after
+    if deltas:
+        apply_deltas(deltas)
+
+
+def rebuild_rollups(date_from, date_to):
+    """Recompute the rollup rows for days in [date_from, date_to]. Returns the number of rows written."""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(date_from, time.min), tz)
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min), tz)
+    buckets = (
+        Payment.objects.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'plan_id', 'currency', 'status')
+        .annotate(count=Count('id'), amount=Sum('amount'))
+        .order_by()
+    )
+    with transaction.atomic():
+        DailyRevenue.objects.filter(date__gte=date_from, date__lte=date_to).delete()
+        rows = DailyRevenue.objects.bulk_create([
+            DailyRevenue(
+                date=bucket['day'], plan_id=bucket['plan_id'], currency=bucket['currency'],
+                status=bucket['status'], count=bucket['count'], amount=bucket['amount'],
+            )
+            for bucket in buckets
+        ], batch_size=1000)
+    return len(rows)
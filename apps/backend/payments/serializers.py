@@ -73,12 +73,19 @@ class PaymentInitiateSerializer(serializers.Serializer):
     def validate_plan_id(self, value):
         """Validate that plan exists and is active"""
         try:
-            plan = SubscriptionPlan.objects.get(id=value, is_active=True)
+            SubscriptionPlan.objects.cached().get(id=value, is_active=True)
         except SubscriptionPlan.DoesNotExist:
             raise serializers.ValidationError("Invalid or inactive subscription plan.")
         return value
 
 
+class PaymentPaySerializer(serializers.Serializer):
+    """Serializer for opening checkout on an existing pending payment"""
+    
+    email = serializers.EmailField(required=False)
+    callback_url = serializers.URLField(required=False, allow_blank=True)
+
+
 class PaymentVerifySerializer(serializers.Serializer):
     """Serializer for verifying a payment"""
     
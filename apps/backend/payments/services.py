@@ -0,0 +1,91 @@
+"""
+Payment state transitions shared by the verify endpoint, the webhook
+processor and background jobs.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Payment, Subscription
+
+BILLING_PERIOD_DAYS = 30
+
+
+def amount_in_minor_units(amount):
+    """Paystack amounts are in the currency's smallest unit (kobo, cents)."""
+    return int((Decimal(amount) * 100).to_integral_value())
+
+
+def activate_subscription(payment):
+    """Create or extend the user's subscription for a successful payment."""
+    today = timezone.now().date()
+    active_subscription = Subscription.objects.filter(
+        user_id=payment.user_id,
+        status='active'
+    ).first()
+
+    if active_subscription:
+        active_subscription.plan = payment.plan
+        active_subscription.next_billing_date = today + timedelta(days=BILLING_PERIOD_DAYS)
+        active_subscription.save()
+        return active_subscription
+
+    return Subscription.objects.create(
+        user_id=payment.user_id,
+        plan=payment.plan,
+        status='active',
+        start_date=today,
+        next_billing_date=today + timedelta(days=BILLING_PERIOD_DAYS),
+        is_recurring=True,
+        auto_renew=True
+    )
+
+
+def _copy_state(source, target):
+    for field in Payment._meta.concrete_fields:
+        setattr(target, field.attname, getattr(source, field.attname))
+
+
+def apply_successful_charge(payment, charge):
+    """
+    Mark `payment` paid from a Paystack transaction object and activate its subscription.
+    Idempotent: returns False if the payment was already applied. The payment row is
+    locked and re-read first, so the verify endpoint, webhooks and reconciliation can
+    race on one reference; `payment` is updated with the stored state either way.
+    """
+    with transaction.atomic():
+        locked = Payment.objects.select_for_update().get(pk=payment.pk)
+        if locked.status == 'success':
+            _copy_state(locked, payment)
+            return False
+
+        expected = amount_in_minor_units(locked.amount)
+        if charge.get('amount') is not None and int(charge['amount']) != expected:
+            locked.status = 'failed'
+            locked.metadata = {
+                **(locked.metadata or {}),
+                'amount_mismatch': {'expected': expected, 'charged': charge['amount']},
+            }
+            locked.save()
+            _copy_state(locked, payment)
+            return False
+
+        locked.status = 'success'
+        locked.paid_at = locked.paid_at or timezone.now()
+        locked.metadata = charge.get('metadata') or locked.metadata or {}
+        locked.subscription = activate_subscription(locked)
+        locked.save()
+    _copy_state(locked, payment)
+    return True
+
+
+def mark_payment_failed(payment):
+    """Mark `payment` failed unless it was paid meanwhile. Returns the stored payment."""
+    with transaction.atomic():
+        locked = Payment.objects.select_for_update().get(pk=payment.pk)
+        if locked.status != 'success':
+            locked.status = 'failed'
+            locked.save()
+    return locked
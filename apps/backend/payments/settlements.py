@@ -0,0 +1,217 @@
+"""
+Offline reconciliation against Paystack settlement / transaction exports.
+
+`read_settlement_lines` streams the CSV export; `reconcile_settlements`
+matches it in chunks: one `paystack_reference__in` query (plus one
+`transaction_id__in` query for the leftovers) per chunk, then dict lookups per
+line. It reports lines with no matching payment, amount or currency
+mismatches, and references repeated in the file, and collects payments whose
+status disagrees with the gateway; `apply_corrections` writes those through
+the same locked transitions as the verify endpoint and webhooks.
+"""
+import csv
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Payment, Subscription
+from .revenue import sync_revenue
+from .services import amount_in_minor_units, apply_successful_charge
+
+# Header names used by the dashboard exports, matched case-insensitively
+COLUMNS = {
+    'reference': ('reference', 'transaction reference'),
+    'transaction_id': ('id', 'transaction id', 'transaction_id'),
+    'amount': ('amount', 'amount paid'),
+    'currency': ('currency',),
+    'status': ('status', 'transaction status'),
+}
+
+# Gateway status -> Payment status it implies
+STATUS_MAP = {
+    'success': 'success',
+    'failed': 'failed',
+    'reversed': 'failed',
+}
+
+PAYMENT_FIELDS = (
+    'id', 'paystack_reference', 'transaction_id', 'amount', 'currency', 'status',
+    'paid_at', 'metadata', 'user_id', 'plan_id', 'subscription_id', 'created_at',
+)
+
+
+@dataclass
+class SettlementReport:
+    lines: int = 0
+    matched: int = 0
+    missing: list = field(default_factory=list)
+    mismatched: list = field(default_factory=list)
+    duplicates: list = field(default_factory=list)
+    corrections: list = field(default_factory=list)
+
+    def issues(self):
+        """(kind, line number, reference, detail) tuples in file order."""
+        rows = [('missing', line['line'], line['reference'], '') for line in self.missing]
+        rows += [('mismatch', line['line'], line['reference'], detail) for line, detail in self.mismatched]
+        rows += [('duplicate', line['line'], line['reference'], f"first seen on line {first}") for line, first in self.duplicates]
+        rows += [
+            ('correction', line['line'], line['reference'], f'{old} -> {payment.status}')
+            for line, payment, old in self.corrections
+        ]
+        return sorted(rows, key=lambda row: row[1])
+
+
+def _parse_amount(value, minor_units):
+    try:
+        amount = Decimal(str(value).replace(',', '').strip() or '0')
+    except InvalidOperation:
+        return None
+    return amount / 100 if minor_units else amount
+
+
+def read_settlement_lines(fileobj, minor_units=False):
+    """Yield normalised dicts (line, reference, transaction_id, amount, currency, status)."""
+    reader = csv.DictReader(fileobj)
+    headers = {name.strip().lower(): name for name in reader.fieldnames or []}
+    columns = {
+        key: next((headers[alias] for alias in aliases if alias in headers), None)
+        for key, aliases in COLUMNS.items()
+    }
+    if not columns['reference'] or not columns['amount']:
+        raise ValueError('Export must have "Reference" and "Amount" columns')
+    for number, row in enumerate(reader, start=2):
+        yield {
+            'line': number,
+            'reference': (row[columns['reference']] or '').strip(),
+            'transaction_id': (row[columns['transaction_id']] or '').strip() if columns['transaction_id'] else '',
+            'amount': _parse_amount(row[columns['amount']], minor_units),
+            'currency': (row[columns['currency']] or '').strip().upper() if columns['currency'] else '',
+            'status': (row[columns['status']] or '').strip().lower() if columns['status'] else 'success',
+        }
+
+
+def _chunks(lines, size):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _match_chunk(chunk):
+    """Payments for a chunk keyed by reference and by transaction id, in at most two queries."""
+    references = {line['reference'] for line in chunk if line['reference']}
+    by_reference = {
+        payment.paystack_reference: payment
+        for payment in Payment.objects.filter(paystack_reference__in=references).only(*PAYMENT_FIELDS)
+    }
+    leftover_ids = {
+        line['transaction_id'] or line['reference'] for line in chunk
+        if line['reference'] not in by_reference and (line['transaction_id'] or line['reference'])
+    }
+    by_transaction = {}
+    if leftover_ids:
+        by_transaction = {
+            payment.transaction_id: payment
+            for payment in Payment.objects.filter(transaction_id__in=leftover_ids).only(*PAYMENT_FIELDS)
+        }
+    return by_reference, by_transaction
+
+
+def reconcile_settlements(lines, chunk_size=2000):
+    """Match settlement lines against payments. Returns a SettlementReport; nothing is written."""
+    report = SettlementReport()
+    first_seen = {}
+    for chunk in _chunks(lines, chunk_size):
+        by_reference, by_transaction = _match_chunk(chunk)
+        for line in chunk:
+            report.lines += 1
+            key = line['reference'] or line['transaction_id']
+            if not key:
+                report.missing.append(line)
+                continue
+            if key in first_seen:
+                report.duplicates.append((line, first_seen[key]))
+                continue
+            first_seen[key] = line['line']
+
+            payment = by_reference.get(line['reference']) or by_transaction.get(line['transaction_id'] or line['reference'])
+            if payment is None:
+                report.missing.append(line)
+                continue
+            report.matched += 1
+
+            if line['amount'] is None or line['amount'] != payment.amount:
+                report.mismatched.append((line, f"amount {line['amount']} != {payment.amount}"))
+                continue
+            if line['currency'] and line['currency'] != payment.currency:
+                report.mismatched.append((line, f"currency {line['currency']} != {payment.currency}"))
+                continue
+
+            expected = STATUS_MAP.get(line['status'])
+            if expected and payment.status != expected and payment.status != 'refunded':
+                old = payment.status
+                payment.status = expected
+                report.corrections.append((line, payment, old))
+    return report
+
+
+def _revoke_subscriptions(payments):
+    """Cancel the active subscriptions of `payments` that no other successful payment paid for."""
+    subscription_ids = {payment.subscription_id for payment in payments if payment.subscription_id}
+    if not subscription_ids:
+        return
+    still_paid = set(
+        Payment.objects.filter(subscription_id__in=subscription_ids, status='success')
+        .values_list('subscription_id', flat=True)
+    )
+    for subscription in Subscription.objects.filter(pk__in=subscription_ids - still_paid, status='active'):
+        subscription.status = 'cancelled'
+        subscription.save()
+
+
+def apply_corrections(report, batch_size=500):
+    """
+    Write the report's status corrections. Returns the number of payments updated.
+
+    The report's payments were read before this runs, so their rows are locked and any
+    whose status changed since (a webhook or the reconciliation sweep settled it) is left
+    alone. Payments the export shows as paid go through apply_successful_charge, which
+    activates the subscription; failures are written with bulk_update, and a payment
+    corrected from success to failed cancels the subscription it paid for.
+    """
+    now = timezone.now()
+    updated = 0
+    with transaction.atomic():
+        current = dict(
+            Payment.objects.select_for_update()
+            .filter(pk__in=[payment.pk for _, payment, _ in report.corrections])
+            .values_list('pk', 'status')
+        )
+        failed = []
+        for line, payment, old in report.corrections:
+            if current.get(payment.pk) != old:
+                continue
+            metadata = {
+                **(payment.metadata or {}),
+                'settlement_correction': {'from': old, 'line': line['line'], 'at': now.isoformat()},
+            }
+            if payment.status == 'success':
+                charge = {'amount': amount_in_minor_units(payment.amount), 'metadata': metadata}
+                if apply_successful_charge(payment, charge):
+                    updated += 1
+                continue
+            payment.metadata = metadata
+            payment.updated_at = now
+            failed.append((payment, old))
+
+        payments = [payment for payment, _ in failed]
+        Payment.objects.bulk_update(payments, ['status', 'metadata', 'updated_at'], batch_size=batch_size)
+        sync_revenue(payments)
+        _revoke_subscriptions([payment for payment, old in failed if old == 'success'])
+    return updated + len(payments)
@@ -0,0 +1,46 @@
+"""
+Cache invalidation for payments.entitlements and revenue rollup maintenance.
+"""
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from listings.models import Listing
+from .entitlements import increment_listing_usage, invalidate_entitlements, reset_listing_usage
+from .models import Payment, Subscription
+from .revenue import remember, sync_revenue
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_save, sender=Payment)
+def subscription_changed(sender, instance, **kwargs):
+    invalidate_entitlements(instance.user_id)
+
+
+@receiver(post_init, sender=Payment)
+def payment_loaded(sender, instance, **kwargs):
+    remember(instance)
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, **kwargs):
+    sync_revenue([instance])
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    sync_revenue([instance], deleted=True)
+
+
+@receiver(post_save, sender=Listing)
+def listing_saved(sender, instance, created, **kwargs):
+    if created and not instance.is_deleted:
+        increment_listing_usage(instance.agent_id)
+    elif not created:
+        # Could be a soft delete or restore; recount on the next quota check
+        reset_listing_usage(instance.agent_id)
+
+
+@receiver(post_delete, sender=Listing)
+def listing_deleted(sender, instance, **kwargs):
+    reset_listing_usage(instance.agent_id)
@@ -0,0 +1,166 @@
+"""
+Subscription lifecycle sweeper.
+
+`sweep_subscriptions` walks active subscriptions whose next_billing_date has
+arrived, in keyset chunks over the next_billing_date index, and for each chunk:
+
+* queues one pending renewal Payment per billing date for auto-renewing plans,
+  and emails the subscriber a link to pay it (the page calls
+  `POST /api/payments/{id}/pay/` to open checkout),
+* expires subscriptions that do not renew, or whose renewal is still unpaid
+  SUBSCRIPTION_GRACE_DAYS after the billing date, cancelling that renewal,
+
+then expires one-time subscriptions past their end_date. Transitions are
+set-based UPDATEs and every change is recorded in SubscriptionEvent, so
+`status='active'` can be trusted as the entitlement check.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.mail import enqueue_messages
+
+from .entitlements import invalidate_entitlements
+from .models import Payment, Subscription, SubscriptionEvent
+from .revenue import sync_revenue
+
+
+def _iter_due_chunks(today, batch_size):
+    base = Subscription.objects.filter(
+        status='active', next_billing_date__lte=today
+    ).order_by('next_billing_date', 'id').values(
+        'id', 'user_id', 'plan_id', 'next_billing_date', 'auto_renew', 'is_recurring',
+        'plan__name', 'plan__price', 'plan__currency', 'user__email', 'user__first_name', 'user__username',
+    )
+    cursor = None
+    while True:
+        queryset = base
+        if cursor:
+            billing_date, subscription_id = cursor
+            queryset = queryset.filter(
+                Q(next_billing_date__gt=billing_date) | Q(next_billing_date=billing_date, id__gt=subscription_id)
+            )
+        chunk = list(queryset[:batch_size])
+        if not chunk:
+            return
+        cursor = (chunk[-1]['next_billing_date'], chunk[-1]['id'])
+        yield chunk
+
+
+def _expire(rows, date_key, now):
+    """Expire the given subscription rows with one UPDATE and audit them. Returns the count."""
+    ids = [row['id'] for row in rows]
+    expired = Subscription.objects.filter(id__in=ids, status='active').update(
+        status='expired', end_date=F(date_key), updated_at=now
+    )
+    SubscriptionEvent.objects.bulk_create([
+        SubscriptionEvent(subscription_id=row['id'], event=SubscriptionEvent.EVENT_EXPIRED, billing_date=row[date_key])
+        for row in rows
+    ], ignore_conflicts=True)
+    # Renewals left unpaid can no longer be paid
+    renewals = list(Payment.objects.select_for_update().filter(subscription_id__in=ids, status='pending'))
+    if renewals:
+        Payment.objects.filter(id__in=[payment.id for payment in renewals], status='pending').update(
+            status='cancelled', updated_at=now
+        )
+        for payment in renewals:
+            payment.status = 'cancelled'
+        sync_revenue(renewals)
+    # UPDATE skips model signals, so drop the cached entitlements here
+    transaction.on_commit(lambda: invalidate_entitlements(*{row['user_id'] for row in rows}))
+    return expired
+
+
+def build_renewal_email(row, payment):
+    """EmailMessage asking the subscriber in `row` to pay the renewal `payment`."""
+    name = row['user__first_name'] or row['user__username']
+    grace = getattr(settings, 'SUBSCRIPTION_GRACE_DAYS', 3)
+    pay_url = f"{getattr(settings, 'SUBSCRIPTION_RENEWAL_URL', '')}?payment={payment.id}"
+    body = (
+        f'Hi {name},\n\n'
+        f"Your {row['plan__name']} subscription is due for renewal on {row['next_billing_date']:%d %B %Y}. "
+        f'Pay {payment.currency} {payment.amount} here to keep it active:\n\n'
+        f'{pay_url}\n\n'
+        f'If the renewal is still unpaid {grace} days after that date, the subscription will end.\n\n'
+        'Best regards,\nThe Keja Team'
+    )
+    return EmailMessage(
+        subject=f"Renew your {row['plan__name']} subscription",
+        body=body,
+        from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@keja.com'),
+        to=[row['user__email']],
+    )
+
+
+def _queue_renewals(rows):
+    """Create and email one pending renewal payment per subscription and billing date. Returns the count."""
+    already_queued = set(
+        SubscriptionEvent.objects.filter(
+            subscription_id__in=[row['id'] for row in rows],
+            event=SubscriptionEvent.EVENT_RENEWAL_QUEUED,
+        ).values_list('subscription_id', 'billing_date')
+    )
+    rows = [row for row in rows if (row['id'], row['next_billing_date']) not in already_queued]
+    if not rows:
+        return 0
+    payments = Payment.objects.bulk_create([
+        Payment(
+            user_id=row['user_id'],
+            plan_id=row['plan_id'],
+            subscription_id=row['id'],
+            amount=row['plan__price'],
+            currency=row['plan__currency'],
+            status='pending',
+            description=f"Renewal of {row['plan__name']} due {row['next_billing_date']:%Y-%m-%d}",
+            metadata={'renewal_for': row['id'], 'billing_date': row['next_billing_date'].isoformat()},
+        )
+        for row in rows
+    ])
+    sync_revenue(payments)
+    SubscriptionEvent.objects.bulk_create([
+        SubscriptionEvent(
+            subscription_id=row['id'],
+            event=SubscriptionEvent.EVENT_RENEWAL_QUEUED,
+            billing_date=row['next_billing_date'],
+            payment=payment,
+        )
+        for row, payment in zip(rows, payments)
+    ])
+    enqueue_messages([build_renewal_email(row, payment) for row, payment in zip(rows, payments)])
+    return len(rows)
+
+
+def sweep_subscriptions(today=None, grace_days=None, batch_size=500):
+    """Queue renewals and expire lapsed subscriptions. Returns a summary dict of counts."""
+    now = timezone.now()
+    today = today or timezone.localdate()
+    grace = timedelta(days=grace_days if grace_days is not None else getattr(settings, 'SUBSCRIPTION_GRACE_DAYS', 3))
+    summary = {'renewals_queued': 0, 'expired': 0}
+
+    for chunk in _iter_due_chunks(today, batch_size):
+        renewing = [row for row in chunk if row['auto_renew'] and row['is_recurring']]
+        lapsed = [row for row in chunk if not (row['auto_renew'] and row['is_recurring'])]
+        lapsed += [row for row in renewing if row['next_billing_date'] < today - grace]
+        renewing = [row for row in renewing if row['next_billing_date'] >= today - grace]
+        with transaction.atomic():
+            if lapsed:
+                summary['expired'] += _expire(lapsed, 'next_billing_date', now)
+            if renewing:
+                summary['renewals_queued'] += _queue_renewals(renewing)
+
+    # One-time subscriptions carry an end_date instead of a billing date
+    while True:
+        rows = list(
+            Subscription.objects.filter(status='active', end_date__lt=today)
+            .order_by('id').values('id', 'user_id', 'end_date')[:batch_size]
+        )
+        if not rows:
+            break
+        with transaction.atomic():
+            summary['expired'] += _expire(rows, 'end_date', now)
+
+    return summary
@@ -1,3 +1,564 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.test import APIClient
+
+from core.cache import clear_local
+from core.models import OutboundEmail
+from users.models import User
+from .entitlements import check_listing_quota, enforce_listing_quota
+from .gateway import CircuitBreaker, PaystackClient, PaystackError, PaystackUnavailable, reset_client
+from . import reconciliation
+from .models import DailyRevenue, Payment, Subscription, SubscriptionEvent, SubscriptionPlan, WebhookEvent
+from .reconciliation import reconcile_pending_payments
+from .revenue import rebuild_rollups
+from .services import apply_successful_charge
+from .settlements import apply_corrections, reconcile_settlements
+from .subscriptions import sweep_subscriptions
+from .webhooks import process_webhook_events
+
+
+class FakePaystack:
+    """Minimal local stand-in for the Paystack API, scriptable per test."""
+
+    def __init__(self):
+        self.transactions = {}
+        self.calls = []
+        self.fail_with = None  # HTTP status to return for every call
+        self.delay = 0.0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                fake.calls.append(('POST', self.path))
+                if fake.delay:
+                    time.sleep(fake.delay)
+                if fake.fail_with:
+                    return self._reply(fake.fail_with, {'status': False, 'message': 'Down'})
+                reference = payload['reference']
+                fake.transactions[reference] = {
+                    'reference': reference, 'status': 'success',
+                    'amount': payload['amount'], 'metadata': payload.get('metadata', {}),
+                }
+                self._reply(200, {'status': True, 'message': 'Authorization URL created', 'data': {
+                    'reference': reference, 'access_code': 'ac_test',
+                    'authorization_url': f'https://checkout.paystack.test/{reference}',
+                }})
+
+            def do_GET(self):
+                fake.calls.append(('GET', self.path))
+                if fake.delay:
+                    time.sleep(fake.delay)
+                if fake.fail_with:
+                    return self._reply(fake.fail_with, {'status': False, 'message': 'Down'})
+                reference = self.path.rsplit('/', 1)[-1]
+                if reference not in fake.transactions:
+                    return self._reply(400, {'status': False, 'message': 'Transaction reference not found'})
+                self._reply(200, {'status': True, 'message': 'Verification successful', 'data': fake.transactions[reference]})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.handle_error = lambda request, client_address: None  # clients that timed out hang up
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class PaystackClientTests(TestCase):
+    def setUp(self):
+        self.fake = FakePaystack()
+        self.addCleanup(self.fake.stop)
+
+    def make_client(self, **kwargs):
+        kwargs.setdefault('breaker', CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        return PaystackClient('sk_test', base_url=self.fake.url, **kwargs)
+
+    def test_initialize_and_verify(self):
+        client = self.make_client()
+        data = client.initialize_transaction({'reference': 'REF1', 'amount': 1000, 'email': 'a@example.com'})
+        self.assertEqual(data['access_code'], 'ac_test')
+        self.assertEqual(client.verify_transaction('REF1')['status'], 'success')
+        self.assertEqual(client.status()['operations']['verify']['calls'], 1)
+
+    def test_rejection_is_not_a_breaker_failure(self):
+        client = self.make_client()
+        for _ in range(3):
+            with self.assertRaises(PaystackError):
+                client.verify_transaction('missing')
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_breaker_opens_and_fails_fast(self):
+        self.fake.fail_with = 500
+        client = self.make_client(max_retries=0)
+        for _ in range(2):
+            with self.assertRaises(PaystackUnavailable):
+                client.verify_transaction('REF1')
+        calls_before = len(self.fake.calls)
+        with self.assertRaises(PaystackUnavailable):
+            client.verify_transaction('REF1')
+        self.assertEqual(len(self.fake.calls), calls_before)
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+    def test_read_timeout_is_enforced(self):
+        self.fake.delay = 1.0
+        client = self.make_client(read_timeout=0.2, max_retries=0)
+        started = time.monotonic()
+        with self.assertRaises(PaystackUnavailable):
+            client.verify_transaction('REF1')
+        self.assertLess(time.monotonic() - started, 0.9)
+
+    def test_idempotent_calls_are_retried(self):
+        self.fake.fail_with = 503
+        client = self.make_client(max_retries=2, breaker=CircuitBreaker(failure_threshold=10))
+        with self.assertRaises(PaystackUnavailable):
+            client.verify_transaction('REF1')
+        self.assertEqual(len(self.fake.calls), 3)
+
+
+class PaymentFlowTests(TestCase):
+    def setUp(self):
+        self.fake = FakePaystack()
+        self.addCleanup(self.fake.stop)
+        settings_override = override_settings(PAYSTACK_BASE_URL=self.fake.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_client()
+        self.addCleanup(reset_client)
+
+        self.user = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.plan = SubscriptionPlan.objects.create(name='Pro', plan_type='premium', price=1500)
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_initiate_then_verify_activates_subscription(self):
+        response = self.api.post('/api/payments/initiate/', {'plan_id': self.plan.id, 'email': self.user.email})
+        self.assertEqual(response.status_code, 200)
+        reference = response.data['data']['reference']
+
+        response = self.api.post('/api/payments/verify/', {'reference': reference})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Payment.objects.get(paystack_reference=reference).status, 'success')
+        self.assertTrue(Subscription.objects.filter(user=self.user, status='active').exists())
+
+    def test_retried_initiate_with_idempotency_key_replays(self):
+        body = {'plan_id': self.plan.id, 'email': self.user.email}
+        first = self.api.post('/api/payments/initiate/', body, HTTP_IDEMPOTENCY_KEY='checkout-1')
+        second = self.api.post('/api/payments/initiate/', body, HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(len(self.fake.calls), 1)
+
+        other = self.api.post('/api/payments/initiate/', {**body, 'amount': 10}, HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(other.status_code, 422)
+
+    def test_queued_renewal_is_emailed_and_can_be_paid(self):
+        subscription = Subscription.objects.create(
+            user=self.user, plan=self.plan, status='active',
+            start_date=timezone.localdate() - timedelta(days=30), next_billing_date=timezone.localdate(),
+        )
+        self.assertEqual(sweep_subscriptions()['renewals_queued'], 1)
+        renewal = Payment.objects.get(subscription=subscription)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.to, [self.user.email])
+        self.assertIn(f'?payment={renewal.id}', email.body)
+
+        # Still payable long after PAYMENT_PENDING_EXPIRY_HOURS
+        Payment.objects.filter(pk=renewal.pk).update(created_at=timezone.now() - timedelta(days=2))
+        reconcile_pending_payments()
+        self.assertEqual(Payment.objects.get(pk=renewal.pk).status, 'pending')
+
+        response = self.api.post(f'/api/payments/{renewal.id}/pay/')
+        self.assertEqual(response.status_code, 200)
+        reference = response.data['data']['reference']
+        self.assertTrue(response.data['data']['authorization_url'].endswith(reference))
+        self.assertEqual(self.api.post(f'/api/payments/{renewal.id}/pay/').data['data']['reference'], reference)
+        self.assertEqual([call for call in self.fake.calls if call[0] == 'POST'], [('POST', '/transaction/initialize')])
+
+        self.assertEqual(self.api.post('/api/payments/verify/', {'reference': reference}).status_code, 200)
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.status, 'active')
+        self.assertGreater(subscription.next_billing_date, timezone.localdate())
+        self.assertEqual(self.api.post(f'/api/payments/{renewal.id}/pay/').status_code, 400)
+
+    def test_initiate_returns_503_when_gateway_down(self):
+        self.fake.fail_with = 502
+        response = self.api.post('/api/payments/initiate/', {'plan_id': self.plan.id, 'email': self.user.email})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(Payment.objects.get().status, 'failed')
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        self.fake = FakePaystack()
+        self.addCleanup(self.fake.stop)
+        settings_override = override_settings(PAYSTACK_BASE_URL=self.fake.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_client()
+        self.addCleanup(reset_client)
+
+        self.user = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.plan = SubscriptionPlan.objects.create(name='Pro', plan_type='premium', price=1500)
+
+    def make_payment(self, reference, age, gateway_status=None):
+        payment = Payment.objects.create(user=self.user, plan=self.plan, amount=1500, paystack_reference=reference)
+        Payment.objects.filter(pk=payment.pk).update(created_at=timezone.now() - age)
+        if gateway_status:
+            self.fake.transactions[reference] = {'reference': reference, 'status': gateway_status, 'amount': 150000}
+        return payment
+
+    def test_applies_gateway_results_and_expires_stale(self):
+        self.make_payment('PAID', timedelta(hours=1), 'success')
+        self.make_payment('DECLINED', timedelta(hours=1), 'failed')
+        self.make_payment('ABANDONED', timedelta(days=2), 'abandoned')
+        self.make_payment('WAITING', timedelta(hours=1), 'abandoned')
+        self.make_payment('FRESH', timedelta(minutes=1), 'success')
+
+        summary = reconcile_pending_payments(batch_size=2)
+
+        self.assertEqual(summary['checked'], 4)
+        statuses = dict(Payment.objects.values_list('paystack_reference', 'status'))
+        self.assertEqual(statuses, {
+            'PAID': 'success', 'DECLINED': 'failed', 'ABANDONED': 'cancelled',
+            'WAITING': 'pending', 'FRESH': 'pending',
+        })
+        self.assertTrue(Subscription.objects.filter(user=self.user, status='active').exists())
+        self.assertNotIn(('GET', '/transaction/verify/FRESH'), self.fake.calls)
+
+    def test_payments_settled_during_the_sweep_are_not_overwritten(self):
+        self.make_payment('PAID_MEANWHILE', timedelta(days=2), 'abandoned')
+        self.make_payment('STALE', timedelta(days=2))
+        verify = reconciliation._verify
+
+        def verify_while_webhook_lands(reference):
+            if reference == 'PAID_MEANWHILE':
+                payment = Payment.objects.get(paystack_reference=reference)
+                apply_successful_charge(payment, {'amount': 150000})
+            return verify(reference)
+
+        # Run the gateway calls on this thread so the simulated webhook shares the test transaction
+        pool = mock.MagicMock()
+        pool.return_value.__enter__.return_value.map = lambda func, items: list(map(func, items))
+        with mock.patch.object(reconciliation, '_verify', verify_while_webhook_lands), \
+                mock.patch.object(reconciliation, 'ThreadPoolExecutor', pool):
+            summary = reconcile_pending_payments()
+
+        self.assertEqual((summary['expired'], summary['skipped']), (1, 1))
+        statuses = dict(Payment.objects.values_list('paystack_reference', 'status'))
+        self.assertEqual(statuses, {'PAID_MEANWHILE': 'success', 'STALE': 'cancelled'})
+        self.assertEqual(
+            dict(DailyRevenue.objects.exclude(status='pending').values_list('status', 'count')),
+            {'success': 1, 'cancelled': 1},
+        )
+
+    def test_page_outcomes_are_written_in_one_update(self):
+        for i in range(3):
+            self.make_payment(f'DECLINED{i}', timedelta(hours=1), 'failed')
+        with CaptureQueriesContext(connection) as queries:
+            summary = reconcile_pending_payments()
+        self.assertEqual(summary['failed'], 3)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "payments_payment"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(set(Payment.objects.values_list('status', flat=True)), {'failed'})
+
+    def test_stops_when_gateway_is_down(self):
+        self.fake.fail_with = 500
+        self.make_payment('PAID', timedelta(hours=1), 'success')
+        with override_settings(PAYSTACK_MAX_RETRIES=0):
+            reset_client()
+            summary = reconcile_pending_payments()
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual(Payment.objects.get().status, 'pending')
+
+
+class SubscriptionSweepTests(TestCase):
+    def setUp(self):
+        self.plan = SubscriptionPlan.objects.create(name='Pro', plan_type='premium', price=1500)
+        self.today = timezone.localdate()
+
+    def subscribe(self, username, **fields):
+        user = User.objects.create_user(username, f'{username}@example.com', 'pw', role='agent')
+        fields.setdefault('start_date', self.today - timedelta(days=30))
+        return Subscription.objects.create(user=user, plan=self.plan, status='active', **fields)
+
+    def test_sweep_renews_and_expires(self):
+        renewing = self.subscribe('renewing', next_billing_date=self.today)
+        cancelled = self.subscribe('cancelled', next_billing_date=self.today, auto_renew=False)
+        unpaid = self.subscribe('unpaid', next_billing_date=self.today - timedelta(days=10))
+        one_time = self.subscribe('onetime', is_recurring=False, end_date=self.today - timedelta(days=1))
+        current = self.subscribe('current', next_billing_date=self.today + timedelta(days=5))
+
+        self.assertEqual(sweep_subscriptions(batch_size=2), {'renewals_queued': 1, 'expired': 3})
+        self.assertEqual(sweep_subscriptions(batch_size=2), {'renewals_queued': 0, 'expired': 0})
+
+        statuses = dict(Subscription.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[renewing.id], 'active')
+        self.assertEqual(statuses[current.id], 'active')
+        for subscription in (cancelled, unpaid, one_time):
+            self.assertEqual(statuses[subscription.id], 'expired')
+
+        renewal = Payment.objects.get()
+        self.assertEqual((renewal.subscription_id, renewal.status, renewal.amount), (renewing.id, 'pending', 1500))
+        self.assertEqual(SubscriptionEvent.objects.filter(event=SubscriptionEvent.EVENT_EXPIRED).count(), 3)
+
+    def test_unpaid_renewal_is_cancelled_when_the_subscription_lapses(self):
+        renewing = self.subscribe('renewing', next_billing_date=self.today)
+        sweep_subscriptions()
+        self.assertEqual(sweep_subscriptions(today=self.today + timedelta(days=4), grace_days=3)['expired'], 1)
+        self.assertEqual(Subscription.objects.get(pk=renewing.pk).status, 'expired')
+        self.assertEqual(Payment.objects.get().status, 'cancelled')
+
+
+@override_settings(FREE_TIER_MAX_LISTINGS=0)
+class ListingQuotaTests(TestCase):
+    listing = {
+        'title': 'Garden flat', 'description': 'Two bedroom flat', 'property_type': 'apartment',
+        'address': '1 Ngong Rd', 'city': 'Nairobi', 'state': 'Nairobi', 'zip_code': '00100',
+        'price': 50000, 'bedrooms': 2, 'bathrooms': 1, 'square_feet': 900,
+    }
+
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.addCleanup(cache.clear)
+        self.agent = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.plan = SubscriptionPlan.objects.create(name='Starter', plan_type='basic', price=500, max_listings=1)
+        self.api = APIClient()
+        self.api.force_authenticate(self.agent)
+
+    def test_free_tier_then_plan_quota(self):
+        self.assertEqual(self.api.post('/api/listings/', self.listing).status_code, 403)
+
+        Subscription.objects.create(user=self.agent, plan=self.plan, status='active', start_date=timezone.localdate())
+        self.assertEqual(self.api.post('/api/listings/', self.listing).status_code, 201)
+        with self.assertNumQueries(0):
+            with self.assertRaises(PermissionDenied):
+                check_listing_quota(self.agent)
+        self.assertEqual(self.api.post('/api/listings/', self.listing).status_code, 403)
+
+    def test_quota_holds_when_the_cached_count_is_wrong(self):
+        Subscription.objects.create(user=self.agent, plan=self.plan, status='active', start_date=timezone.localdate())
+        self.assertEqual(self.api.post('/api/listings/', self.listing).status_code, 201)
+        # A lost increment or an evicted counter must not let the agent past the limit
+        cache.set(f'listing_usage:{self.agent.pk}', 0)
+        self.assertEqual(self.api.post('/api/listings/', self.listing).status_code, 403)
+        self.assertEqual(self.agent.listings.count(), 1)
+
+    def test_creates_below_the_last_slot_skip_the_count(self):
+        self.plan.max_listings = 3
+        self.plan.save()
+        Subscription.objects.create(user=self.agent, plan=self.plan, status='active', start_date=timezone.localdate())
+        self.assertEqual(self.api.post('/api/listings/', self.listing).status_code, 201)
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            enforce_listing_quota(self.agent)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.api.post('/api/listings/', self.listing).status_code, 201)
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            enforce_listing_quota(self.agent)
+        self.assertTrue(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(self.api.post('/api/listings/', self.listing).status_code, 201)
+        self.assertEqual(self.api.post('/api/listings/', self.listing).status_code, 403)
+
+
+class RevenueRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.plan = SubscriptionPlan.objects.create(name='Pro', plan_type='premium', price=1500)
+
+    def buckets(self):
+        return set(DailyRevenue.objects.exclude(count=0).values_list('status', 'count', 'amount'))
+
+    def test_transitions_match_rebuild_and_report(self):
+        first = Payment.objects.create(user=self.user, plan=self.plan, amount=1500)
+        Payment.objects.create(user=self.user, plan=self.plan, amount=1500)
+        first.status = 'success'
+        first.save()
+        Payment.objects.get(pk=first.pk).delete()
+        Payment.objects.create(user=self.user, plan=self.plan, amount='99.50', status='failed')
+
+        incremental = self.buckets()
+        self.assertEqual(incremental, {('pending', 1, 1500), ('failed', 1, Decimal('99.50'))})
+        today = timezone.localdate()
+        rebuild_rollups(today, today)
+        self.assertEqual(self.buckets(), incremental)
+
+        api = APIClient()
+        api.force_authenticate(self.user)
+        self.assertEqual(api.get('/api/payments/reports/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = api.get('/api/payments/reports/', {'status': 'pending'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totals'], [{'currency': 'KES', 'status': 'pending', 'count': 1, 'amount': '1500.00'}])
+        for params in ({'from': '2026-02-30'}, {'to': 'yesterday'}, {'from': '2026-03-10', 'to': '2026-03-01'}):
+            self.assertEqual(api.get('/api/payments/reports/', params).status_code, 400)
+
+
+class SettlementReconciliationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.plan = SubscriptionPlan.objects.create(name='Pro', plan_type='premium', price=1500)
+        for reference, status in [('PAID', 'success'), ('LATE', 'pending'), ('SHORT', 'pending')]:
+            Payment.objects.create(
+                user=self.user, plan=self.plan, amount=1500, status=status,
+                paystack_reference=reference, transaction_id=reference,
+            )
+
+    def run_export(self, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as export:
+            export.write(
+                'Reference,Amount,Currency,Status\n'
+                'PAID,1500.00,KES,success\n'
+                'LATE,1500.00,KES,success\n'
+                'SHORT,150.00,KES,success\n'
+                'UNKNOWN,99.00,KES,success\n'
+                'PAID,1500.00,KES,success\n'
+            )
+        self.addCleanup(os.remove, export.name)
+        out = StringIO()
+        call_command('reconcile_settlements', export.name, *args, stdout=out)
+        return out.getvalue()
+
+    def test_reports_and_applies_corrections(self):
+        output = self.run_export()
+        self.assertIn('5 line(s), 3 matched, 1 missing, 1 mismatched, 1 duplicate(s), 1 status correction(s)', output)
+        self.assertEqual(Payment.objects.get(paystack_reference='LATE').status, 'pending')
+
+        self.run_export('--apply')
+        late = Payment.objects.get(paystack_reference='LATE')
+        self.assertEqual(late.status, 'success')
+        self.assertIsNotNone(late.subscription_id)
+        self.assertEqual(Payment.objects.get(paystack_reference='SHORT').status, 'pending')
+
+    def correct(self, *lines):
+        return apply_corrections(reconcile_settlements([
+            {'line': number, 'reference': reference, 'transaction_id': '', 'amount': Decimal('1500.00'),
+             'currency': 'KES', 'status': status}
+            for number, (reference, status) in enumerate(lines, start=2)
+        ]))
+
+    def test_pending_corrections_settle_through_the_payment_services(self):
+        self.assertEqual(self.correct(('LATE', 'success'), ('SHORT', 'failed')), 2)
+        late = Payment.objects.get(paystack_reference='LATE')
+        self.assertEqual(late.status, 'success')
+        self.assertEqual(late.metadata['settlement_correction']['from'], 'pending')
+        self.assertTrue(Subscription.objects.filter(pk=late.subscription_id, status='active').exists())
+        self.assertEqual(Payment.objects.get(paystack_reference='SHORT').status, 'failed')
+        self.assertEqual(
+            dict(DailyRevenue.objects.exclude(count=0).values_list('status', 'count')),
+            {'success': 2, 'failed': 1},
+        )
+
+    def test_reversed_payment_cancels_its_subscription(self):
+        self.assertEqual(self.correct(('LATE', 'success')), 1)
+        late = Payment.objects.get(paystack_reference='LATE')
+        self.assertEqual(self.correct(('LATE', 'reversed')), 1)
+        late.refresh_from_db()
+        self.assertEqual(late.status, 'failed')
+        self.assertEqual(Subscription.objects.get(pk=late.subscription_id).status, 'cancelled')
+
+    def test_payments_settled_after_the_report_are_left_alone(self):
+        report = reconcile_settlements([
+            {'line': 2, 'reference': 'LATE', 'transaction_id': '', 'amount': Decimal('1500.00'),
+             'currency': 'KES', 'status': 'failed'},
+        ])
+        apply_successful_charge(Payment.objects.get(paystack_reference='LATE'), {'amount': 150000})
+        self.assertEqual(apply_corrections(report), 0)
+        self.assertEqual(Payment.objects.get(paystack_reference='LATE').status, 'success')
+
+
+@override_settings(PAYSTACK_SECRET_KEY='sk_test_webhook')
+class WebhookTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.plan = SubscriptionPlan.objects.create(name='Pro', plan_type='premium', price=1500)
+        self.payment = Payment.objects.create(
+            user=self.user, plan=self.plan, amount=1500, paystack_reference='KEJA_REF'
+        )
+        self.api = APIClient()
+
+    def deliver(self, payload, secret='sk_test_webhook'):
+        body = json.dumps(payload).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+        return self.api.post(
+            '/api/payments/webhook/', body, content_type='application/json',
+            HTTP_X_PAYSTACK_SIGNATURE=signature,
+        )
+
+    def charge(self, amount=150000):
+        return {'event': 'charge.success', 'data': {
+            'id': 991, 'reference': 'KEJA_REF', 'status': 'success', 'amount': amount,
+        }}
+
+    def test_rejects_bad_signature(self):
+        response = self.deliver(self.charge(), secret='wrong')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_duplicate_deliveries_apply_once(self):
+        for _ in range(3):
+            self.assertEqual(self.deliver(self.charge()).status_code, 200)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+
+        self.assertEqual(process_webhook_events(), 1)
+        self.assertEqual(process_webhook_events(), 0)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'success')
+        self.assertEqual(Subscription.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(WebhookEvent.objects.get().status, 'processed')
+
+    def test_concurrent_appliers_activate_once(self):
+        # The verify endpoint and the webhook worker each loaded the payment while it was pending
+        first, second = Payment.objects.get(pk=self.payment.pk), Payment.objects.get(pk=self.payment.pk)
+        self.assertTrue(apply_successful_charge(first, self.charge()['data']))
+        subscription = Subscription.objects.get(user=self.user)
+        self.assertFalse(apply_successful_charge(second, self.charge()['data']))
+        self.assertEqual((second.status, second.subscription_id), ('success', subscription.pk))
+        self.assertEqual(Subscription.objects.get(user=self.user).next_billing_date, subscription.next_billing_date)
+        self.assertEqual(Subscription.objects.filter(user=self.user).count(), 1)
+
+    def test_amount_mismatch_does_not_activate(self):
+        self.deliver(self.charge(amount=100))
+        process_webhook_events()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'failed')
+        self.assertFalse(Subscription.objects.exists())
@@ -1,16 +1,23 @@
-import requests
+from datetime import timedelta
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.conf import settings
+from django.db.models import Sum
 from django.utils import timezone
-from datetime import timedelta
-from .models import SubscriptionPlan, Subscription, Payment
+from core.idempotency import idempotent
+from core.params import date_param
+from .gateway import PaystackError, PaystackUnavailable, get_client
+from .models import SubscriptionPlan, Subscription, Payment, DailyRevenue
+from .services import amount_in_minor_units, apply_successful_charge, mark_payment_failed
+from .webhooks import record_event, verify_signature
 from .serializers import (
     SubscriptionPlanSerializer,
     SubscriptionSerializer,
     PaymentSerializer,
     PaymentInitiateSerializer,
+    PaymentPaySerializer,
     PaymentVerifySerializer
 )
 
@@ -23,7 +30,7 @@ class SubscriptionPlanViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Filter plans by target_user_type if provided, otherwise return all active plans"""
-        queryset = SubscriptionPlan.objects.filter(is_active=True)
+        queryset = SubscriptionPlan.objects.filter(is_active=True).cached()
         
         # Get target_user_type from query parameter
         target_user_type = self.request.query_params.get('target_user_type', None)
@@ -68,10 +75,12 @@ class PaymentViewSet(viewsets.ModelViewSet):
         return Payment.objects.filter(user=self.request.user).select_related('plan', 'subscription')
     
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    @idempotent
     def initiate(self, request):
         """
         Initiate a Paystack payment
         POST /api/payments/initiate/
+        Send an Idempotency-Key header so a retried request replays the first response.
         """
         serializer = PaymentInitiateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -81,7 +90,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
         callback_url = serializer.validated_data.get('callback_url', '')
         
         try:
-            plan = SubscriptionPlan.objects.get(id=plan_id, is_active=True)
+            plan = SubscriptionPlan.objects.cached().get(id=plan_id, is_active=True)
         except SubscriptionPlan.DoesNotExist:
             return Response(
                 {'error': 'Invalid subscription plan'},
@@ -91,11 +100,6 @@ class PaymentViewSet(viewsets.ModelViewSet):
         # Use provided amount or plan price
         amount = serializer.validated_data.get('amount', plan.price)
         
-        # Convert to kobo (Paystack uses smallest currency unit)
-        # For KES, 1 KES = 100 kobo, but Paystack uses amount in kobo
-        # For other currencies, adjust accordingly
-        amount_in_kobo = int(float(amount) * 100)  # Convert to kobo
-        
         # Get Paystack secret key from settings
         paystack_secret_key = getattr(settings, 'PAYSTACK_SECRET_KEY', '')
         if not paystack_secret_key:
@@ -115,72 +119,112 @@ class PaymentViewSet(viewsets.ModelViewSet):
             description=f"Subscription payment for {plan.name}"
         )
         
-        # Initialize Paystack payment
-        paystack_url = "https://api.paystack.co/transaction/initialize"
-        headers = {
-            "Authorization": f"Bearer {paystack_secret_key}",
-            "Content-Type": "application/json"
-        }
+        try:
+            self._initialize_checkout(request, payment, email, callback_url)
+        except PaystackUnavailable as e:
+            payment.status = 'failed'
+            payment.save()
+            return Response(
+                {'error': f'Payment initialization failed: {e.message}'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except PaystackError as e:
+            payment.status = 'failed'
+            payment.save()
+            return Response(
+                {'error': e.message or 'Failed to initialize payment'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(self._checkout_response(payment), status=status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    @idempotent
+    def pay(self, request, pk=None):
+        """
+        Open checkout for one of the user's pending payments, e.g. a renewal queued by the subscription sweep
+        POST /api/payments/{id}/pay/ body {email?, callback_url?}
+        Returns the existing checkout if the payment was already initialized.
+        """
+        payment = self.get_object()
+        if payment.status != 'pending':
+            return Response(
+                {'error': 'Only pending payments can be paid'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = PaymentPaySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
+        if not payment.paystack_authorization_url:
+            if not getattr(settings, 'PAYSTACK_SECRET_KEY', ''):
+                return Response(
+                    {'error': 'Paystack secret key not configured'},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+            email = serializer.validated_data.get('email') or request.user.email
+            if not email:
+                return Response(
+                    {'error': 'An email address is required to pay'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # Unlike initiate, a gateway error leaves the payment pending so it can be retried
+            try:
+                self._initialize_checkout(request, payment, email, serializer.validated_data.get('callback_url', ''))
+            except PaystackUnavailable as e:
+                return Response(
+                    {'error': f'Payment initialization failed: {e.message}'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            except PaystackError as e:
+                return Response(
+                    {'error': e.message or 'Failed to initialize payment'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        return Response(self._checkout_response(payment), status=status.HTTP_200_OK)
+    
+    def _initialize_checkout(self, request, payment, email, callback_url):
+        """Initialize a Paystack transaction for `payment` and store its details; raises PaystackError"""
         # Build callback URL
         if not callback_url:
             callback_url = request.build_absolute_uri('/api/payments/verify/')
         
         payload = {
             "email": email,
-            "amount": amount_in_kobo,
-            "currency": plan.currency,
+            # Paystack amounts are in the smallest currency unit (kobo, cents)
+            "amount": amount_in_minor_units(payment.amount),
+            "currency": payment.currency,
             "reference": f"KEJA_{payment.id}_{timezone.now().timestamp()}",
             "callback_url": callback_url,
             "metadata": {
                 "payment_id": payment.id,
                 "user_id": request.user.id,
-                "plan_id": plan.id,
-                "plan_name": plan.name
+                "plan_id": payment.plan.id,
+                "plan_name": payment.plan.name
             }
         }
+        payment_data = get_client().initialize_transaction(payload)
         
-        try:
-            response = requests.post(paystack_url, json=payload, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get('status'):
-                payment_data = data.get('data', {})
-                
-                # Update payment with Paystack details
-                payment.paystack_reference = payment_data.get('reference')
-                payment.paystack_access_code = payment_data.get('access_code')
-                payment.paystack_authorization_url = payment_data.get('authorization_url')
-                payment.transaction_id = payment_data.get('reference')
-                payment.save()
-                
-                return Response({
-                    'status': 'success',
-                    'message': 'Payment initialized successfully',
-                    'data': {
-                        'payment_id': payment.id,
-                        'authorization_url': payment.paystack_authorization_url,
-                        'access_code': payment.paystack_access_code,
-                        'reference': payment.paystack_reference,
-                        'amount': str(payment.amount),
-                        'currency': payment.currency
-                    }
-                }, status=status.HTTP_200_OK)
-            else:
-                payment.status = 'failed'
-                payment.save()
-                return Response(
-                    {'error': data.get('message', 'Failed to initialize payment')},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        except requests.exceptions.RequestException as e:
-            payment.status = 'failed'
-            payment.save()
-            return Response(
-                {'error': f'Payment initialization failed: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        # Update payment with Paystack details
+        payment.paystack_reference = payment_data.get('reference')
+        payment.paystack_access_code = payment_data.get('access_code')
+        payment.paystack_authorization_url = payment_data.get('authorization_url')
+        payment.transaction_id = payment_data.get('reference')
+        payment.save()
+    
+    def _checkout_response(self, payment):
+        return {
+            'status': 'success',
+            'message': 'Payment initialized successfully',
+            'data': {
+                'payment_id': payment.id,
+                'authorization_url': payment.paystack_authorization_url,
+                'access_code': payment.paystack_access_code,
+                'reference': payment.paystack_reference,
+                'amount': str(payment.amount),
+                'currency': payment.currency
+            }
+        }
     
     @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
     def verify(self, request):
@@ -212,100 +256,116 @@ class PaymentViewSet(viewsets.ModelViewSet):
             )
         
         # Verify with Paystack
-        verify_url = f"https://api.paystack.co/transaction/verify/{reference}"
-        headers = {
-            "Authorization": f"Bearer {paystack_secret_key}",
-            "Content-Type": "application/json"
-        }
+        try:
+            payment_data = get_client().verify_transaction(reference)
+        except PaystackUnavailable as e:
+            return Response(
+                {'error': f'Payment verification failed: {e.message}'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except PaystackError:
+            payment_data = {}
+        
+        if payment_data.get('status') == 'success':
+            apply_successful_charge(payment, payment_data)
+        if payment.status != 'success':
+            # A webhook may have applied the charge meanwhile; that wins
+            payment = mark_payment_failed(payment)
+        
+        if payment.status == 'success':
+            return Response({
+                'status': 'success',
+                'message': 'Payment verified successfully',
+                'data': {
+                    'payment_id': payment.id,
+                    'subscription_id': payment.subscription.id if payment.subscription else None,
+                    'amount': str(payment.amount),
+                    'currency': payment.currency
+                }
+            }, status=status.HTTP_200_OK)
         
+        return Response(
+            {'error': 'Payment verification failed'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def gateway(self, request):
+        """
+        Paystack client health: circuit state and latency metrics for this process
+        GET /api/payments/gateway/
+        """
+        return Response(get_client().status())
+    
+    max_report_range_days = 366
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def reports(self, request):
+        """
+        Daily revenue by plan, currency and status, read from the rollup table
+        GET /api/payments/reports/?from=YYYY-MM-DD&to=YYYY-MM-DD&status=success
+        """
         try:
-            response = requests.get(verify_url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get('status') and data.get('data', {}).get('status') == 'success':
-                payment_data = data.get('data', {})
-                
-                # Update payment status
-                payment.status = 'success'
-                payment.paid_at = timezone.now()
-                payment.metadata = payment_data.get('metadata', {})
-                payment.save()
-                
-                # Create or update subscription
-                plan = payment.plan
-                user = payment.user
-                
-                # Check if user has an active subscription
-                active_subscription = Subscription.objects.filter(
-                    user=user,
-                    status='active'
-                ).first()
-                
-                if active_subscription:
-                    # Update existing subscription
-                    active_subscription.plan = plan
-                    active_subscription.next_billing_date = timezone.now().date() + timedelta(days=30)
-                    active_subscription.save()
-                    payment.subscription = active_subscription
-                else:
-                    # Create new subscription
-                    subscription = Subscription.objects.create(
-                        user=user,
-                        plan=plan,
-                        status='active',
-                        start_date=timezone.now().date(),
-                        next_billing_date=timezone.now().date() + timedelta(days=30),
-                        is_recurring=True,
-                        auto_renew=True
-                    )
-                    payment.subscription = subscription
-                
-                payment.save()
-                
-                return Response({
-                    'status': 'success',
-                    'message': 'Payment verified successfully',
-                    'data': {
-                        'payment_id': payment.id,
-                        'subscription_id': payment.subscription.id if payment.subscription else None,
-                        'amount': str(payment.amount),
-                        'currency': payment.currency
-                    }
-                }, status=status.HTTP_200_OK)
-            else:
-                payment.status = 'failed'
-                payment.save()
-                return Response(
-                    {'error': 'Payment verification failed'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        except requests.exceptions.RequestException as e:
+            date_to = date_param(request, 'to') or timezone.localdate()
+            date_from = date_param(request, 'from') or date_to - timedelta(days=29)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if date_to < date_from:
             return Response(
-                {'error': f'Payment verification failed: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': '"to" must be on or after "from"'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        if (date_to - date_from).days >= self.max_report_range_days:
+            return Response(
+                {'error': f'Date range cannot exceed {self.max_report_range_days} days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        rollups = DailyRevenue.objects.filter(date__gte=date_from, date__lte=date_to)
+        statuses = [s for s in request.query_params.get('status', '').split(',') if s]
+        if statuses:
+            rollups = rollups.filter(status__in=statuses)
+        
+        rows = [
+            {
+                'date': row['date'],
+                'plan_id': row['plan_id'],
+                'plan_name': row['plan__name'],
+                'currency': row['currency'],
+                'status': row['status'],
+                'count': row['count'],
+                'amount': f"{row['amount']:.2f}",
+            }
+            for row in rollups.order_by('date', 'plan_id', 'currency', 'status').values(
+                'date', 'plan_id', 'plan__name', 'currency', 'status', 'count', 'amount'
+            )
+        ]
+        totals = [
+            {
+                'currency': total['currency'],
+                'status': total['status'],
+                'count': total['total_count'],
+                'amount': f"{total['total_amount']:.2f}",
+            }
+            for total in rollups.values('currency', 'status').annotate(
+                total_count=Sum('count'), total_amount=Sum('amount')
+            ).order_by('currency', 'status')
+        ]
+        return Response({'from': date_from, 'to': date_to, 'rows': rows, 'totals': totals})
     
-    @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
+    @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny], authentication_classes=[])
     def webhook(self, request):
         """
         Paystack webhook endpoint
         POST /api/payments/webhook/
+        Verifies the X-Paystack-Signature HMAC and stores the event in the inbox;
+        process_webhook_events applies it in the background.
         """
-        # Verify webhook signature (recommended for production)
-        # For now, we'll process the webhook directly
-        
-        event = request.data.get('event')
-        data = request.data.get('data', {})
+        body = request.body
+        if not verify_signature(body, request.META.get('HTTP_X_PAYSTACK_SIGNATURE', '')):
+            return Response({'error': 'Invalid signature'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if event == 'charge.success':
-            reference = data.get('reference')
-            if reference:
-                # Use the verify logic
-                verify_serializer = PaymentVerifySerializer(data={'reference': reference})
-                if verify_serializer.is_valid():
-                    # Call verify method logic here
-                    # For simplicity, we'll just return success
-                    return Response({'status': 'success'}, status=status.HTTP_200_OK)
+        if not record_event(body):
+            return Response({'error': 'Invalid payload'}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({'status': 'received'}, status=status.HTTP_200_OK)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import AgentStats, User
 
 
 @admin.register(User)
@@ -29,3 +29,12 @@ class UserAdmin(BaseUserAdmin):
             'fields': ('role', 'phone', 'email', 'first_name', 'last_name')
         }),
     )
+
+
+@admin.register(AgentStats)
+class AgentStatsAdmin(admin.ModelAdmin):
+    """Read-only view of the maintained agent discovery stats"""
+
+    list_display = ['agent', 'active_listing_count', 'response_rate', 'updated_at']
+    search_fields = ['agent__username', 'agent__email']
+    readonly_fields = ['agent', 'active_listing_count', 'cities', 'property_types', 'response_rate', 'updated_at']
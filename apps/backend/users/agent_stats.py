@@ -0,0 +1,168 @@
+"""
+Maintained stats for agent discovery.
+
+AgentStats holds one row per agent (active listing count, cities, property
+types, response rate) and AgentCoverage one row per (agent, city, property
+type) with active listings, so `GET /api/auth/agents/` filters and orders on
+small indexed tables instead of aggregating the listings table.
+
+`users.signals` (and the listing admin's bulk actions) refresh an agent's
+counts and coverage after their listings change; response rates scan 90 days
+of messages, so only `refresh_all_agent_stats` (run by run_scheduler, or
+`python manage.py refresh_agent_stats`) recomputes them.
+
+List pages (keyed by page number and normalised filters) and public profiles
+(keyed by agent id) are cached in the core.cache 'agents' namespace, so
+unrelated query parameters cannot create new entries. Every refresh invalidates the 'list' group, and
+`invalidate_agent_profile` the agent's profile group whenever their stats are
+refreshed or their profile or listing images change.
+"""
+import hashlib
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from core.cache import namespace
+from .models import AgentCoverage, AgentStats, User
+
+agent_cache = namespace('agents')
+
+
+def _coverage(agent_ids):
+    from listings.models import Listing
+
+    rows = (
+        Listing.objects.filter(agent_id__in=agent_ids, status='active', is_deleted=False)
+        .values('agent_id', 'city', 'property_type')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    coverage = defaultdict(lambda: defaultdict(int))
+    display_cities = defaultdict(dict)
+    for row in rows:
+        city = row['city'].strip()
+        coverage[row['agent_id']][(city.lower(), row['property_type'])] += row['count']
+        display_cities[row['agent_id']].setdefault(city.lower(), city)
+    return coverage, display_cities
+
+
+def _response_rates(agent_ids):
+    """{agent_id: percent of people who messaged the agent recently that got a reply}."""
+    from messaging.models import Message
+
+    since = timezone.now() - timedelta(days=getattr(settings, 'AGENT_RESPONSE_WINDOW_DAYS', 90))
+    enquirers = defaultdict(set)
+    for agent_id, sender_id in (
+        Message.objects.filter(recipient_id__in=agent_ids, created_at__gte=since)
+        .values_list('recipient_id', 'sender_id').distinct()
+    ):
+        enquirers[agent_id].add(sender_id)
+    replied = defaultdict(set)
+    for agent_id, recipient_id in (
+        Message.objects.filter(sender_id__in=agent_ids, created_at__gte=since)
+        .values_list('sender_id', 'recipient_id').distinct()
+    ):
+        replied[agent_id].add(recipient_id)
+    return {
+        agent_id: (Decimal(100 * len(people & replied[agent_id])) / len(people)).quantize(Decimal('0.01'))
+        for agent_id, people in enquirers.items()
+    }
+
+
+def refresh_agent_stats(agent_ids, response_rates=True):
+    """
+    Recompute AgentStats and AgentCoverage for `agent_ids`. Non-agents lose their rows.
+    With response_rates=False existing response rates are kept (new rows get none).
+    """
+    agent_ids = set(agent_ids)
+    if not agent_ids:
+        return 0
+    agents = set(User.objects.filter(pk__in=agent_ids, role='agent').values_list('pk', flat=True))
+    coverage, display_cities = _coverage(agents)
+    rates = _response_rates(agents) if response_rates else {}
+
+    stats = []
+    coverage_rows = []
+    for agent_id in agents:
+        counts = coverage.get(agent_id, {})
+        stats.append(AgentStats(
+            agent_id=agent_id,
+            active_listing_count=sum(counts.values()),
+            cities=sorted(display_cities[agent_id].values()),
+            property_types=sorted({property_type for _, property_type in counts}),
+            response_rate=rates.get(agent_id),
+            updated_at=timezone.now(),
+        ))
+        coverage_rows += [
+            AgentCoverage(agent_id=agent_id, city=city, property_type=property_type, listing_count=count)
+            for (city, property_type), count in counts.items()
+        ]
+
+    with transaction.atomic():
+        AgentStats.objects.filter(agent_id__in=agent_ids - agents).delete()
+        AgentCoverage.objects.filter(agent_id__in=agent_ids).delete()
+        update_fields = ['active_listing_count', 'cities', 'property_types', 'updated_at']
+        AgentStats.objects.bulk_create(
+            stats,
+            update_conflicts=True,
+            unique_fields=['agent'],
+            update_fields=update_fields + ['response_rate'] if response_rates else update_fields,
+        )
+        AgentCoverage.objects.bulk_create(coverage_rows, batch_size=1000)
+        transaction.on_commit(bump_list_version)
+        transaction.on_commit(lambda: invalidate_agent_profile(*agent_ids))
+    return len(stats)
+
+
+def refresh_all_agent_stats(batch_size=500):
+    """Recompute stats for every agent in id order. Returns the number of agents refreshed."""
+    refreshed = 0
+    last_id = 0
+    while True:
+        ids = list(
+            User.objects.filter(role='agent', pk__gt=last_id)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        refreshed += refresh_agent_stats(ids)
+        last_id = ids[-1]
+    # Former agents keep no stats
+    stale = AgentStats.objects.exclude(agent__role='agent').values_list('agent_id', flat=True)
+    refresh_agent_stats(list(stale))
+    return refreshed
+
+
+def schedule_refresh(*agent_ids):
+    """Refresh the agents' counts and coverage once the current transaction commits."""
+    transaction.on_commit(lambda: refresh_agent_stats(agent_ids, response_rates=False))
+
+
+def bump_list_version():
+    agent_cache.invalidate('list')
+
+
+def cached_agent_list(page, city, property_type, loader):
+    """Agent list page for the normalised filters, loaded once per stats version."""
+    key = hashlib.md5(repr((page, city, property_type)).encode()).hexdigest()
+    return agent_cache.get_or_set(
+        key, loader, ttl=getattr(settings, 'AGENT_LIST_CACHE_SECONDS', 300), group='list',
+    )
+
+
+def invalidate_agent_profile(*agent_ids):
+    for agent_id in agent_ids:
+        agent_cache.invalidate(f'profile:{agent_id}')
+
+
+def cached_agent_profile(agent_id, loader):
+    """Profile document for `agent_id`, loaded once per profile version."""
+    return agent_cache.get_or_set(
+        'profile', loader,
+        ttl=getattr(settings, 'AGENT_PROFILE_CACHE_SECONDS', 600), group=f'profile:{agent_id}',
+    )
@@ -0,0 +1,164 @@
+"""
+JWT authentication that skips the User lookup on read-only requests.
+
+Access tokens carry the claims a read needs (user id, username, role, staff
+flags and `ver`, the user's token_version). For GET/HEAD/OPTIONS the user is
+built from those claims without touching the database; other fields stay
+deferred and load on first access. Writes, and tokens issued before these
+claims existed, load the user from the database, memoised per process for
+AUTH_USER_CACHE_SECONDS.
+
+Deactivating a user or changing their role/staff flags bumps token_version
+and publishes it to the shared cache (see users.signals), so older tokens are
+rejected on the next request in every process. When the cache has no version
+for a user (never published, expired or evicted) it is read from the database
+and published again; claims are never trusted without it.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .blacklist import BloomRefreshToken
+from .models import User
+
+# Claims copied into every token; `ver` must match the user's current token_version
+CLAIM_FIELDS = {
+    'username': 'username',
+    'role': 'role',
+    'is_staff': 'is_staff',
+    'is_superuser': 'is_superuser',
+    'ver': 'token_version',
+}
+
+
+def token_version_key(user_id):
+    return f'auth:token_version:{user_id}'
+
+
+def _version_timeout():
+    return int(settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds())
+
+
+def publish_token_version(user):
+    """Tell every process that tokens older than user.token_version are revoked."""
+    cache.set(token_version_key(user.pk), user.token_version, _version_timeout())
+    _user_cache.discard(user.pk)
+
+
+def load_token_version(user_id):
+    """Current token_version of an active user from the database, re-published; None if inactive or gone."""
+    version = User.objects.filter(pk=user_id, is_active=True).values_list('token_version', flat=True).first()
+    if version is not None:
+        # add, not set: a revocation published meanwhile must win over this read
+        cache.add(token_version_key(user_id), version, _version_timeout())
+    return version
+
+
+def add_claims(token, user):
+    for claim, field in CLAIM_FIELDS.items():
+        token[claim] = getattr(user, field)
+    return token
+
+
+def refresh_token_for_user(user):
+    """RefreshToken (and, via .access_token, an access token) carrying the user claims."""
+    cache.add(token_version_key(user.pk), user.token_version, _version_timeout())
+    return add_claims(BloomRefreshToken.for_user(user), user)
+
+
+class _TTLCache:
+    """Small thread-safe per-process cache of users loaded from the database."""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if len(self._items) >= self.max_size:
+                self._items.clear()
+            self._items[key] = (value, time.monotonic() + ttl)
+
+    def discard(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_user_cache = _TTLCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that trusts signed claims for safe methods."""
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        if request.method not in SAFE_METHODS:
+            return self.get_user(validated_token), validated_token
+        if 'ver' in validated_token:
+            return self.get_claims_user(validated_token), validated_token
+        return self.get_cached_user(validated_token), validated_token
+
+    def check_version(self, user_id, version):
+        current = cache.get(token_version_key(user_id))
+        if current is None:
+            current = load_token_version(user_id)
+        if current is None or current != version:
+            raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+
+    def get_claims_user(self, validated_token):
+        """User built from the token's claims; no query unless a deferred field is read."""
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return self.get_user(validated_token)
+        self.check_version(user_id, validated_token['ver'])
+        values = {field: validated_token.get(claim) for claim, field in CLAIM_FIELDS.items()}
+        values.update({'id': user_id, 'is_active': True})
+        # from_db expects values in model field order
+        names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+        return User.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+    def get_cached_user(self, validated_token):
+        """Database user memoised per process, for tokens issued without claims."""
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = _user_cache.get(user_id)
+        if user is None:
+            user = self.get_user(validated_token)
+            _user_cache.set(user_id, user, getattr(settings, 'AUTH_USER_CACHE_SECONDS', 30))
+        return copy.copy(user)
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if 'ver' in validated_token and validated_token['ver'] != user.token_version:
+            raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+        return user
@@ -0,0 +1,106 @@
+"""
+Avatar normalisation and size variants.
+
+Uploads are stored as-is and flagged `avatar_pending`. `process_pending_avatars`
+(run by run_scheduler) applies the EXIF orientation, centre-crops to a square,
+re-encodes without metadata to WebP, replaces the original with an
+AVATAR_MAX_SIZE version and writes one variant per AVATAR_SIZES entry.
+Serializers pick the smallest variant that fits via `avatar_url`.
+"""
+import io
+import logging
+import secrets
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .agent_stats import bump_list_version, invalidate_agent_profile
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+
+def _sizes():
+    return sorted(getattr(settings, 'AVATAR_SIZES', [64, 128, 256]))
+
+
+def _encode(image, size):
+    resized = ImageOps.fit(image, (size, size), method=Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(buffer, format='WEBP', quality=getattr(settings, 'AVATAR_QUALITY', 85), method=4)
+    return buffer.getvalue()
+
+
+def render_variants(source):
+    """{size: webp bytes} for every configured size plus AVATAR_MAX_SIZE, from a file object."""
+    with Image.open(source) as image:
+        image.seek(0)  # first frame of animated GIF/WebP
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        largest = min(getattr(settings, 'AVATAR_MAX_SIZE', 512), min(image.size))
+        sizes = sorted({size for size in _sizes() if size <= largest} | {largest})
+        return {size: _encode(image, size) for size in sizes}
+
+
+def process_avatar(user):
+    """Normalise `user`'s pending avatar. Returns True if variants were written."""
+    source_name = user.avatar.name
+    try:
+        with default_storage.open(source_name) as source:
+            rendered = render_variants(source)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.warning('Could not process avatar %s for user %s: %r', source_name, user.pk, exc)
+        User.objects.filter(pk=user.pk, avatar=source_name).update(avatar_pending=False)
+        return False
+
+    token = secrets.token_hex(4)
+    largest = max(rendered)
+    saved = {
+        size: default_storage.save(f'avatars/{user.pk}/{size}_{token}.webp', ContentFile(data))
+        for size, data in rendered.items()
+    }
+    updated = User.objects.filter(pk=user.pk, avatar=source_name).update(
+        avatar=saved[largest],
+        avatar_variants={str(size): name for size, name in saved.items() if size != largest},
+        avatar_pending=False,
+    )
+    if not updated:
+        # Replaced by a newer upload meanwhile; that one is processed next
+        for name in saved.values():
+            default_storage.delete(name)
+        return False
+
+    for name in [source_name, *(user.avatar_variants or {}).values()]:
+        if name:
+            default_storage.delete(name)
+    invalidate_agent_profile(user.pk)
+    bump_list_version()
+    return True
+
+
+def process_pending_avatars(batch_size=50):
+    """Process flagged avatars in batches. Returns the number processed."""
+    processed = 0
+    while True:
+        users = list(
+            User.objects.filter(avatar_pending=True)
+            .only('id', 'avatar', 'avatar_variants', 'avatar_pending').order_by('id')[:batch_size]
+        )
+        if not users:
+            return processed
+        for user in users:
+            processed += process_avatar(user)
+        if len(users) < batch_size:
+            return processed
+
+
+def avatar_url(user, size, request=None):
+    """URL of the smallest avatar variant at least `size` px, or the full avatar; None without one."""
+    if not user.avatar:
+        return None
+    variants = {} if user.avatar_pending else user.avatar_variants or {}
+    fitting = sorted(int(key) for key in variants if int(key) >= size)
+    url = default_storage.url(variants[str(fitting[0])]) if fitting else user.avatar.url
+    return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,137 @@
+"""
+Refresh-token blacklist with a membership check that normally costs no query.
+
+Rotated and logged-out refresh tokens are stored by simplejwt's token_blacklist
+app. Instead of its per-refresh `BlacklistedToken ... exists()` query,
+`is_blacklisted` consults:
+
+* the shared cache, where `mark_blacklisted` drops a marker for the rest of
+  the token's lifetime (so other processes see a revocation immediately);
+* a per-process Bloom filter of blacklisted JTIs, topped up from the table at
+  most every BLACKLIST_SYNC_SECONDS; only a positive hit is confirmed with a
+  database query, so false positives never reject a valid token.
+
+`purge_expired_tokens` (run by run_scheduler) deletes expired outstanding
+tokens and their blacklist rows.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing of one blake2b digest)."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class BlacklistIndex:
+    """Process-wide Bloom filter of blacklisted JTIs, synced incrementally from the table."""
+
+    def __init__(self, initial_capacity=10000):
+        self.initial_capacity = initial_capacity
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.bloom = BloomFilter(self.initial_capacity)
+        self.last_id = 0
+        self.synced_at = None
+
+    def _load(self, since_id):
+        return list(
+            BlacklistedToken.objects.filter(id__gt=since_id, token__expires_at__gt=timezone.now())
+            .order_by('id').values_list('id', 'token__jti')
+        )
+
+    def sync(self):
+        interval = getattr(settings, 'BLACKLIST_SYNC_SECONDS', 30)
+        if self.synced_at is not None and time.monotonic() - self.synced_at < interval:
+            return
+        with self._lock:
+            if self.synced_at is not None and time.monotonic() - self.synced_at < interval:
+                return
+            rows = self._load(self.last_id)
+            if self.bloom.count + len(rows) > self.bloom.capacity:
+                # Rebuild bigger (and without expired tokens) instead of degrading
+                rows = self._load(0)
+                self.bloom = BloomFilter(max(self.initial_capacity, len(rows) * 2))
+            for row_id, jti in rows:
+                self.bloom.add(jti)
+                self.last_id = max(self.last_id, row_id)
+            self.synced_at = time.monotonic()
+
+    def add(self, jti):
+        with self._lock:
+            self.bloom.add(jti)
+
+    def might_contain(self, jti):
+        self.sync()
+        return jti in self.bloom
+
+
+index = BlacklistIndex()
+
+
+def _marker_key(jti):
+    return f'auth:blacklisted:{jti}'
+
+
+def mark_blacklisted(jti, exp):
+    """Record a fresh revocation in the shared cache and this process's filter."""
+    cache.set(_marker_key(jti), True, max(int(exp - time.time()), 1))
+    index.add(jti)
+
+
+def is_blacklisted(jti):
+    if cache.get(_marker_key(jti)):
+        return True
+    if not index.might_contain(jti):
+        return False
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+class BloomRefreshToken(RefreshToken):
+    """RefreshToken whose blacklist check goes through `is_blacklisted`."""
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError('Token is blacklisted')
+
+    def blacklist(self):
+        result = super().blacklist()
+        mark_blacklisted(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+        return result
+
+
+def purge_expired_tokens():
+    """Delete expired outstanding tokens (their blacklist rows cascade). Returns the number removed."""
+    deleted, _ = OutstandingToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,142 @@
+"""
+Password hashers with tunable cost and optional process-pool offload.
+
+`TunedPBKDF2PasswordHasher` and `TunedArgon2PasswordHasher` take their cost
+from settings (PASSWORD_PBKDF2_ITERATIONS, ARGON2_TIME_COST/MEMORY_COST/
+PARALLELISM); PASSWORD_HASHER_PROFILE picks which one new hashes use. Django
+re-hashes a password on the next successful login whenever it was stored with
+another hasher or other parameters.
+
+With PASSWORD_HASH_WORKERS > 0 the hashing itself (login, registration,
+password changes) runs in a process pool of that size, off the web process's
+CPU. The request thread still waits for its hash, so at most
+PASSWORD_HASH_MAX_IN_FLIGHT requests per process may be hashing at once; keep
+it below the web server's threads per process. A request that finds every
+slot taken (waiting at most PASSWORD_HASH_QUEUE_TIMEOUT seconds, 0 by default)
+fails with 503, so a burst of logins leaves the remaining threads free for
+other traffic.
+"""
+import base64
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-in attempts are being processed. Please retry shortly.'
+    default_code = 'hashing_busy'
+
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            # spawn: never fork a multi-threaded web worker
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _slots = threading.BoundedSemaphore(max(1, getattr(settings, 'PASSWORD_HASH_MAX_IN_FLIGHT', 2)))
+        return _pool, _slots
+
+
+def shutdown_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = _slots = None
+
+
+def run_hash(func, *args):
+    """Run `func(*args)` in the hashing pool when enabled, otherwise inline."""
+    workers = getattr(settings, 'PASSWORD_HASH_WORKERS', 0)
+    if not workers:
+        return func(*args)
+    pool, slots = _get_pool(workers)
+    if not slots.acquire(timeout=getattr(settings, 'PASSWORD_HASH_QUEUE_TIMEOUT', 0)):
+        raise HashingBusy()
+    try:
+        return pool.submit(func, *args).result()
+    except BrokenProcessPool:
+        shutdown_pool()
+        return func(*args)
+    finally:
+        slots.release()
+
+
+def _pbkdf2(digest_name, password, salt, iterations):
+    derived = hashlib.pbkdf2_hmac(digest_name, password.encode(), salt.encode(), iterations)
+    return base64.b64encode(derived).decode('ascii').strip()
+
+
+def _argon2_hash(password, salt, time_cost, memory_cost, parallelism, hash_len, variety):
+    import argon2
+
+    return argon2.low_level.hash_secret(
+        password.encode(), salt.encode(), time_cost=time_cost, memory_cost=memory_cost,
+        parallelism=parallelism, hash_len=hash_len, type=argon2.low_level.Type(variety),
+    ).decode('ascii')
+
+
+def _argon2_verify(hashed, password):
+    import argon2
+
+    try:
+        return argon2.PasswordHasher().verify(hashed, password)
+    except argon2.exceptions.VerificationError:
+        return False
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with PASSWORD_PBKDF2_ITERATIONS (Django's default when unset)."""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
+
+    def encode(self, password, salt, iterations=None):
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        hash = run_hash(_pbkdf2, self.digest().name, password, salt, iterations)
+        return '%s$%d$%s$%s' % (self.algorithm, iterations, salt, hash)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with ARGON2_* costs (Django's defaults when unset); needs argon2-cffi."""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'ARGON2_TIME_COST', None) or Argon2PasswordHasher.time_cost
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'ARGON2_MEMORY_COST', None) or Argon2PasswordHasher.memory_cost
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'ARGON2_PARALLELISM', None) or Argon2PasswordHasher.parallelism
+
+    def encode(self, password, salt):
+        params = self.params()
+        data = run_hash(
+            _argon2_hash, password, salt, params.time_cost, params.memory_cost,
+            params.parallelism, params.hash_len, params.type.value,
+        )
+        return self.algorithm + data
+
+    def verify(self, password, encoded):
+        self._load_library()
+        algorithm, rest = encoded.split('$', 1)
+        assert algorithm == self.algorithm
+        return run_hash(_argon2_verify, '$' + rest, password)
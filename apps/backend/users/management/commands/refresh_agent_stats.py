@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from users.agent_stats import refresh_agent_stats, refresh_all_agent_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute AgentStats and AgentCoverage from listings and messages (all agents by default).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('agent_ids', nargs='*', type=int, help='Only refresh these agents')
+
+    def handle(self, *args, **options):
+        if options['agent_ids']:
+            refreshed = refresh_agent_stats(options['agent_ids'])
+        else:
+            refreshed = refresh_all_agent_stats()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed stats for {refreshed} agent(s).'))
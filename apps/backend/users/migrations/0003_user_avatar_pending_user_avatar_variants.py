@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_pending',
+            field=models.BooleanField(db_index=True, default=False, help_text='Uploaded avatar not yet normalised by users.avatars.process_pending_avatars'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Square WebP renditions of the avatar by pixel size, e.g. {"64": "avatars/1/64_ab12.webp"}'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_avatar_pending_user_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentStats',
+            fields=[
+                ('agent', models.OneToOneField(help_text='Agent these stats describe', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='agent_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active_listing_count', models.PositiveIntegerField(default=0, help_text='Listings that are active and not deleted')),
+                ('cities', models.JSONField(blank=True, default=list, help_text='Cities with active listings, for display')),
+                ('property_types', models.JSONField(blank=True, default=list, help_text='Property types with active listings, for display')),
+                ('response_rate', models.DecimalField(blank=True, decimal_places=2, help_text='Percent of recent enquirers the agent replied to; null without enquiries', max_digits=5, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Agent Stats',
+                'verbose_name_plural': 'Agent Stats',
+                'indexes': [models.Index(fields=['-active_listing_count', 'agent'], name='users_agent_active__7afd0c_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AgentCoverage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(help_text='City, lower-cased for matching', max_length=100)),
+                ('property_type', models.CharField(help_text='Listing property type', max_length=20)),
+                ('listing_count', models.PositiveIntegerField(default=0)),
+                ('agent', models.ForeignKey(help_text='Agent', on_delete=django.db.models.deletion.CASCADE, related_name='coverage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Agent Coverage',
+                'verbose_name_plural': 'Agent Coverage',
+                'indexes': [models.Index(fields=['city', 'property_type'], name='users_agent_city_57c193_idx'), models.Index(fields=['property_type'], name='users_agent_propert_07899a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('agent', 'city', 'property_type'), name='unique_agent_coverage')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_agentstats_agentcoverage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='calendar_feed_version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped when the agent rotates their calendar feed URL; older feed tokens are rejected'),
+        ),
+    ]
@@ -27,6 +27,24 @@ class User(AbstractUser):
         blank=True,
         help_text='User profile picture'
     )
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Square WebP renditions of the avatar by pixel size, e.g. {"64": "avatars/1/64_ab12.webp"}'
+    )
+    avatar_pending = models.BooleanField(
+        default=False,
+        db_index=True,
+        help_text='Uploaded avatar not yet normalised by users.avatars.process_pending_avatars'
+    )
+    token_version = models.PositiveIntegerField(
+        default=0,
+        help_text='Bumped on deactivation or role change; tokens carrying an older version are rejected'
+    )
+    calendar_feed_version = models.PositiveIntegerField(
+        default=0,
+        help_text='Bumped when the agent rotates their calendar feed URL; older feed tokens are rejected'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -47,3 +65,79 @@ class User(AbstractUser):
     def is_client(self):
         """Check if user is a client"""
         return self.role == 'client'
+
+
+class AgentStats(models.Model):
+    """Per-agent discovery counters, maintained by users.agent_stats"""
+    agent = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='agent_stats',
+        help_text='Agent these stats describe'
+    )
+    active_listing_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Listings that are active and not deleted'
+    )
+    cities = models.JSONField(
+        default=list,
+        blank=True,
+        help_text='Cities with active listings, for display'
+    )
+    property_types = models.JSONField(
+        default=list,
+        blank=True,
+        help_text='Property types with active listings, for display'
+    )
+    response_rate = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text='Percent of recent enquirers the agent replied to; null without enquiries'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Agent Stats'
+        verbose_name_plural = 'Agent Stats'
+        indexes = [
+            models.Index(fields=['-active_listing_count', 'agent']),
+        ]
+
+    def __str__(self):
+        return f"Stats for agent {self.agent_id}"
+
+
+class AgentCoverage(models.Model):
+    """One row per (agent, city, property type) the agent has active listings in"""
+    agent = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='coverage',
+        help_text='Agent'
+    )
+    city = models.CharField(
+        max_length=100,
+        help_text='City, lower-cased for matching'
+    )
+    property_type = models.CharField(
+        max_length=20,
+        help_text='Listing property type'
+    )
+    listing_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Agent Coverage'
+        verbose_name_plural = 'Agent Coverage'
+        constraints = [
+            models.UniqueConstraint(fields=['agent', 'city', 'property_type'], name='unique_agent_coverage'),
+        ]
+        indexes = [
+            models.Index(fields=['city', 'property_type']),
+            models.Index(fields=['property_type']),
+        ]
+
+    def __str__(self):
+        return f"{self.agent_id}: {self.property_type} in {self.city}"
@@ -1,8 +1,38 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
+from rest_framework_simplejwt.serializers import (
+    TokenBlacklistSerializer,
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from listings.serializers import AgentListingCardSerializer
+from .authentication import add_claims
+from .avatars import avatar_url
+from .blacklist import BloomRefreshToken
 from .models import User
 
 
+class KejaTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Login serializer whose tokens carry the claims CachedJWTAuthentication trusts"""
+    token_class = BloomRefreshToken
+    
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+
+class KejaTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh with rotation; the blacklist check normally costs no query (users.blacklist)"""
+    token_class = BloomRefreshToken
+
+
+class KejaTokenBlacklistSerializer(TokenBlacklistSerializer):
+    """Logout: blacklist the refresh token everywhere"""
+    token_class = BloomRefreshToken
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for user profile data"""
     
@@ -59,12 +89,13 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 class UserProfileSerializer(serializers.ModelSerializer):
     """Serializer for detailed user profile; avatar supports file upload and returns absolute URL."""
+    avatar_urls = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name',
-            'role', 'phone', 'avatar', 'is_active', 'created_at', 'updated_at'
+            'role', 'phone', 'avatar', 'avatar_urls', 'is_active', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'username', 'created_at', 'updated_at']
         extra_kwargs = {'avatar': {'required': False}}
@@ -79,6 +110,26 @@ class UserProfileSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Allowed formats: JPEG, PNG, WebP, GIF.')
         return value
     
+    def get_avatar_urls(self, obj):
+        """Square renditions by pixel size (the original until processing finishes)"""
+        request = self.context.get('request')
+        return {str(size): avatar_url(obj, size, request) for size in settings.AVATAR_SIZES} if obj.avatar else {}
+    
+    def update(self, instance, validated_data):
+        """New avatars are normalised in the background by users.avatars.process_pending_avatars"""
+        if 'avatar' not in validated_data:
+            return super().update(instance, validated_data)
+        # The replaced file goes now; old variants stay until the new ones exist
+        stale = [instance.avatar.name]
+        validated_data['avatar_pending'] = bool(validated_data['avatar'])
+        if not validated_data['avatar']:
+            stale += instance.avatar_variants.values()
+            validated_data['avatar_variants'] = {}
+        instance = super().update(instance, validated_data)
+        for name in filter(None, stale):
+            default_storage.delete(name)
+        return instance
+    
     def to_representation(self, instance):
         data = super().to_representation(instance)
         if instance.avatar:
@@ -91,14 +142,36 @@ class UserProfileSerializer(serializers.ModelSerializer):
 class AgentListSerializer(serializers.ModelSerializer):
     """Public serializer for listing agents (discover agents)."""
     name = serializers.SerializerMethodField()
-    listing_count = serializers.IntegerField(read_only=True)
+    avatar = serializers.SerializerMethodField()
+    listing_count = serializers.IntegerField(source='agent_stats.active_listing_count', read_only=True)
+    cities = serializers.ListField(source='agent_stats.cities', read_only=True)
+    property_types = serializers.ListField(source='agent_stats.property_types', read_only=True)
+    response_rate = serializers.DecimalField(
+        source='agent_stats.response_rate', max_digits=5, decimal_places=2, read_only=True
+    )
     
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'name', 'phone', 'listing_count']
-        read_only_fields = ['id', 'username', 'email', 'first_name', 'last_name', 'name', 'phone', 'listing_count']
+        fields = [
+            'id', 'username', 'email', 'first_name', 'last_name', 'name', 'phone', 'avatar',
+            'listing_count', 'cities', 'property_types', 'response_rate',
+        ]
+        read_only_fields = fields
+    
+    def get_avatar(self, obj):
+        return avatar_url(obj, 128, self.context.get('request'))
     
     def get_name(self, obj):
         if obj.first_name or obj.last_name:
             return f"{obj.first_name or ''} {obj.last_name or ''}".strip()
         return obj.username
+
+
+class AgentProfileSerializer(AgentListSerializer):
+    """Public agent profile with stats and active listing cards (see AgentProfileView)."""
+    member_since = serializers.DateTimeField(source='date_joined', read_only=True)
+    listings = AgentListingCardSerializer(source='profile_listings', many=True, read_only=True)
+
+    class Meta(AgentListSerializer.Meta):
+        fields = AgentListSerializer.Meta.fields + ['member_since', 'listings']
+        read_only_fields = fields
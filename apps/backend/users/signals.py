@@ -0,0 +1,67 @@
+"""
+Token revocation: bump User.token_version when a user is deactivated or their
+role or staff flags change, and publish it for users.authentication.
+
+Agent discovery stats: refresh an agent's AgentStats/AgentCoverage when their
+listings change or a user becomes (or stops being) an agent, and drop the
+cached agent profile when the agent or their listing images change.
+"""
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from listings.models import Listing, ListingImage
+from .agent_stats import bump_list_version, invalidate_agent_profile, schedule_refresh
+from .authentication import publish_token_version
+from .models import User
+
+AUTH_FIELDS = ('is_active', 'role', 'is_staff', 'is_superuser')
+
+
+def _auth_state(user):
+    return tuple(user.__dict__.get(field) for field in AUTH_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_auth_state(sender, instance, **kwargs):
+    instance._auth_state = _auth_state(instance)
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_auth_change(sender, instance, created, **kwargs):
+    before, after = instance._auth_state, _auth_state(instance)
+    instance._auth_state = after
+    if created or None in before or before == after:
+        return
+    instance.token_version += 1
+    User.objects.filter(pk=instance.pk).update(token_version=instance.token_version)
+    publish_token_version(instance)
+
+
+@receiver(post_init, sender=User)
+def remember_role(sender, instance, **kwargs):
+    instance._loaded_role = instance.__dict__.get('role')
+
+
+@receiver(post_save, sender=User)
+def agent_changed(sender, instance, created, update_fields=None, **kwargs):
+    role, instance._loaded_role = instance._loaded_role, instance.role
+    if (created and instance.role == 'agent') or (role is not None and role != instance.role):
+        schedule_refresh(instance.pk)
+    elif instance.role == 'agent' and set(update_fields or ()) != {'last_login'}:
+        # Name, phone or avatar may have changed; both documents show them
+        invalidate_agent_profile(instance.pk)
+        bump_list_version()
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def listing_changed(sender, instance, **kwargs):
+    schedule_refresh(instance.agent_id)
+
+
+@receiver(post_save, sender=ListingImage)
+@receiver(post_delete, sender=ListingImage)
+def listing_image_changed(sender, instance, **kwargs):
+    agent_id = Listing.objects.filter(pk=instance.listing_id).values_list('agent_id', flat=True).first()
+    if agent_id is not None:
+        invalidate_agent_profile(agent_id)
@@ -1,3 +1,432 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.cache import clear_local
+from core.mail import deliver_outbox
+from core.throttling import LocalBucketStore, local_store
+from core.models import OutboundEmail
+from listings.models import Listing, ListingImage
+from messaging.models import Message
+from .agent_stats import refresh_all_agent_stats
+from .authentication import CachedJWTAuthentication, refresh_token_for_user
+from .avatars import process_pending_avatars
+from .blacklist import index, is_blacklisted
+from . import hashers
+from .hashers import HashingBusy, run_hash, shutdown_pool
+from .models import AgentCoverage, AgentStats, User
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.factory = APIRequestFactory()
+        self.auth = CachedJWTAuthentication()
+
+    def request(self, method='get', user=None):
+        token = refresh_token_for_user(user or self.user).access_token
+        return getattr(self.factory, method)('/api/appointments/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_reads_use_claims_without_a_query(self):
+        request = self.request()
+        with self.assertNumQueries(0):
+            user, _ = self.auth.authenticate(request)
+        self.assertEqual((user.pk, user.role, user.is_agent), (self.user.pk, 'agent', True))
+        self.assertEqual(user.email, 'agent@example.com')  # deferred field loads on demand
+
+    def test_missing_version_is_loaded_from_the_database(self):
+        stale = self.request()
+        User.objects.filter(pk=self.user.pk).update(token_version=5)  # bumped without publishing
+        cache.clear()  # version evicted, or never seen by this cache
+        with self.assertNumQueries(1):
+            with self.assertRaises(AuthenticationFailed):
+                self.auth.authenticate(stale)
+        self.user.refresh_from_db()
+        current = self.request()
+        with self.assertNumQueries(0):  # the version was published again by the miss
+            user, _ = self.auth.authenticate(current)
+        self.assertEqual(user.pk, self.user.pk)
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(current)
+
+    def test_writes_load_the_user(self):
+        request = self.request('post')
+        with self.assertNumQueries(1):
+            user, _ = self.auth.authenticate(request)
+        self.assertEqual(user.email, 'agent@example.com')
+
+    def test_deactivation_and_role_change_revoke_tokens(self):
+        read, write = self.request(), self.request('post')
+        self.user.role = 'client'
+        self.user.save()
+        for request in (read, write):
+            with self.assertRaises(AuthenticationFailed):
+                self.auth.authenticate(request)
+
+        user, _ = self.auth.authenticate(self.request(user=self.user))
+        self.assertEqual(user.role, 'client')
+
+        stale = self.request()
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(stale)
+
+    def test_login_tokens_carry_claims(self):
+        response = APIClient().post('/api/auth/login/', {'username': 'agent', 'password': 'pw'})
+        self.assertEqual(response.status_code, 200)
+        profile = APIClient().get('/api/auth/profile/', HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(profile.status_code, 200)
+        self.assertEqual(profile.data['email'], 'agent@example.com')
+
+
+class RefreshBlacklistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        index.reset()
+        self.addCleanup(cache.clear)
+        self.addCleanup(index.reset)
+        User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.api = APIClient()
+        self.refresh = self.api.post('/api/auth/login/', {'username': 'agent', 'password': 'pw'}).data['refresh']
+
+    def test_rotated_token_cannot_be_reused(self):
+        response = self.api.post('/api/auth/refresh/', {'refresh': self.refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], self.refresh)
+        self.assertEqual(self.api.post('/api/auth/refresh/', {'refresh': self.refresh}).status_code, 401)
+
+        # Another process: no cache marker, filter rebuilt from the table
+        cache.clear()
+        clear_local()
+        index.reset()
+        self.assertEqual(self.api.post('/api/auth/refresh/', {'refresh': self.refresh}).status_code, 401)
+
+    def test_logout_and_membership_check_cost(self):
+        self.assertEqual(self.api.post('/api/auth/logout/', {'refresh': self.refresh}).status_code, 200)
+        self.assertEqual(self.api.post('/api/auth/refresh/', {'refresh': self.refresh}).status_code, 401)
+
+        is_blacklisted('warm-up')
+        with self.assertNumQueries(0):
+            self.assertFalse(is_blacklisted('some-other-jti'))
+
+
+class WelcomeEmailQueueTests(TestCase):
+    registration = {
+        'username': 'newagent', 'email': 'new@example.com', 'password': 'S3cure-pass!', 'password2': 'S3cure-pass!',
+        'first_name': 'New', 'last_name': 'Agent', 'role': 'agent',
+    }
+
+    def test_registration_queues_and_worker_delivers(self):
+        response = APIClient().post('/api/auth/register/', self.registration)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.get().to, ['new@example.com'])
+
+        self.assertEqual(deliver_outbox(), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Welcome to Keja')
+        self.assertEqual(OutboundEmail.objects.get().status, 'sent')
+        self.assertEqual(deliver_outbox(), 0)
+
+    def test_failed_send_is_retried_later(self):
+        APIClient().post('/api/auth/register/', self.registration)
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            self.assertEqual(deliver_outbox(), 0)
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertGreater(email.next_attempt_at, email.created_at)
+        self.assertEqual(deliver_outbox(), 0)  # not due yet
+
+
+class AvatarProcessingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def upload(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # orientation: rotate 90
+        exif[0x010F] = 'PhoneMaker'
+        buffer = io.BytesIO()
+        Image.new('RGB', (900, 600), 'teal').save(buffer, format='JPEG', exif=exif)
+        avatar = SimpleUploadedFile('me.jpg', buffer.getvalue(), content_type='image/jpeg')
+        return self.api.patch('/api/auth/profile/', {'avatar': avatar}, format='multipart')
+
+    def test_upload_is_normalised_into_square_variants(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['avatar_urls']['64'].endswith('.jpg'))
+        raw = User.objects.get(pk=self.user.pk).avatar.name
+
+        self.assertEqual(process_pending_avatars(), 1)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertFalse(user.avatar_pending)
+        self.assertFalse(default_storage.exists(raw))
+        self.assertEqual(sorted(user.avatar_variants, key=int), ['64', '128', '256'])
+        for name in [user.avatar.name, *user.avatar_variants.values()]:
+            with default_storage.open(name) as stored, Image.open(stored) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.width, image.height)
+                self.assertFalse(image.getexif())
+
+        profile = self.api.get('/api/auth/profile/').data
+        self.assertIn('/64_', profile['avatar_urls']['64'])
+        agents = self.api.get('/api/auth/agents/').data
+        agent = agents['results'][0]
+        self.assertIn('/128_', agent['avatar'])
+
+        self.upload()
+        process_pending_avatars()
+        for name in user.avatar_variants.values():
+            self.assertFalse(default_storage.exists(name))
+
+
+class AgentDiscoveryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.busy = User.objects.create_user('busy', 'busy@example.com', 'pw', role='agent')
+            self.quiet = User.objects.create_user('quiet', 'quiet@example.com', 'pw', role='agent')
+            self.client_user = User.objects.create_user('client', 'client@example.com', 'pw')
+            self.add_listing(self.busy, 'Nairobi', 'apartment')
+            self.add_listing(self.busy, 'nairobi ', 'apartment')
+            self.add_listing(self.busy, 'Mombasa', 'house')
+            self.add_listing(self.quiet, 'Mombasa', 'apartment')
+            self.add_listing(self.quiet, 'Kisumu', 'house', status='sold')
+        self.api = APIClient()
+
+    def add_listing(self, agent, city, property_type, **extra):
+        return Listing.objects.create(
+            agent=agent, title=f'{property_type} in {city}', description='x', property_type=property_type,
+            address='1 Road', city=city, state='County', zip_code='00100', price=1000, bedrooms=1,
+            bathrooms=1, square_feet=500, **extra,
+        )
+
+    def usernames(self, query=''):
+        return [agent['username'] for agent in self.api.get(f'/api/auth/agents/{query}').data['results']]
+
+    def test_stats_are_maintained_from_listings(self):
+        stats = AgentStats.objects.get(agent=self.busy)
+        self.assertEqual(stats.active_listing_count, 3)
+        self.assertEqual(stats.cities, ['Mombasa', 'Nairobi'])
+        self.assertEqual(stats.property_types, ['apartment', 'house'])
+        self.assertEqual(AgentCoverage.objects.get(agent=self.busy, city='nairobi').listing_count, 2)
+        self.assertFalse(AgentStats.objects.filter(agent=self.client_user).exists())
+
+    def test_list_filters_by_coverage_and_orders_by_activity(self):
+        self.assertEqual(self.usernames(), ['busy', 'quiet'])
+        self.assertEqual(self.usernames('?city=MOMBASA&property_type=apartment'), ['quiet'])
+        self.assertEqual(self.usernames('?property_type=house'), ['busy'])
+        self.assertEqual(self.usernames('?city=Kisumu'), [])
+
+    def test_cached_pages_are_dropped_when_stats_change(self):
+        self.usernames()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.usernames(), ['busy', 'quiet'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                self.add_listing(self.quiet, 'Kisumu', 'house')
+        self.assertEqual(self.usernames(), ['quiet', 'busy'])
+
+    def test_cache_keys_ignore_unrelated_query_parameters(self):
+        self.assertEqual(self.usernames('?city=Mombasa'), ['busy', 'quiet'])
+        self.api.get(f'/api/auth/agents/{self.busy.pk}/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.usernames('?city=%20MOMBASA&junk=1'), ['busy', 'quiet'])
+            self.api.get(f'/api/auth/agents/{self.busy.pk}/?junk=1')
+
+        with mock.patch.object(PageNumberPagination, 'page_size', 1):
+            first = self.api.get('/api/auth/agents/?page=2&junk=1').data
+            with self.assertNumQueries(0):
+                second = self.api.get('/api/auth/agents/?page=2&other=x').data
+        self.assertEqual([agent['username'] for agent in second['results']], ['quiet'])
+        self.assertEqual(first['previous'], 'http://testserver/api/auth/agents/?junk=1')
+        self.assertEqual(second['previous'], 'http://testserver/api/auth/agents/?other=x')
+        self.assertIsNone(second['next'])
+
+    def test_response_rate_counts_replied_enquirers(self):
+        other = User.objects.create_user('other', 'other@example.com', 'pw')
+        Message.objects.create(sender=self.client_user, recipient=self.busy, body='Is it available?')
+        Message.objects.create(sender=other, recipient=self.busy, body='Hello?')
+        Message.objects.create(sender=self.busy, recipient=self.client_user, body='Yes')
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_all_agent_stats()
+        self.assertEqual(str(AgentStats.objects.get(agent=self.busy).response_rate), '50.00')
+        self.assertIsNone(AgentStats.objects.get(agent=self.quiet).response_rate)
+
+        # Listing saves refresh counts but leave the rate to the scheduled job
+        Message.objects.create(sender=self.busy, recipient=other, body='Yes')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_listing(self.busy, 'Kisumu', 'house')
+        stats = AgentStats.objects.get(agent=self.busy)
+        self.assertEqual((stats.active_listing_count, str(stats.response_rate)), (4, '50.00'))
+
+    def test_admin_bulk_actions_refresh_stats(self):
+        listing_admin = admin.site._registry[Listing]
+        request = APIRequestFactory().post('/admin/listings/listing/')
+        self.usernames()
+        with mock.patch.object(listing_admin, 'message_user'), self.captureOnCommitCallbacks(execute=True):
+            listing_admin.soft_delete(request, Listing.objects.filter(agent=self.busy, city='Mombasa'))
+        self.assertEqual(AgentStats.objects.get(agent=self.busy).cities, ['Nairobi'])
+        self.assertEqual(self.usernames('?city=Mombasa'), ['quiet'])
+
+        with mock.patch.object(listing_admin, 'message_user'), self.captureOnCommitCallbacks(execute=True):
+            listing_admin.mark_as_sold(request, Listing.objects.filter(agent=self.quiet))
+        self.assertEqual(AgentStats.objects.get(agent=self.quiet).active_listing_count, 0)
+        self.assertEqual(self.usernames(), ['busy', 'quiet'])
+        self.assertEqual(self.api.get(f'/api/auth/agents/{self.quiet.pk}/').data['listing_count'], 0)
+
+    def test_profile_is_one_cached_document(self):
+        listing = Listing.objects.filter(agent=self.busy, city='Mombasa').get()
+        ListingImage.objects.create(listing=listing, image='listings/a.jpg', order=0)
+        ListingImage.objects.create(listing=listing, image='listings/b.jpg', order=1, is_primary=True)
+        with self.assertNumQueries(3):
+            profile = self.api.get(f'/api/auth/agents/{self.busy.pk}/').data
+        self.assertEqual(profile['listing_count'], 3)
+        self.assertEqual(len(profile['listings']), 3)
+        card = next(card for card in profile['listings'] if card['id'] == listing.pk)
+        self.assertTrue(card['primary_image'].endswith('/listings/b.jpg'))
+        self.assertEqual(card['image_count'], 2)
+        self.assertNotIn('is_saved', card)
+
+        with self.assertNumQueries(0):
+            self.api.get(f'/api/auth/agents/{self.busy.pk}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            listing.status = 'sold'
+            listing.save()
+        self.assertEqual(len(self.api.get(f'/api/auth/agents/{self.busy.pk}/').data['listings']), 2)
+
+        self.busy.first_name = 'Busy'
+        self.busy.save()
+        self.assertEqual(self.api.get(f'/api/auth/agents/{self.busy.pk}/').data['name'], 'Busy')
+        self.assertEqual(self.api.get(f'/api/auth/agents/{self.client_user.pk}/').status_code, 404)
+
+    def test_listings_filter_by_agent(self):
+        response = self.api.get(f'/api/listings/?agent={self.quiet.pk}')
+        self.assertEqual([listing['city'] for listing in response.data['results']], ['Mombasa'])
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        local_store.clear()
+        self.addCleanup(local_store.clear)
+        User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+
+    def test_bucket_refills_over_the_period(self):
+        store = LocalBucketStore()
+        self.assertEqual([store.consume('k', 2, 1.0, 100.0) for _ in range(3)], [0.0, 0.0, 1.0])
+        self.assertEqual(store.consume('k', 2, 1.0, 100.5), 0.5)
+        self.assertEqual(store.consume('k', 2, 1.0, 101.0), 0.0)
+
+    def test_prune_keeps_buckets_that_refill_slowly(self):
+        store = LocalBucketStore(max_keys=2)
+        store.consume('slow', 5, 5 / 3600, 100.0)
+        store.consume('fast', 10, 10 / 60, 100.0)
+        store.consume('new', 10, 10 / 60, 200.0)
+        self.assertEqual(sorted(store._buckets), ['new', 'slow'])
+
+    @override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'login': '2/min'},
+    })
+    def test_login_is_limited_per_ip(self):
+        api = APIClient()
+        statuses = [
+            api.post('/api/auth/login/', {'username': 'agent', 'password': 'wrong'}).status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(statuses, [401, 401, 429])
+        other_ip = api.post('/api/auth/login/', {'username': 'agent', 'password': 'pw'}, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other_ip.status_code, 200)
+        # Only the address the proxy appended counts, not hops the client sent
+        spoofed = [
+            api.post(
+                '/api/auth/login/', {'username': 'agent', 'password': 'wrong'},
+                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'203.0.113.{i}, 198.51.100.7',
+            ).status_code
+            for i in range(3)
+        ]
+        self.assertEqual(spoofed, [401, 401, 429])
+        # Unscoped endpoints are not throttled
+        self.assertEqual(api.get('/api/auth/agents/').status_code, 200)
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        local_store.clear()
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_login_rehashes_with_the_current_cost(self):
+        user = User.objects.create_user('agent', 'agent@example.com', 'pw')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            response = APIClient().post('/api/auth/login/', {'username': 'agent', 'password': 'pw'})
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(user.check_password('pw'))
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000, PASSWORD_HASH_WORKERS=1)
+    def test_hashing_runs_in_the_pool(self):
+        self.addCleanup(shutdown_pool)
+        response = APIClient().post('/api/auth/register/', {
+            'username': 'new', 'email': 'new@example.com', 'password': 'Sturdy-pass-42',
+            'password2': 'Sturdy-pass-42', 'first_name': 'New', 'last_name': 'User',
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertTrue(User.objects.get(username='new').check_password('Sturdy-pass-42'))
+
+    @override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_TIMEOUT=0.01)
+    def test_full_queue_is_rejected(self):
+        self.addCleanup(shutdown_pool)
+        run_hash(abs, -1)  # start the pool
+        with mock.patch.object(hashers, '_slots', threading.BoundedSemaphore(0)), self.assertRaises(HashingBusy):
+            run_hash(abs, -1)
+
+    @override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_IN_FLIGHT=1)
+    def test_other_requests_are_served_while_the_pool_is_saturated(self):
+        self.addCleanup(shutdown_pool)
+        User.objects.create_user('agent', 'agent@example.com', 'pw', role='agent')
+        run_hash(abs, -1)  # start the pool
+        busy = threading.Thread(target=run_hash, args=(time.sleep, 1))
+        busy.start()
+        self.addCleanup(busy.join)
+        time.sleep(0.1)
+
+        api = APIClient()
+        started = time.monotonic()
+        login = api.post('/api/auth/login/', {'username': 'agent', 'password': 'pw'})
+        self.assertEqual(login.status_code, 503)
+        self.assertEqual(api.get('/api/auth/agents/').status_code, 200)
+        self.assertLess(time.monotonic() - started, 0.5)
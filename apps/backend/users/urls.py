@@ -1,14 +1,16 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import RegisterView, UserProfileView, AgentListView
+from rest_framework_simplejwt.views import TokenBlacklistView, TokenRefreshView
+from .views import LoginView, RegisterView, UserProfileView, AgentListView, AgentProfileView
 
 urlpatterns = [
     # Authentication endpoints
-    path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('login/', LoginView.as_view(), name='token_obtain_pair'),
     path('refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('logout/', TokenBlacklistView.as_view(), name='token_blacklist'),
     path('register/', RegisterView.as_view(), name='register'),
     
     # User profile endpoints
     path('profile/', UserProfileView.as_view(), name='user_profile'),
     path('agents/', AgentListView.as_view(), name='agent_list'),
+    path('agents/<int:pk>/', AgentProfileView.as_view(), name='agent_profile'),
 ]
@@ -1,15 +1,18 @@
-from django.core.mail import send_mail
-from django.db.models import Count, Q
+from django.conf import settings
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.conf import settings
-from .models import User
-from .serializers import RegisterSerializer, UserProfileSerializer, AgentListSerializer
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.views import TokenObtainPairView
+from core.mail import enqueue_email
+from listings.models import Listing
+from .agent_stats import cached_agent_list, cached_agent_profile
+from .authentication import refresh_token_for_user
+from .models import AgentCoverage, User
+from .serializers import RegisterSerializer, UserProfileSerializer, AgentListSerializer, AgentProfileSerializer
 
 
 def send_welcome_email(user: User) -> None:
-    """Send a welcome email to the user after successful registration."""
+    """Queue a welcome email for the user after successful registration."""
     name = user.get_full_name() or user.username or 'there'
     subject = 'Welcome to Keja'
     message = (
@@ -19,16 +22,7 @@ def send_welcome_email(user: User) -> None:
         'If you have any questions, just reply to this email.\n\n'
         'Best regards,\nThe Keja Team'
     )
-    try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@keja.com'),
-            recipient_list=[user.email],
-            fail_silently=True,
-        )
-    except Exception:
-        pass  # Don't block registration if email fails
+    enqueue_email(subject, message, [user.email])
 
 
 class RegisterView(generics.CreateAPIView):
@@ -40,17 +34,18 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [permissions.AllowAny]
     serializer_class = RegisterSerializer
+    throttle_scope = 'register'
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
         
-        # Send welcome email (non-blocking)
+        # Queue welcome email; core.mail.deliver_outbox sends it
         send_welcome_email(user)
         
         # Generate JWT tokens for the new user
-        refresh = RefreshToken.for_user(user)
+        refresh = refresh_token_for_user(user)
         
         return Response({
             'user': {
@@ -68,6 +63,15 @@ class RegisterView(generics.CreateAPIView):
         }, status=status.HTTP_201_CREATED)
 
 
+class LoginView(TokenObtainPairView):
+    """
+    Obtain an access/refresh token pair
+    
+    POST /api/auth/login/
+    """
+    throttle_scope = 'login'
+
+
 class UserProfileView(generics.RetrieveUpdateAPIView):
     """
     API endpoint for user profile
@@ -79,16 +83,90 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        # request.user may be built from token claims with most fields deferred
+        return User.objects.get(pk=self.request.user.pk)
 
 
 class AgentListView(generics.ListAPIView):
     """
-    List agents for discovery (public).
-    GET /api/auth/agents/
+    List agents for discovery (public), most active listings first.
+    GET /api/auth/agents/?city=Nairobi&property_type=apartment
+
+    Reads the maintained AgentStats/AgentCoverage rows (see users.agent_stats);
+    pages are cached until the stats change or AGENT_LIST_CACHE_SECONDS pass.
     """
     serializer_class = AgentListSerializer
     permission_classes = [permissions.AllowAny]
-    queryset = User.objects.filter(role='agent').annotate(
-        listing_count=Count('listings', filter=Q(listings__is_deleted=False))
-    ).order_by('-listing_count')
+
+    def get_filters(self):
+        params = self.request.query_params
+        return params.get('city', '').strip().lower(), params.get('property_type', '').strip()
+
+    def get_queryset(self):
+        queryset = User.objects.filter(role='agent', agent_stats__isnull=False).select_related('agent_stats')
+        city, property_type = self.get_filters()
+        if city or property_type:
+            coverage = AgentCoverage.objects.all()
+            if city:
+                coverage = coverage.filter(city=city)
+            if property_type:
+                coverage = coverage.filter(property_type=property_type)
+            queryset = queryset.filter(pk__in=coverage.values('agent_id'))
+        return queryset.order_by('-agent_stats__active_listing_count', 'agent_stats__agent_id')
+
+    def list(self, request, *args, **kwargs):
+        page = request.query_params.get(self.paginator.page_query_param, '1')
+        if not page.isdigit():
+            # 'last' or an invalid page: not worth a cache entry
+            return super().list(request, *args, **kwargs)
+        data = cached_agent_list(int(page), *self.get_filters(), lambda: self.load_page(request, *args, **kwargs))
+        # Links are stored as page numbers and rebuilt from this request's URL
+        return Response(dict(data, next=self.page_link(data['next']), previous=self.page_link(data['previous'])))
+
+    def load_page(self, request, *args, **kwargs):
+        data = super().list(request, *args, **kwargs).data
+        page = self.paginator.page
+        return dict(
+            data,
+            next=page.next_page_number() if page.has_next() else None,
+            previous=page.previous_page_number() if page.has_previous() else None,
+        )
+
+    def page_link(self, number):
+        if number is None:
+            return None
+        url = self.request.build_absolute_uri()
+        if number == 1:
+            return remove_query_param(url, self.paginator.page_query_param)
+        return replace_query_param(url, self.paginator.page_query_param, number)
+
+
+class AgentProfileView(generics.RetrieveAPIView):
+    """
+    Public agent profile: details, stats and active listing cards in one document.
+    GET /api/auth/agents/{id}/
+
+    Built in three queries (agent with stats, listings, their images) and
+    cached per agent until users.agent_stats.invalidate_agent_profile runs.
+    """
+    serializer_class = AgentProfileSerializer
+    permission_classes = [permissions.AllowAny]
+    queryset = User.objects.filter(role='agent', agent_stats__isnull=False).select_related('agent_stats')
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(cached_agent_profile(kwargs['pk'], self.build_document))
+
+    def build_document(self):
+        agent = self.get_object()
+        agent.profile_listings = self.get_listings(agent)
+        return self.get_serializer(agent).data
+
+    def get_listings(self, agent):
+        listings = list(
+            Listing.objects.filter(agent=agent, status='active', is_deleted=False)
+            .prefetch_related('images')
+            .order_by('-created_at')[:getattr(settings, 'AGENT_PROFILE_LISTINGS', 24)]
+        )
+        for listing in listings:
+            listing.agent = agent
+        return listings